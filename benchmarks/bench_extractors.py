@@ -0,0 +1,109 @@
+"""
+Micro-benchmarks of the table cleaning and extraction hot path, per call:
+- clean_str: the former uncompiled re.sub, vs the precompiled pattern, vs memoized on top of it.
+  The corpus repeats its names, as the list page lists an animal under each of its adjectives
+- the extractors on a parsed cell: the former CollateralAdjectivesExtractor stripping each fragment up to
+  four times, vs the current one. AnimalExtractor for reference
+- mapping two column pairs of a table sharing their values column: a TableMappingScraper per pair,
+  vs a single pass ColumnarTableScraper
+Run from project root: python -m benchmarks.bench_extractors
+"""
+import argparse
+import random
+import re
+import timeit
+
+from bs4 import BeautifulSoup
+
+import utils
+from components.scrapers.base_scrapers import ColumnarTableScraper, TableMappingScraper
+from components.scrapers.extractors.base_extractor import BaseCellsExtractor
+from components.scrapers.extractors.wikipedia_extractors import AnimalExtractor, CollateralAdjectivesExtractor
+
+
+def former_clean_str(s: str, replacers=None) -> str:
+    if not replacers:
+        replacers = {"(list)": "", " ": ""}
+    for k, v in replacers.items():
+        s = s.replace(k, v)
+    s = re.sub(r'[\\/:"*?<>|]+', "_", s)
+    return s
+
+
+class FormerCollateralAdjectivesExtractor(CollateralAdjectivesExtractor):
+    def extract(self, cells):
+        cell_text = cells[self.col_idx].get_text(separator="\n")
+        adjectives = [
+            former_clean_str(p.strip())
+            for p in cell_text.split("\n")
+            if p.strip() and p.strip() != "—" and len(p.strip()) > 1
+        ]
+        return adjectives or ["Null"]
+
+
+def synthetic_table(rows: int, animals: int, seed: int = 0) -> str:
+    """
+    :return: html of a list table of (animal, young, collateral adjectives) rows, repeating its animals
+    """
+    rng = random.Random(seed)
+    body = []
+    for _ in range(rows):
+        animal = rng.randrange(animals)
+        adjectives = "<br/>".join(f" adjective {rng.randrange(animals)} (list) " for _ in range(rng.randint(1, 3)))
+        body.append(f'<tr><td><a href="/wiki/Animal_{animal}">Animal {animal}</a></td>'
+                    f'<td>young {animal}</td><td>{adjectives or "—"}</td></tr>')
+    return (f"<table><tr><th>Animal</th><th>Young</th><th>Collateral adjective</th></tr>"
+            f"{''.join(body)}</table>")
+
+
+def per_call(func, calls: int, repeat: int, setup=lambda: None) -> float:
+    """
+    :return: best microseconds per call out of the repeats, setup runs before each repeat
+    """
+    timings = []
+    for _ in range(repeat):
+        setup()
+        timings.append(timeit.timeit(func, number=1) / calls * 1e6)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--animals", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = BeautifulSoup(synthetic_table(args.rows, args.animals), "html.parser").find("table")
+    rows = table.find_all("tr")[1:]
+    cells = [TableMappingScraper.cells(row) for row in rows]
+    strings = [f" adjective {idx % args.animals} (list) " for idx in range(args.rows * 4)]
+    print(f"{args.rows} rows, {args.animals} animals, best of {args.repeat}")
+
+    clear = utils._clean_str.cache_clear
+    compiled = utils._clean_str.__wrapped__
+    default_replacers = tuple(utils.DEFAULT_REPLACERS.items())
+    for name, func, setup in (
+            ("clean_str former", lambda: [former_clean_str(s) for s in strings], clear),
+            ("clean_str precompiled", lambda: [compiled(s, default_replacers) for s in strings], clear),
+            ("clean_str memoized", lambda: [utils.clean_str(s) for s in strings], clear)):
+        print(f"{name:<32} {per_call(func, len(strings), args.repeat, setup):8.3f} us/string")
+
+    for name, extractor in (("adjectives extractor former", FormerCollateralAdjectivesExtractor(col_idx=2)),
+                            ("adjectives extractor", CollateralAdjectivesExtractor(col_idx=2)),
+                            ("animal extractor", AnimalExtractor(col_idx=0))):
+        func = lambda: [extractor.extract(row_cells) for row_cells in cells]
+        print(f"{name:<32} {per_call(func, len(cells), args.repeat, clear):8.3f} us/row")
+
+    pairs = [(CollateralAdjectivesExtractor(col_idx=2), AnimalExtractor(col_idx=0)),
+             (BaseCellsExtractor(col_idx=1), AnimalExtractor(col_idx=0))]
+    per_pair = lambda: [TableMappingScraper(table=table, keys_extractor=keys_extractor,
+                                            values_extractor=values_extractor).create_mapping()
+                        for keys_extractor, values_extractor in pairs]
+    columnar = lambda: ColumnarTableScraper(table=table, pairs=pairs).create_mappings()
+    for name, func in (("2 pairs, scraper per pair", per_pair), ("2 pairs, columnar", columnar)):
+        print(f"{name:<32} {per_call(func, len(rows), args.repeat, clear):8.3f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Wall time and peak traced memory of generating and saving the collateral adjectives report of a synthetic mapping,
+whole page string (the generate + save_file path) vs streamed chunks (generate_and_save).
+Run from project root: python -m benchmarks.bench_html_generation
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+
+from components.fetchers.image_index import ImageIndex
+from components.html_generator.wikipedia_html_generators import WikipediaCollateralAdjectiveHTMLGenerator
+
+
+def synthetic_mapping(rows: int, animals_per_row: int = 3) -> dict:
+    return {
+        f"adjective{row}": [(f"Animal{row}_{a}", f"https://en.wikipedia.org/wiki/Animal{row}_{a}")
+                            for a in range(animals_per_row)]
+        for row in range(rows)
+    }
+
+
+def whole_page(generator, mapping):
+    return generator.save_file(generator.generate(mapping))
+
+
+def streamed(generator, mapping):
+    return generator.generate_and_save(mapping)
+
+
+def bench(save, mapping) -> tuple:
+    """
+    :return: wall seconds and peak traced MB of generating and saving the report
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generator = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="bench",
+                                                              image_index=ImageIndex())
+        tracemalloc.start()
+        start = time.perf_counter()
+        save(generator, mapping)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    mapping = synthetic_mapping(args.rows)
+    print(f"{args.rows} rows")
+    for save in (whole_page, streamed):
+        elapsed, peak_mb = bench(save, mapping)
+        print(f"{save.__name__:<12} {elapsed:8.2f} s  peak {peak_mb:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Build time and retained memory of the adjective -> animals mapping of a synthetic list of 1M rows,
+plain dict of lists (the former create_mapping, plus the images set rebuilt from it) vs CompactMapping.
+Every row yields fresh strings, as parsed rows do, so the dict keeps a copy of an animal per adjective listing it.
+Run from project root: python -m benchmarks.bench_mapping
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+from components.mapping.compact_mapping import CompactMapping
+
+
+def synthetic_rows(rows: int, animals: int, adjectives: int, seed: int = 0):
+    """
+    :return: generator of (keys, values) rows, 1 to 3 adjectives of an animal tuple per row
+    """
+    rng = random.Random(seed)
+    for _ in range(rows):
+        animal = rng.randrange(animals)
+        keys = [f"adjective{rng.randrange(adjectives)}" for _ in range(rng.randint(1, 3))]
+        yield keys, [(f"Animal{animal}", f"https://en.wikipedia.org/wiki/Animal{animal}")]
+
+
+def dict_mapping(rows):
+    mapping = defaultdict(list)
+    for keys, values in rows:
+        for key in keys:
+            mapping[key].extend(values)
+    return mapping, set().union(*mapping.values())
+
+
+def compact_mapping(rows):
+    mapping = CompactMapping(dedupe=True)
+    for keys, values in rows:
+        mapping.add_row(keys, values)
+    # the dedupe runs on first read, counted in
+    mapping.edges()
+    return mapping, mapping.unique_values()
+
+
+def bench(build, args) -> tuple:
+    """
+    :return: build seconds, retained MB and peak MB of the mapping and its images.
+    Timed and traced in separate builds, tracing slows the build down
+    """
+    rows = lambda: synthetic_rows(args.rows, args.animals, args.adjectives)
+    gc.collect()
+    start = time.perf_counter()
+    mapping, images = build(rows())
+    elapsed = time.perf_counter() - start
+    del mapping, images
+
+    gc.collect()
+    tracemalloc.start()
+    mapping, images = build(rows())
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, current / 1024 ** 2, peak / 1024 ** 2, len(mapping), len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--animals", type=int, default=200_000)
+    parser.add_argument("--adjectives", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, {args.animals} animals, {args.adjectives} adjectives")
+    for build in (dict_mapping, compact_mapping):
+        elapsed, retained_mb, peak_mb, keys, images = bench(build, args)
+        print(f"{build.__name__:<16} {elapsed:8.2f} s  retained {retained_mb:8.1f} MB  peak {peak_mb:8.1f} MB  "
+              f"({keys} keys, {images} images)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+CPU time per article of the main image lookup, for each parser backend, full tree vs image-only parse.
+Run from project root: python -m benchmarks.bench_parsing
+"""
+import argparse
+import time
+
+from benchmarks.fixtures import synthetic_article
+from components.scrapers.wikipedia_scraper import WikiScraper, WikiImageScraper
+
+
+def parser_backends():
+    backends = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    return backends
+
+
+def bench(scraper_class, parser: str, articles) -> float:
+    """
+    :return: mean CPU seconds per article to parse and find the main image
+    """
+    scraper_class = type(scraper_class.__name__, (scraper_class,), {"PARSER": parser})
+    start = time.process_time()
+    for idx, html in enumerate(articles):
+        url = scraper_class(url=f"https://en.wikipedia.org/wiki/Animal{idx}", html=html).get_image_url()
+        assert url and url.endswith(f"Animal{idx}.jpg"), f"Unexpected image url {url}"
+    return (time.process_time() - start) / len(articles)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    args = parser.parse_args()
+
+    articles = [synthetic_article(idx, args.paragraphs) for idx in range(args.articles)]
+    size_kb = sum(len(html) for html in articles) / len(articles) / 1024
+    print(f"{args.articles} articles, {size_kb:.0f}KB each")
+
+    baseline = None
+    for backend in parser_backends():
+        for scraper_class in (WikiScraper, WikiImageScraper):
+            cpu = bench(scraper_class, backend, articles)
+            baseline = baseline or cpu
+            print(f"{backend:<12} {scraper_class.__name__:<18} {cpu * 1000:8.2f} ms/article  x{baseline / cpu:.1f}")
+
+
+if __name__ == "__main__":
+    main()
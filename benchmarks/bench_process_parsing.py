@@ -0,0 +1,58 @@
+"""
+Wall time of resolving the main image of a corpus of local article fixtures, with I/O threads parsing
+in-thread (one core under the GIL) vs handing raw pages to a parsing process pool of growing size.
+Run from project root: python -m benchmarks.bench_process_parsing
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from benchmarks.fixtures import synthetic_article
+from components.scrapers.wikipedia_scraper import extract_image_url
+
+
+def resolve_all(articles, threads: int, parse_executor: ProcessPoolExecutor | None) -> float:
+    """
+    :return: wall seconds to resolve the image url of all articles
+    """
+    def resolve(item):
+        idx, html = item
+        url = f"https://en.wikipedia.org/wiki/Animal{idx}"
+        if parse_executor:
+            return parse_executor.submit(extract_image_url, url, html).result()
+        return extract_image_url(url, html)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        urls = list(executor.map(resolve, enumerate(articles)))
+    assert all(urls), "Every article should have an image"
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max_processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    articles = [synthetic_article(idx).encode() for idx in range(args.articles)]
+    print(f"{args.articles} articles, {args.threads} I/O threads, {os.cpu_count()} cores")
+
+    baseline = resolve_all(articles, args.threads, None)
+    print(f"{'threads only':<16} {baseline:7.2f}s")
+
+    processes = 1
+    while processes <= args.max_processes:
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # warm up the workers, so process startup is not measured
+            list(pool.map(extract_image_url, ["warmup"] * processes, articles[:processes]))
+            elapsed = resolve_all(articles, args.threads, pool)
+        print(f"{f'{processes} processes':<16} {elapsed:7.2f}s  x{baseline / elapsed:.1f}")
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
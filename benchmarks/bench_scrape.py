@@ -0,0 +1,155 @@
+"""
+End to end scrape of a local wikipedia stand-in (list page, synthetic articles and image blobs served with latency
+and injected 503 errors), for each execution mode: throughput, stage latency percentiles and peak RSS,
+compared against the stored baseline.
+Every mode runs in its own process, so its peak RSS is its own.
+Run from project root: python -m benchmarks.bench_scrape
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.fixtures import synthetic_article
+from components.metrics.metrics import Metrics
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from tests.tests_data.local_server import LocalServer, wiki_routes
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+COMPARED = ("animals_per_second", "peak_rss_mb")
+
+
+def stand_in_routes(base_url: str, animals: int, paragraphs: int, image_kb: int) -> dict:
+    """
+    :return: routes of the wikipedia stand-in, with full size synthetic articles
+    """
+    routes = wiki_routes(base_url, animals, os.urandom(image_kb * 1024))
+    for idx in range(animals):
+        image_url = f"{base_url}/wikipedia/commons/thumb/animal{idx}.jpg"
+        routes[f"/wiki/Animal{idx}"] = (synthetic_article(idx, paragraphs, image_url).encode(), "text/html")
+    return routes
+
+
+def run_mode(mode: str, base_url: str, animals: int, images_api: bool, results: multiprocessing.Queue):
+    """
+    Scrape the stand-in in a given mode, in a child process
+    """
+    # the injected errors are retried, their warnings would flood the report
+    logging.basicConfig(level=logging.CRITICAL)
+    scraper_class = type("BenchScraper", (WikipediaCollateralAdjectiveScraper,),
+                         {"WIKI_URL": f"{base_url}/wiki/List_of_animal_names",
+                          "IMAGES_API_URL": f"{base_url}/w/api.php"})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        start = time.perf_counter()
+        scraper_class(output_dir=tmpdir, mode=mode, use_images_api=images_api).scrape()
+        seconds = time.perf_counter() - start
+
+    report = Metrics.default().report()
+    counters, stages = report["counters"], report["stages"]
+    result = {
+        "seconds": round(seconds, 3),
+        "animals_per_second": round(animals / seconds, 1),
+        # ru_maxrss is in KB on linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "requests": counters.get("requests", 0),
+        "retries": counters.get("retries", 0) + counters.get("download_retries", 0),
+        "failures": counters.get("download_failures", 0),
+    }
+    for stage in ("fetch", "download"):
+        for quantile in ("p50", "p95", "p99"):
+            result[f"{stage}_{quantile}_ms"] = round(stages.get(stage, {}).get(quantile, 0) * 1000, 1)
+    results.put(result)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :return: list of regression descriptions, of the results worse than the baseline by more than tolerance
+    """
+    regressions = []
+    for mode, result in results.items():
+        base = baseline.get(mode)
+        if not base:
+            continue
+        if result["animals_per_second"] < base["animals_per_second"] * (1 - tolerance):
+            regressions.append(f"{mode}: {result['animals_per_second']} animals/s, "
+                               f"baseline {base['animals_per_second']}")
+        if result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{mode}: peak RSS {result['peak_rss_mb']} MB, baseline {base['peak_rss_mb']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", choices=WikipediaCollateralAdjectiveScraper.MODES,
+                        default=list(WikipediaCollateralAdjectiveScraper.MODES))
+    parser.add_argument("--animals", type=int, default=300)
+    parser.add_argument("--paragraphs", type=int, default=100)
+    parser.add_argument("--image_kb", type=int, default=32)
+    parser.add_argument("--latency_ms", type=float, default=20)
+    parser.add_argument("--error_rate", type=float, default=0.01)
+    parser.add_argument("--images_api", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save_baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Accepted regression against the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with an error on regressions")
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in ("animals", "paragraphs", "image_kb", "latency_ms", "error_rate",
+                                                  "images_api")}
+    print(", ".join(f"{key}={value}" for key, value in config.items()))
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with LocalServer({}, latency=args.latency_ms / 1000, error_rate=args.error_rate) as server:
+        server.routes.update(stand_in_routes(server.base_url, args.animals, args.paragraphs, args.image_kb))
+        for mode in args.modes:
+            queue = context.Queue()
+            process = context.Process(target=run_mode, args=(mode, server.base_url, args.animals, args.images_api,
+                                                             queue))
+            process.start()
+            results[mode] = queue.get()
+            process.join()
+
+    columns = list(next(iter(results.values())))
+    print(f"{'mode':<12}" + "".join(f"{column:>20}" for column in columns))
+    for mode, result in results.items():
+        print(f"{mode:<12}" + "".join(f"{result[column]:>20}" for column in columns))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            # the modes not run are kept, if measured with the same config
+            kept = baseline.get("modes", {}) if baseline.get("config") == config else {}
+            json.dump({"config": config, "modes": {**kept, **results}}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not baseline:
+        print("No baseline to compare with, store one with --save_baseline")
+        return
+    if baseline.get("config") != config:
+        print(f"Baseline config differs ({baseline.get('config')}), not compared")
+        return
+    for mode, result in results.items():
+        base = baseline["modes"].get(mode)
+        if base:
+            print(f"{mode:<12}" + "".join(f"{column} x{result[column] / base[column]:.2f}  " for column in COMPARED
+                                          if base.get(column)))
+    regressions = compare(results, baseline["modes"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Startup time of the one-shot CLI, each measured in fresh interpreters: the bare interpreter, importing main,
+and main --help, against a startup budget. Also lists the modules of the other modes the import pulls in,
+they should be imported by their mode only.
+Run from project root: python -m benchmarks.bench_startup [--check]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# milliseconds, of importing main on top of the bare interpreter
+STARTUP_BUDGET_MS = 500
+LAZY_MODULES = ("aiohttp", "components.fetchers.async_fetcher", "components.batch.batch_scraper",
+                "components.sharding.shard_coordinator", "components.service.scrape_service", "PIL", "sqlite3")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wall_ms(args: list, runs: int) -> float:
+    """
+    :return: median wall milliseconds of running the python arguments
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def eager_modules() -> list:
+    """
+    :return: the LAZY_MODULES imported by importing main
+    """
+    code = f"import sys, main; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return [module for module in output.stdout.strip().split(",") if module]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget_ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--check", action="store_true", help="Exit with an error if over budget")
+    args = parser.parse_args()
+
+    interpreter = wall_ms(["-c", "pass"], args.runs)
+    import_main = wall_ms(["-c", "import main"], args.runs)
+    cli_help = wall_ms(["main.py", "--help"], args.runs)
+    eager = eager_modules()
+    over = import_main - interpreter > args.budget_ms
+
+    print(f"median of {args.runs} runs")
+    print(f"{'interpreter':<16} {interpreter:8.1f} ms")
+    print(f"{'import main':<16} {import_main:8.1f} ms  (+{import_main - interpreter:.1f} ms, "
+          f"budget {args.budget_ms:.0f} ms{', OVER' if over else ''})")
+    print(f"{'main --help':<16} {cli_help:8.1f} ms")
+    print(f"eagerly imported: {', '.join(eager) or 'none'}")
+    if args.check and (over or eager):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
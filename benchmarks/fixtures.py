@@ -0,0 +1,30 @@
+def synthetic_article(idx: int, paragraphs: int = 400, image_url: str = None) -> str:
+    """
+    Build a synthetic wikipedia animal article, with an infobox thumbnail near the top
+    followed by a long body of paragraphs, links, tables and icons, like a real article.
+    :param idx: the animal index, used in names and urls
+    :param paragraphs: amount of body paragraphs
+    :param image_url: the infobox thumbnail url, a wikimedia url if not given
+    :return: the article html
+    """
+    body = "".join(
+        f'<p id="p{p}">The <a href="/wiki/Animal{idx}_{p}" title="Animal{idx}">animal {idx}</a> '
+        f'is described in <b>section {p}</b> with <i>some</i> words<sup class="reference">'
+        f'<a href="#cite_note-{p}">[{p}]</a></sup>.</p>'
+        f'<img src="//upload.wikimedia.org/wikipedia/commons/icon{p}.svg" width="16" height="16"/>'
+        for p in range(paragraphs)
+    )
+    table = "".join(f"<tr><td>Row {r}</td><td>{r * idx}</td></tr>" for r in range(50))
+    return f"""<!DOCTYPE html>
+    <html><head><title>Animal{idx}</title></head>
+    <body>
+    <div id="content">
+    <img src="//upload.wikimedia.org/wikipedia/en/logo.svg"/>
+    <table class="infobox"><tr><td>
+    <img src="{image_url or f'//upload.wikimedia.org/wikipedia/commons/thumb/a/ab/Animal{idx}.jpg/250px-Animal{idx}.jpg'}"/>
+    </td></tr></table>
+    {body}
+    <table class="wikitable">{table}</table>
+    </div>
+    </body></html>
+    """
@@ -0,0 +1,194 @@
+import importlib
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from components.fetchers.host_throttle import HostThrottle
+from components.fetchers.image_store import ImageStore
+from components.fetchers.response_cache import ResponseCache
+from components.fetchers.session_pool import SessionPool
+from components.scrapers.base_scrapers import TableSpec
+from components.scrapers.extractors.base_extractor import BaseCellsExtractor
+from components.scrapers.extractors.wikipedia_extractors import AnimalExtractor, CollateralAdjectivesExtractor
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from utils import load_yaml
+
+
+class BatchScraper:
+    """
+    Runs many list page scraping jobs in one process, described by a YAML config file:
+    each job maps every table of its page matching its header pairs, then scrapes and downloads the images
+    and generates its report into its own directory of the output directory.
+    The jobs run concurrently and share one connection pool, response cache, image store and host throttle,
+    so an image listed by several jobs is downloaded once and the per host limits hold across jobs.
+
+    Config file format:
+        max_jobs: 4                 # jobs run at once, MAX_JOBS if not given
+        defaults:                   # options of every job, any of JOB_OPTIONS
+          mode: threaded
+        jobs:
+          - name: collateral_adjectives                     # the job output directory name, of JOB_NAME_PATTERN
+            url: https://en.wikipedia.org/wiki/List_of_animal_names
+            mode: async                                     # overrides the defaults
+            tables:
+              - key_header: Collateral adjective
+                value_header: Animal
+                keys_extractor: collateral_adjectives       # a name of EXTRACTORS or a module:Class path
+                values_extractor: animal
+    """
+
+    MAX_JOBS = 4
+    # a job name is a single directory name, so a job never writes outside the output directory
+    JOB_NAME_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+    EXTRACTORS = {
+        "text": BaseCellsExtractor,
+        "animal": AnimalExtractor,
+        "collateral_adjectives": CollateralAdjectivesExtractor,
+    }
+    JOB_OPTIONS = ("mode", "use_threading", "parse_processes", "use_images_api", "max_image_bytes", "incremental",
+                   "page_by", "page_size", "thumbnails_format", "thumbnail_size", "keep_originals", "resume",
+                   "stream_table", "export_formats")
+
+    def __init__(self, config_path: str, output_dir: str, session_pool: SessionPool = None,
+                 cache: ResponseCache = None, image_store: ImageStore = None, throttle: HostThrottle = None,
+                 rate_limit: float = None, scraper_class: type = WikipediaCollateralAdjectiveScraper):
+        """
+        BatchScraper constructor
+        :param config_path: the jobs YAML config file path, no jobs if not given
+        :param output_dir: directory the job directories are created in
+        :param session_pool: keep-alive session pool shared by the jobs, one sized to MAX_THREADS per host if not given
+        :param cache: on-disk response cache shared by the jobs, no caching if not given
+        :param image_store: content addressed image store shared by the jobs,
+        a store in the IMAGE_STORE_DIR of the output directory if not given
+        :param throttle: per host throttle shared by the jobs, one adapting up to MAX_THREADS per host if not given
+        :param rate_limit: maximum requests per second to each host of the throttle created if not given
+        :param scraper_class: the scraper class of the jobs
+        """
+        self.logger = logging.getLogger(__name__)
+        self.output_dir = output_dir
+        self.scraper_class = scraper_class
+        config = (load_yaml(config_path) if config_path else None) or {}
+        self.max_jobs = config.get("max_jobs", self.MAX_JOBS)
+        self.jobs = [self.parse_job(job, config.get("defaults") or {}) for job in config.get("jobs") or []]
+        names = [job["name"] for job in self.jobs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Job names must be unique, got {names}")
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.session_pool = session_pool or SessionPool(pool_maxsize=scraper_class.MAX_THREADS)
+        self.cache = cache
+        self.image_store = image_store or ImageStore(os.path.join(self.output_dir, scraper_class.IMAGE_STORE_DIR))
+        self.throttle = throttle or HostThrottle(rate=rate_limit, max_concurrency=scraper_class.MAX_THREADS)
+        # job name to its scraper, once created
+        self.scrapers: Dict[str, WikipediaCollateralAdjectiveScraper] = {}
+
+    def parse_job(self, job: dict, defaults: dict, default_target: bool = False, trusted: bool = True) -> dict:
+        """
+        Validate a job of the config file
+        :param job: the job config
+        :param defaults: the default options of the jobs
+        :param default_target: if true, the url and tables are optional, the scraper WIKI_URL and TABLES if not given
+        :param trusted: if true, the extractors may be module:Class paths, else EXTRACTORS names only
+        :return: the job, with its options merged over the defaults and its tables as TableSpec (None if not given)
+        """
+        required = ("name",) if default_target else ("name", "url", "tables")
+        missing = [key for key in required if not job.get(key)]
+        if missing:
+            raise ValueError(f"Job {job.get('name', job)} is missing {missing}")
+        if not isinstance(job["name"], str) or not self.JOB_NAME_PATTERN.fullmatch(job["name"]):
+            raise ValueError(f"Invalid job name {job['name']!r}, expected letters, digits, '_' and '-' only")
+        options = {**defaults, **{key: value for key, value in job.items() if key not in ("name", "url", "tables")}}
+        unknown = set(options) - set(self.JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown options {sorted(unknown)} of job {job['name']}, expected {self.JOB_OPTIONS}")
+        tables = []
+        for table in job.get("tables") or []:
+            missing = [key for key in ("key_header", "value_header")
+                       if not isinstance(table, dict) or not table.get(key)]
+            if missing:
+                raise ValueError(f"Table {table} of job {job['name']} is missing {missing}")
+            tables.append(TableSpec(table["key_header"], table["value_header"],
+                                    self.extractor(table.get("keys_extractor", "text"), trusted),
+                                    self.extractor(table.get("values_extractor", "animal"), trusted)))
+        return {"name": job["name"], "url": job.get("url") or self.scraper_class.WIKI_URL, "tables": tables or None,
+                "options": options}
+
+    @classmethod
+    def extractor(cls, name: str, trusted: bool = True) -> type:
+        """
+        Get an extractor class by its EXTRACTORS name, or by its "package.module:Class" path
+        :param name: the extractor name or path
+        :param trusted: if false, only EXTRACTORS names are accepted, a path would import any module
+        :return: the extractor class
+        """
+        if name in cls.EXTRACTORS:
+            return cls.EXTRACTORS[name]
+        if not trusted:
+            raise ValueError(f"Unknown extractor {name}, expected one of {list(cls.EXTRACTORS)}")
+        module_name, _, class_name = name.partition(":")
+        if not class_name:
+            raise ValueError(f"Unknown extractor {name}, expected one of {list(cls.EXTRACTORS)} or a module:Class path")
+        try:
+            extractor_class = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            raise ValueError(f"Can not load extractor {name}: {e}") from e
+        if not isinstance(extractor_class, type) or not issubclass(extractor_class, BaseCellsExtractor):
+            raise ValueError(f"Extractor {name} is not a BaseCellsExtractor")
+        return extractor_class
+
+    def run(self) -> Dict[str, str | None]:
+        """
+        Run all the jobs, a failed job doesn't stop the others
+        :return: dictionary mapping each job name to its report path, None if the job failed
+        """
+        with ThreadPoolExecutor(max_workers=max(min(self.max_jobs, len(self.jobs)), 1)) as executor:
+            futures = {job["name"]: executor.submit(self.run_job, job) for job in self.jobs}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                self.logger.error(f"Job {name} failed: {e}", exc_info=True)
+                results[name] = None
+        self.logger.info(f"Batch done, connection pool stats: {self.session_pool.stats()}, "
+                         f"image store stats: {self.image_store.stats()}")
+        return results
+
+    def run_job(self, job: dict) -> str:
+        """
+        Scrape a job page with the shared pool, cache, store and throttle
+        :param job: the parsed job
+        :return: the job report path
+        """
+        self.logger.info(f"Running job {job['name']} on {job['url']}")
+        return self.create_scraper(job).scrape()
+
+    def create_scraper(self, job: dict, **options) -> WikipediaCollateralAdjectiveScraper:
+        """
+        Create the scraper of a job, with the shared pool, cache, store and throttle
+        :param job: the parsed job
+        :param options: scraper options overriding the job options
+        :return: the scraper
+        """
+        scraper = self.scraper_class(output_dir=os.path.join(self.output_dir, job["name"]), url=job["url"],
+                                     tables=job["tables"], session_pool=self.session_pool, cache=self.cache,
+                                     image_store=self.image_store, throttle=self.throttle,
+                                     **{**job["options"], **options})
+        self.scrapers[job["name"]] = scraper
+        return scraper
+
+    @property
+    def failures(self) -> List[Tuple[str, str, str, str]]:
+        """
+        :return: list of (job name, animal name, stage, error) of the failed animals of the jobs
+        """
+        return [(name, *failure) for name, scraper in self.scrapers.items() for failure in scraper.failures]
+
+    def failure_summary(self) -> str:
+        """
+        :return: human readable summary of the failed animals of every job, empty if none failed
+        """
+        summaries = [(name, scraper.failure_summary()) for name, scraper in self.scrapers.items()]
+        return "\n".join(f"{name}: {summary}" for name, summary in summaries if summary)
@@ -0,0 +1,237 @@
+import json
+import os
+import tempfile
+from typing import TYPE_CHECKING, Dict, Iterator, List, Mapping, Tuple
+
+from components.fetchers.image_index import ImageIndex
+from utils import set_default_mode
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+class MappingExport:
+    """
+    Base class for exporting the mapping and its downloaded images in a machine-readable file,
+    so consumers look adjectives and animals up without parsing the HTML report.
+    The file is written in batches of BATCH_SIZE to a temporary file, atomically renamed once complete,
+    so a reader never sees a partial export.
+    """
+
+    SUFFIX = ""
+    BATCH_SIZE = 1000
+
+    def __init__(self, path: str):
+        """
+        MappingExport constructor
+        :param path: the export file path
+        """
+        self.path = path
+
+    def write(self, mapping: Mapping[str, List[Tuple[str, str]]], image_index: ImageIndex,
+              thumbnail_index: ImageIndex = None) -> str:
+        """
+        Export the mapping
+        :param mapping: mapping of the adjectives to their (animal_name, page_url) tuples
+        :param image_index: index of the downloaded images
+        :param thumbnail_index: index of the images thumbnails, if created
+        :return: the export file path
+        """
+        # a unique temporary file, concurrent exports to the same path don't write over each other
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", prefix=".",
+                                        suffix=f"{self.SUFFIX}.tmp")
+        os.close(fd)
+        try:
+            self._write(tmp_path, mapping, image_index, thumbnail_index)
+            set_default_mode(tmp_path)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return self.path
+
+    def _write(self, path: str, mapping: Mapping[str, List[Tuple[str, str]]], image_index: ImageIndex,
+               thumbnail_index: ImageIndex | None):
+        raise NotImplementedError("_write not implemented")
+
+    @staticmethod
+    def animal_paths(name: str, image_index: ImageIndex, thumbnail_index: ImageIndex | None) -> Tuple[str, str]:
+        """
+        :return: the (image path, thumbnail path) of an animal, None if it has none
+        """
+        return image_index.get(name), thumbnail_index.get(name) if thumbnail_index is not None else None
+
+
+class JSONLExport(MappingExport):
+    """
+    JSON Lines export, one line per adjective with its animals and their image paths, in the mapping order
+    """
+
+    SUFFIX = ".jsonl"
+
+    def _write(self, path: str, mapping: Mapping[str, List[Tuple[str, str]]], image_index: ImageIndex,
+               thumbnail_index: ImageIndex | None):
+        with open(path, "w", encoding="utf-8") as f:
+            lines = []
+            for adjective, animals in mapping.items():
+                records = []
+                for name, page_url in animals:
+                    image_path, thumbnail_path = self.animal_paths(name, image_index, thumbnail_index)
+                    records.append({"name": name, "page_url": page_url, "image_path": image_path,
+                                    "thumbnail_path": thumbnail_path})
+                lines.append(json.dumps({"adjective": adjective, "animals": records}, ensure_ascii=False))
+                if len(lines) >= self.BATCH_SIZE:
+                    f.write("\n".join(lines) + "\n")
+                    lines.clear()
+            if lines:
+                f.write("\n".join(lines) + "\n")
+
+
+class SQLiteExport(MappingExport):
+    """
+    SQLite export, indexed for lookups in both directions, see MappingIndex:
+    - adjectives: id, name (unique)
+    - animals: id, name, page_url (unique together), image_path, thumbnail_path
+    - adjective_animals: adjective_id, animal_id (primary key), position of the animal in the adjective list,
+      indexed by animal_id too
+    The rows are inserted in a transaction per BATCH_SIZE links, and the secondary index is built once loaded.
+    """
+
+    SUFFIX = ".sqlite"
+    SCHEMA = """
+        CREATE TABLE adjectives (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+        CREATE TABLE animals (id INTEGER PRIMARY KEY, name TEXT NOT NULL, page_url TEXT NOT NULL,
+                              image_path TEXT, thumbnail_path TEXT, UNIQUE (name, page_url));
+        CREATE TABLE adjective_animals (adjective_id INTEGER NOT NULL REFERENCES adjectives (id),
+                                        animal_id INTEGER NOT NULL REFERENCES animals (id),
+                                        position INTEGER NOT NULL,
+                                        PRIMARY KEY (adjective_id, animal_id)) WITHOUT ROWID;
+    """
+    INDEXES = """
+        CREATE INDEX adjective_animals_by_animal ON adjective_animals (animal_id, adjective_id);
+    """
+
+    def _write(self, path: str, mapping: Mapping[str, List[Tuple[str, str]]], image_index: ImageIndex,
+               thumbnail_index: ImageIndex | None):
+        # imported on use, the runs without a SQLite export don't pay for importing sqlite3
+        import sqlite3
+
+        connection = sqlite3.connect(path, isolation_level=None)
+        try:
+            # a temporary file, renamed once complete, there is nothing to recover on a crash
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.executescript(self.SCHEMA)
+            animal_ids: Dict[Tuple[str, str], int] = {}
+            adjectives, animals, links = [], [], []
+            for adjective_id, (adjective, adjective_animals) in enumerate(mapping.items(), start=1):
+                adjectives.append((adjective_id, adjective))
+                for position, (name, page_url) in enumerate(adjective_animals):
+                    animal_id = animal_ids.get((name, page_url))
+                    if animal_id is None:
+                        animal_id = animal_ids[name, page_url] = len(animal_ids) + 1
+                        animals.append((animal_id, name, page_url,
+                                        *self.animal_paths(name, image_index, thumbnail_index)))
+                    links.append((adjective_id, animal_id, position))
+                if len(links) >= self.BATCH_SIZE:
+                    self._insert(connection, adjectives, animals, links)
+            self._insert(connection, adjectives, animals, links)
+            connection.executescript(self.INDEXES)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _insert(connection: "sqlite3.Connection", adjectives: list, animals: list, links: list):
+        """
+        Insert a batch of rows in a single transaction, and clear the batch
+        """
+        connection.execute("BEGIN")
+        connection.executemany("INSERT INTO adjectives VALUES (?, ?)", adjectives)
+        connection.executemany("INSERT INTO animals VALUES (?, ?, ?, ?, ?)", animals)
+        # a value listed twice under a key (not deduped mappings) is exported once
+        connection.executemany("INSERT OR IGNORE INTO adjective_animals VALUES (?, ?, ?)", links)
+        connection.execute("COMMIT")
+        for batch in (adjectives, animals, links):
+            batch.clear()
+
+
+EXPORTS = {"sqlite": SQLiteExport, "jsonl": JSONLExport}
+
+
+def export_for(export_format: str, path_prefix: str) -> MappingExport:
+    """
+    :param export_format: one of EXPORTS
+    :param path_prefix: the export file path, without the format suffix
+    :return: the export of the format
+    """
+    export_class = EXPORTS[export_format]
+    return export_class(f"{path_prefix}{export_class.SUFFIX}")
+
+
+class MappingIndex:
+    """
+    Read only query API over a SQLite export, every lookup is an index search
+    """
+
+    def __init__(self, path: str):
+        """
+        MappingIndex constructor
+        :param path: the SQLite export path
+        """
+        import sqlite3
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def adjectives(self) -> Iterator[str]:
+        """
+        :return: iterator of the adjectives, in the mapping order
+        """
+        return (name for name, in self.connection.execute("SELECT name FROM adjectives ORDER BY id"))
+
+    def animals_of(self, adjective: str) -> List[Tuple[str, str, str | None]]:
+        """
+        :param adjective: the adjective
+        :return: list of (animal name, page url, image path) of the animals of the adjective, in the mapping order.
+        Empty if the adjective is unknown
+        """
+        return self.connection.execute(
+            "SELECT animals.name, animals.page_url, animals.image_path FROM adjectives "
+            "JOIN adjective_animals ON adjective_animals.adjective_id = adjectives.id "
+            "JOIN animals ON animals.id = adjective_animals.animal_id "
+            "WHERE adjectives.name = ? ORDER BY adjective_animals.position", (adjective,)).fetchall()
+
+    def adjectives_of(self, animal: str) -> List[str]:
+        """
+        :param animal: the animal name
+        :return: the adjectives listing the animal, in the mapping order. Empty if the animal is unknown
+        """
+        return [name for name, in self.connection.execute(
+            "SELECT adjectives.name FROM animals "
+            "JOIN adjective_animals ON adjective_animals.animal_id = animals.id "
+            "JOIN adjectives ON adjectives.id = adjective_animals.adjective_id "
+            "WHERE animals.name = ? ORDER BY adjectives.id", (animal,))]
+
+    def image_path(self, animal: str, page_url: str = None) -> str | None:
+        """
+        :param animal: the animal name
+        :param page_url: the animal page url, the first animal of that name in the mapping order if not given
+        :return: the image file path of the animal, None if it has no image or is unknown
+        """
+        if page_url is None:
+            row = self.connection.execute("SELECT image_path FROM animals WHERE name = ? AND image_path IS NOT NULL "
+                                          "ORDER BY id LIMIT 1", (animal,)).fetchone()
+        else:
+            row = self.connection.execute("SELECT image_path FROM animals WHERE name = ? AND page_url = ?",
+                                          (animal, page_url)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "MappingIndex":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,160 @@
+import asyncio
+
+import aiohttp
+
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import HostThrottle, is_transient
+from components.fetchers.response_cache import ResponseCache, CacheMissError
+from components.metrics.metrics import Metrics
+
+
+class AsyncHTMLFetcher:
+    """
+    Async counterpart of BaseHTMLFetcher, fetching through a shared aiohttp client session.
+    """
+
+    DEFAULT_AGENT = BaseHTMLFetcher.DEFAULT_AGENT
+
+    def __init__(self, url: str, session: aiohttp.ClientSession, user_aget: str = None, timeout: int = None,
+                 cache: ResponseCache = None, throttle: HostThrottle = None) -> None:
+        """
+        AsyncHTMLFetcher constructor.
+        :param url: URL to fetch.
+        :param session: aiohttp client session holding the connection pool.
+        :param user_aget: User-agent string to use for fetching.
+        :param timeout: Timeout in seconds for the request
+        :param cache: on-disk response cache to revalidate against, no caching if not given
+        :param throttle: per host throttle to send the request through, retrying transient failures with backoff.
+        Not throttled nor retried if not given
+        """
+        self.url = url
+        self.session = session
+        self.user_agent = user_aget or self.DEFAULT_AGENT
+        self.timeout = timeout
+        self.cache = cache
+        self.throttle = throttle
+        self.response_headers = None
+        self.from_cache = False
+
+    async def fetch_content(self) -> bytes:
+        """
+        fetch HTML page content.
+        :return: the response content
+        """
+        metrics = Metrics.default()
+        if self.cache and self.cache.offline:
+            cached = self.cache.get(self.url)
+            if cached is None:
+                raise CacheMissError(f"{self.url} is not cached, can not fetch it offline")
+            metrics.inc("cache_hits")
+            return cached.content
+
+        with metrics.timer("fetch"):
+            if not self.throttle:
+                return await self._request_content()
+
+            for attempt in range(1, max(self.throttle.retries, 1) + 1):
+                try:
+                    async with self.throttle.async_slot(self.url):
+                        return await self._request_content()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= self.throttle.retries or not is_transient(e):
+                        raise
+                    metrics.inc("retries")
+                    await asyncio.sleep(self.throttle.backoff(attempt, e))
+
+    async def _request_content(self) -> bytes:
+        """
+        send the request, revalidating the cached response if any
+        :return: the response content
+        """
+        metrics = Metrics.default()
+        headers = {"User-Agent": self.user_agent}
+        if self.cache:
+            headers.update(self.cache.validators(self.url))
+
+        metrics.inc("requests")
+        async with self.session.get(self.url, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+            if self.cache and resp.status == 304:
+                cached = self.cache.get(self.url, revalidated=True)
+                if cached is not None:
+                    metrics.inc("cache_revalidated")
+                    return cached.content
+            else:
+                return await self._read_content(resp)
+
+        # the entry was evicted since the validators were sent, fetch it unconditionally
+        headers = {"User-Agent": self.user_agent}
+        metrics.inc("requests")
+        async with self.session.get(self.url, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+            return await self._read_content(resp)
+
+    async def _read_content(self, resp: aiohttp.ClientResponse) -> bytes:
+        """
+        read a response content, storing it in the cache if any
+        :param resp: the response
+        :return: the response content
+        """
+        resp.raise_for_status()
+        content = await resp.read()
+        Metrics.default().inc("bytes", len(content))
+        if self.cache:
+            self.cache.store(self.url, content, resp.headers)
+        return content
+
+    async def iter_chunks(self, chunk_size: int):
+        """
+        fetch page content as a stream of chunks, without holding the whole body in memory.
+        The response headers are set to response_headers (and from_cache) before the first chunk.
+        Streamed responses are not stored in the cache, the caller stores them once consumed.
+        :param chunk_size: maximum chunk size in bytes
+        :return: async iterator over the content chunks
+        """
+        metrics = Metrics.default()
+        headers = {"User-Agent": self.user_agent}
+        if self.cache:
+            cached = None
+            if self.cache.offline:
+                cached = self.cache.get(self.url)
+                if cached is None:
+                    raise CacheMissError(f"{self.url} is not cached, can not fetch it offline")
+                metrics.inc("cache_hits")
+            else:
+                headers.update(self.cache.validators(self.url))
+            if cached is not None:
+                self.response_headers = cached.headers
+                self.from_cache = True
+                for chunk in cached.iter_content(chunk_size=chunk_size):
+                    yield chunk
+                return
+
+        metrics.inc("requests")
+        async with self.session.get(self.url, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+            if self.cache and resp.status == 304:
+                cached = self.cache.get(self.url, revalidated=True)
+                if cached is not None:
+                    metrics.inc("cache_revalidated")
+                    self.response_headers = cached.headers
+                    self.from_cache = True
+                    for chunk in cached.iter_content(chunk_size=chunk_size):
+                        yield chunk
+                    return
+            else:
+                resp.raise_for_status()
+                self.response_headers = resp.headers
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    yield chunk
+                return
+
+        # the entry was evicted since the validators were sent, fetch it unconditionally
+        headers = {"User-Agent": self.user_agent}
+        metrics.inc("requests")
+        async with self.session.get(self.url, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=self.timeout)) as resp:
+            resp.raise_for_status()
+            self.response_headers = resp.headers
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                yield chunk
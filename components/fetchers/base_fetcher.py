@@ -1,5 +1,13 @@
+import time
+
 import requests
 
+from components.fetchers.host_throttle import HostThrottle, is_transient
+from components.fetchers.response_cache import ResponseCache, CacheMissError
+from components.metrics.metrics import Metrics
+from components.fetchers.session_pool import SessionPool
+
+
 class BaseHTMLFetcher:
     """
     Base class for fetching HTML pages.
@@ -7,25 +15,83 @@ class BaseHTMLFetcher:
 
     DEFAULT_AGENT = "Chrome/138.0.0.0 Safari/537.36"
 
-    def __init__(self, url: str, user_aget: str = None, timeout: int = None) -> None:
+    def __init__(self, url: str, user_aget: str = None, timeout: int = None,
+                 session_pool: SessionPool = None, cache: ResponseCache = None, throttle: HostThrottle = None) -> None:
         """
         BaseHTMLFetcher constructor.
         :param url: URL to fetch.
         :param user_aget: User-agent string to use for fetching.
         :param timeout: Timeout in seconds for the request
+        :param session_pool: keep-alive session pool to fetch through, the shared default pool if not given
+        :param cache: on-disk response cache to revalidate against, no caching if not given
+        :param throttle: per host throttle to send the request through, retrying transient failures with backoff.
+        Not throttled nor retried if not given
         """
         self.url = url
         self.user_agent = user_aget or self.DEFAULT_AGENT
         self.timeout = timeout
+        self.session_pool = session_pool or SessionPool.default()
+        self.cache = cache
+        self.throttle = throttle
 
-    def fetch(self):
+    def fetch(self, stream: bool = False):
         """
         fetch HTML page.
+        :param stream: if true, the body is not downloaded before returning, so it can be iterated in chunks.
+        Streamed responses are not stored in the cache, the caller stores them once consumed
+        :return: response
+        """
+        metrics = Metrics.default()
+        if self.cache and self.cache.offline:
+            cached = self.cache.get(self.url)
+            if cached is None:
+                raise CacheMissError(f"{self.url} is not cached, can not fetch it offline")
+            metrics.inc("cache_hits")
+            return cached
+
+        with metrics.timer("fetch"):
+            if not self.throttle:
+                return self._request(stream)
+
+            for attempt in range(1, max(self.throttle.retries, 1) + 1):
+                try:
+                    with self.throttle.slot(self.url):
+                        return self._request(stream)
+                except requests.exceptions.RequestException as e:
+                    if attempt >= self.throttle.retries or not is_transient(e):
+                        raise
+                    metrics.inc("retries")
+                    time.sleep(self.throttle.backoff(attempt, e))
+
+    def _request(self, stream: bool):
+        """
+        send the request, revalidating the cached response if any
+        :param stream: if true, the body is not downloaded before returning
         :return: response
         """
+        metrics = Metrics.default()
+        headers = {"User-Agent": self.user_agent}
+        if self.cache:
+            headers.update(self.cache.validators(self.url))
+
         try:
-            resp = requests.get(self.url, headers={"User-Agent": self.user_agent}, timeout=self.timeout)
+            metrics.inc("requests")
+            resp = self.session_pool.get(self.url, headers=headers, timeout=self.timeout, stream=stream)
+            if self.cache and resp.status_code == 304:
+                resp.close()
+                cached = self.cache.get(self.url, revalidated=True)
+                if cached is not None:
+                    metrics.inc("cache_revalidated")
+                    return cached
+                # the entry was evicted since the validators were sent, fetch it unconditionally
+                headers = {"User-Agent": self.user_agent}
+                metrics.inc("requests")
+                resp = self.session_pool.get(self.url, headers=headers, timeout=self.timeout, stream=stream)
             resp.raise_for_status()
+            if not stream:
+                metrics.inc("bytes", len(resp.content))
+                if self.cache:
+                    self.cache.store(self.url, resp.content, resp.headers)
             return resp
         except requests.exceptions.RequestException as e:
             raise e
@@ -0,0 +1,323 @@
+import asyncio
+import email.utils
+import random
+import sys
+import threading
+import time
+import urllib.parse as urlparse
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Mapping
+
+import requests
+
+# answers of an overloaded server, the host is slowed down and the request retried
+CONGESTION_STATUSES = {429, 503}
+RETRY_STATUSES = CONGESTION_STATUSES | {500, 502, 504}
+
+
+def retry_after(headers: Mapping[str, str] | None) -> float | None:
+    """
+    Parse the Retry-After header
+    :param headers: the response headers
+    :return: seconds to wait, None if the header is missing or invalid
+    """
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after_seconds: float = None, base: float = 0.5, cap: float = 30.0) -> float:
+    """
+    Exponential backoff with full jitter, never shorter than the server's Retry-After
+    :param attempt: the failed attempt number, starting at 1
+    :param retry_after_seconds: the Retry-After of the failed attempt, if any
+    :param base: the delay ceiling after the first attempt, in seconds
+    :param cap: the maximum delay ceiling, in seconds
+    :return: seconds to wait before the next attempt
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after_seconds is not None:
+        delay = max(delay, min(retry_after_seconds, cap))
+    return delay
+
+
+def _aiohttp():
+    """
+    :return: the aiohttp module if imported, None otherwise. It isn't imported here, so the threaded runs
+    don't pay for it, and its errors can't be raised before it is
+    """
+    return sys.modules.get("aiohttp")
+
+
+def error_response(error: BaseException) -> tuple:
+    """
+    Get the HTTP status and headers out of a failed request exception
+    :param error: the exception
+    :return: tuple of (status, headers), (None, None) if the request got no response
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code, error.response.headers
+    aiohttp = _aiohttp()
+    if aiohttp and isinstance(error, aiohttp.ClientResponseError):
+        return error.status, error.headers
+    return None, None
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    :param error: the exception of a failed request
+    :return: True if the request may succeed when retried (overload, server error, connection failure)
+    """
+    status, _ = error_response(error)
+    if status is not None:
+        return status in RETRY_STATUSES
+    aiohttp = _aiohttp()
+    if aiohttp and isinstance(error, aiohttp.ClientConnectionError):
+        return True
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              asyncio.TimeoutError))
+
+
+class AIMDLimit:
+    """
+    Additive increase / multiplicative decrease concurrency limit.
+    Grows while requests succeed, shrinks on overload answers, timeouts and connection errors only:
+    latency isn't a congestion signal, an image latency includes streaming its body and varies with its size.
+    Until the first decrease it grows by one per success (slow start), then by one per limit successes.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_factor: float = 0.5):
+        """
+        AIMDLimit constructor
+        :param initial: the initial limit
+        :param minimum: the lowest limit
+        :param maximum: the highest limit
+        :param decrease_factor: factor the limit is multiplied by on congestion
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = float(min(max(initial, minimum), maximum))
+        self.decrease_factor = decrease_factor
+        self.slow_start = True
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self.value)
+
+    def on_success(self):
+        """
+        Record a successful request
+        """
+        self.value = min(self.value + (1 if self.slow_start else 1 / self.value), self.maximum)
+
+    def on_congestion(self, cooldown: float = 0.0):
+        """
+        Record an overloaded or failed request, the limit is decreased at most once per cooldown
+        :param cooldown: seconds since the previous decrease under which the limit is kept
+        """
+        now = time.monotonic()
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.slow_start = False
+        self.value = max(self.value * self.decrease_factor, self.minimum)
+
+
+class _HostState:
+    def __init__(self, limit: AIMDLimit, rate: float | None, burst: int):
+        self.limit = limit
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.async_waiters: List[asyncio.Future] = []
+        self.counters = {"requests": 0, "throttled": 0, "congested": 0}
+
+    def reserve(self) -> float:
+        """
+        Take a token of the bucket, must be called under cond
+        :return: seconds to wait before sending the request
+        """
+        now = time.monotonic()
+        wait = max(self.paused_until - now, 0.0)
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens < 0:
+                wait = max(wait, -self.tokens / self.rate)
+        if wait:
+            self.counters["throttled"] += 1
+        return wait
+
+    def wake(self, everyone: bool = False):
+        """
+        Wake the threads and coroutines waiting for a free slot, must be called under cond
+        :param everyone: if true wake all waiters, else one of each kind
+        """
+        if everyone:
+            self.cond.notify_all()
+        else:
+            self.cond.notify()
+        while self.async_waiters:
+            waiter = self.async_waiters.pop(0)
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(lambda w=waiter: w.done() or w.set_result(None))
+                if not everyone:
+                    break
+
+
+class HostThrottle:
+    """
+    Per host request throttle shared by all fetchers, threads and coroutines:
+    - a token bucket limiting the request rate of each host (no rate limit if rate is not given)
+    - an AIMD adaptive limit of the concurrent requests of each host, starting at max_concurrency,
+      halved on 429 / 503 answers, timeouts and connection errors and growing back while requests succeed
+    - a pause of the whole host when it answers with a Retry-After
+    - the retry policy of the fetchers: retries attempts, with exponential backoff and jitter honoring Retry-After
+    """
+
+    DEFAULT_RETRIES = 3
+
+    def __init__(self, rate: float = None, burst: int = None, max_concurrency: int = 64, min_concurrency: int = 1,
+                 initial_concurrency: int = None, retries: int = DEFAULT_RETRIES,
+                 backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        """
+        HostThrottle constructor
+        :param rate: maximum requests per second to each host, no rate limit if not given
+        :param burst: amount of requests sent at once before the rate applies, the rate (at least 1) if not given
+        :param max_concurrency: highest concurrent requests limit of each host
+        :param min_concurrency: lowest concurrent requests limit of each host
+        :param initial_concurrency: starting concurrent requests limit of each host, max_concurrency if not given
+        :param retries: amount of attempts of a request failing with a transient error
+        :param backoff_base: the backoff delay ceiling after the first failed attempt, in seconds
+        :param backoff_cap: the maximum backoff delay, in seconds
+        """
+        self.rate = rate
+        self.burst = burst or max(int(rate or 1), 1)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.initial_concurrency = initial_concurrency or max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostState] = {}
+
+    def _host(self, url: str) -> _HostState:
+        host = urlparse.urlsplit(url).netloc
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None:
+                limit = AIMDLimit(self.initial_concurrency, self.min_concurrency, self.max_concurrency)
+                state = self._hosts[host] = _HostState(limit, self.rate, self.burst)
+            return state
+
+    @contextmanager
+    def slot(self, url: str):
+        """
+        Context of a request: waits for a free concurrency slot and a token of the url host,
+        and records the request outcome (latency, or the exception raised in the context) on exit
+        :param url: the requested url
+        """
+        state = self._host(url)
+        with state.cond:
+            while state.in_flight >= state.limit.limit:
+                state.cond.wait()
+            state.in_flight += 1
+            wait = state.reserve()
+        start = time.monotonic()
+        try:
+            if wait:
+                time.sleep(wait)
+                start = time.monotonic()
+            yield
+        except BaseException as e:
+            self._release(state, time.monotonic() - start, e)
+            raise
+        else:
+            self._release(state, time.monotonic() - start, None)
+
+    @asynccontextmanager
+    async def async_slot(self, url: str):
+        """
+        Async counterpart of slot, waiting without blocking the event loop
+        :param url: the requested url
+        """
+        state = self._host(url)
+        while True:
+            with state.cond:
+                if state.in_flight < state.limit.limit:
+                    state.in_flight += 1
+                    wait = state.reserve()
+                    break
+                waiter = asyncio.get_running_loop().create_future()
+                state.async_waiters.append(waiter)
+            await waiter
+        start = time.monotonic()
+        try:
+            if wait:
+                await asyncio.sleep(wait)
+                start = time.monotonic()
+            yield
+        except BaseException as e:
+            self._release(state, time.monotonic() - start, e)
+            raise
+        else:
+            self._release(state, time.monotonic() - start, None)
+
+    def _release(self, state: _HostState, latency: float, error: BaseException | None):
+        """
+        Free the slot of a request and feed its outcome to the host limit
+        :param state: the host state
+        :param latency: the request latency in seconds
+        :param error: the exception the request failed with, None if it succeeded
+        """
+        status, headers = error_response(error) if error is not None else (None, None)
+        with state.cond:
+            state.in_flight -= 1
+            state.counters["requests"] += 1
+            previous_limit = state.limit.limit
+            if error is None:
+                state.limit.on_success()
+            elif status in CONGESTION_STATUSES or (status is None and is_transient(error)):
+                state.counters["congested"] += 1
+                state.limit.on_congestion(cooldown=latency)
+                pause = retry_after(headers)
+                if pause:
+                    state.paused_until = max(state.paused_until, time.monotonic() + min(pause, self.backoff_cap))
+            state.wake(everyone=state.limit.limit > previous_limit)
+
+    def backoff(self, attempt: int, error: BaseException = None) -> float:
+        """
+        Delay before retrying a failed attempt
+        :param attempt: the failed attempt number, starting at 1
+        :param error: the exception the attempt failed with, its Retry-After is honored
+        :return: seconds to wait
+        """
+        _, headers = error_response(error) if error is not None else (None, None)
+        return backoff_delay(attempt, retry_after(headers), self.backoff_base, self.backoff_cap)
+
+    def stats(self) -> dict:
+        """
+        Throttle counters per host
+        :return: dict mapping host to its requests, throttled (delayed by rate or Retry-After) and congested counts,
+        and its current concurrency limit
+        """
+        with self._lock:
+            hosts = dict(self._hosts)
+        stats = {}
+        for host, state in hosts.items():
+            with state.cond:
+                stats[host] = {**state.counters, "limit": state.limit.limit}
+        return stats
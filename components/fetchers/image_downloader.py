@@ -1,52 +1,328 @@
+import asyncio
 import logging
 import os
+import tempfile
+import time
+from contextlib import nullcontext
+from typing import Iterable, Mapping
 
 from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import HostThrottle, backoff_delay, error_response, retry_after
+from components.fetchers.image_index import ImageIndex
+from components.fetchers.image_store import ImageStore
+from components.fetchers.response_cache import ResponseCache
+from components.fetchers.session_pool import SessionPool
+from components.metrics.metrics import Metrics
+from utils import set_default_mode
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+class IncompleteDownload(Exception):
+    pass
+
+
+class _AtomicFileWriter:
+    """
+    Writes a stream of chunks to a temporary file next to the file path, renamed to the file path only once
+    the stream completed and its size verified, so a crash never leaves a half written file behind.
+    """
+    def __init__(self, file_path: str, max_bytes: int = None):
+        """
+        _AtomicFileWriter constructor
+        :param file_path: final file path
+        :param max_bytes: maximum accepted size in bytes, no limit if not given
+        """
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.size = 0
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", prefix=".", suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise ImageTooLarge(f"{self.file_path} is larger than {self.max_bytes} bytes")
+        self.file.write(chunk)
+
+    def commit(self, expected_size: int | None):
+        """
+        Verify the written size and rename the temporary file to the file path
+        :param expected_size: the announced size, not verified if None
+        """
+        self.file.close()
+        if not self.size:
+            raise ValueError("Empty content")
+        if expected_size is not None and self.size != expected_size:
+            raise IncompleteDownload(f"Got {self.size} bytes of {expected_size} for {self.file_path}")
+        set_default_mode(self.tmp_path)
+        os.replace(self.tmp_path, self.file_path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
 
 
 class ImageDownloader:
     """
-    Class handler for downloading images from a url
+    Class handler for downloading images from a url.
+    Images are streamed to disk in chunks, so memory stays bounded by the chunk size.
     """
-    def __init__(self, url: str, file_name: str, directory: str, raise_on_error: bool = True):
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, url: str, file_name: str, directory: str, raise_on_error: bool = True,
+                 session_pool: SessionPool = None, cache: ResponseCache = None, max_bytes: int = None,
+                 chunk_size: int = CHUNK_SIZE, store: ImageStore = None, index: ImageIndex = None,
+                 throttle: HostThrottle = None):
         """
         ImageDownloader constructor
         :param url: url to download from
         :param file_name: file name to save to
         :param directory: directory to save to
         :param raise_on_error: raises exception if download fails
+        :param session_pool: keep-alive session pool to download through, the shared default pool if not given
+        :param cache: on-disk response cache to revalidate against, no caching if not given
+        :param max_bytes: maximum image size in bytes, larger images fail the download. No limit if not given
+        :param chunk_size: size in bytes of the streamed chunks
+        :param store: content addressed image store, if given an already stored url is linked instead of downloaded,
+        and an existing file is replaced instead of failing
+        :param index: image index to publish the downloaded image file path to
+        :param throttle: per host throttle to download through, its backoff policy spaces the retries.
+        Not throttled if not given
         """
         self.logger = logging.getLogger(__name__)
         self.url = url
+        self.file_name = file_name
+        self.store = store
+        self.index = index
         self.file_path = self.set_file_path(file_name, directory)
         self.raise_on_error = raise_on_error
+        self.session_pool = session_pool
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.throttle = throttle
 
     def download(self, retries: int = 3):
+        """
+        Download the image from the url, retries mechanism implemented.
+        With a store, the same url is downloaded once and later requests link the stored image.
+        :param retries: amount of times to retry download before raising exception
+        """
+        with Metrics.default().timer("download"):
+            if not self.store:
+                if self._download(retries):
+                    self.publish()
+                return
+
+            with self.store.url_lock(self.url):
+                if self.link_stored():
+                    self.publish()
+                    return
+                if self._download(retries):
+                    self.store.add_file(self.url, self.file_path)
+                    self.publish()
+
+    async def download_async(self, session, retries: int = 3):
+        """
+        Download the image from the url through an aiohttp session, retries mechanism implemented
+        With a store, the same url is downloaded once and later requests link the stored image.
+        The store linking and hashing run in the loop executor, off the event loop.
+        :param session: aiohttp client session to download through
+        :param retries: amount of times to retry download before raising exception
+        """
+        with Metrics.default().timer("download"):
+            if not self.store:
+                if await self._download_async(session, retries):
+                    self.publish()
+                return
+
+            loop = asyncio.get_running_loop()
+            async with self.store.async_url_lock(self.url):
+                if await loop.run_in_executor(None, self.link_stored):
+                    self.publish()
+                    return
+                if await self._download_async(session, retries):
+                    await loop.run_in_executor(None, self.store.add_file, self.url, self.file_path)
+                    self.publish()
+
+    def publish(self):
+        """
+        Publish the downloaded image file path to the image index, if any
+        """
+        if self.index is not None:
+            self.index.add(self.file_name, self.file_path)
+
+    def link_stored(self) -> bool:
+        """
+        Link the file path to the stored image of the url, if any
+        :return: True if the url was already stored
+        """
+        object_path = self.store.lookup(self.url)
+        if not object_path:
+            return False
+        self.store.link_to(object_path, self.file_path)
+        Metrics.default().inc("images_linked")
+        self.logger.info(f"Image of {self.url} already stored, linked to: {self.file_path}")
+        return True
+
+    def _download(self, retries: int) -> bool:
         """
         Download the image from the url, retries mechanism implemented
         :param retries: amount of times to retry download before raising exception
+        :return: True if downloaded
         """
         last_exception = None
         for attempt in range(1, retries + 1):
             try:
-                response = BaseHTMLFetcher(url=self.url, timeout=10).fetch()
-                if not response.content:
-                    raise ValueError("Empty content")
+                # the whole attempt holds the throttle slot, so the body streaming counts in the host concurrency
+                with self.throttle.slot(self.url) if self.throttle else nullcontext():
+                    response = BaseHTMLFetcher(url=self.url, timeout=10, session_pool=self.session_pool,
+                                               cache=self.cache).fetch(stream=True)
+                    try:
+                        self.save_stream(response.iter_content(chunk_size=self.chunk_size), response.headers)
+                    finally:
+                        response.close()
+
+                if self.cache and not getattr(response, "from_cache", False):
+                    self.cache.store_file(self.url, self.file_path, response.headers)
+                Metrics.default().inc("images_downloaded")
+                return True
 
-                img_data = response.content
-                with open(self.file_path, "wb") as f:
-                    f.write(img_data)
+            except ImageTooLarge as e:
+                last_exception = e
+                self.logger.warning(f"Attempt {attempt} | Error downloading image: {e}")
+                break
+
+            except Exception as e:
+                last_exception = e
+                self.logger.warning(f"Attempt {attempt} | Error downloading image: {e}", exc_info=True)
+                if attempt < retries:
+                    Metrics.default().inc("download_retries")
+                    time.sleep(self.retry_delay(attempt, e))
+
+        if last_exception:
+            Metrics.default().inc("download_failures")
+        if self.raise_on_error and last_exception:
+            raise last_exception
+        return False
+
+    async def _download_async(self, session, retries: int) -> bool:
+        """
+        Download the image from the url through an aiohttp session, retries mechanism implemented.
+        The file writes run in the loop executor, off the event loop
+        :param session: aiohttp client session to download through
+        :param retries: amount of times to retry download before raising exception
+        :return: True if downloaded
+        """
+        # imported on use, the threaded downloads don't pay for importing aiohttp
+        from components.fetchers.async_fetcher import AsyncHTMLFetcher
+
+        loop = asyncio.get_running_loop()
+        last_exception = None
+        for attempt in range(1, retries + 1):
+            try:
+                fetcher = AsyncHTMLFetcher(url=self.url, session=session, timeout=10, cache=self.cache)
+                writer = None
+                try:
+                    async with self.throttle.async_slot(self.url) if self.throttle else nullcontext():
+                        async for chunk in fetcher.iter_chunks(self.chunk_size):
+                            if writer is None:
+                                self.check_content_length(fetcher.response_headers)
+                                writer = await loop.run_in_executor(None, _AtomicFileWriter, self.file_path,
+                                                                    self.max_bytes)
+                            await loop.run_in_executor(None, writer.write, chunk)
+                    if writer is None:
+                        raise ValueError("Empty content")
+                    await loop.run_in_executor(None, writer.commit, self.expected_size(fetcher.response_headers))
+                    Metrics.default().inc("image_bytes", writer.size)
+                except BaseException:
+                    if writer:
+                        writer.abort()
+                    raise
 
                 self.logger.info(f"Image downloaded successfully to: {self.file_path}")
+                if self.cache and not fetcher.from_cache:
+                    await loop.run_in_executor(None, self.cache.store_file, self.url, self.file_path,
+                                               fetcher.response_headers)
+                Metrics.default().inc("images_downloaded")
+                return True
 
-                return
+            except ImageTooLarge as e:
+                last_exception = e
+                self.logger.warning(f"Attempt {attempt} | Error downloading image: {e}")
+                break
 
             except Exception as e:
                 last_exception = e
                 self.logger.warning(f"Attempt {attempt} | Error downloading image: {e}", exc_info=True)
+                if attempt < retries:
+                    Metrics.default().inc("download_retries")
+                    await asyncio.sleep(self.retry_delay(attempt, e))
 
+        if last_exception:
+            Metrics.default().inc("download_failures")
         if self.raise_on_error and last_exception:
             raise last_exception
+        return False
+
+    def retry_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Delay before retrying a failed attempt, exponential backoff with jitter honoring Retry-After
+        :param attempt: the failed attempt number, starting at 1
+        :param error: the exception the attempt failed with
+        :return: seconds to wait
+        """
+        if self.throttle:
+            return self.throttle.backoff(attempt, error)
+        return backoff_delay(attempt, retry_after(error_response(error)[1]))
+
+    def save_stream(self, chunks: Iterable[bytes], headers: Mapping[str, str]):
+        """
+        Write the downloaded image chunks to a temporary file, atomically renamed to the file path
+        once the size is verified against max_bytes and the Content-Length header
+        :param chunks: the image content chunks
+        :param headers: the response headers
+        """
+        self.check_content_length(headers)
+        writer = _AtomicFileWriter(self.file_path, self.max_bytes)
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+            writer.commit(self.expected_size(headers))
+            Metrics.default().inc("image_bytes", writer.size)
+        except BaseException:
+            writer.abort()
+            raise
+
+        self.logger.info(f"Image downloaded successfully to: {self.file_path}")
+
+    @staticmethod
+    def expected_size(headers: Mapping[str, str] | None) -> int | None:
+        """
+        Get the expected body size out of the response headers
+        :param headers: the response headers
+        :return: the Content-Length, None if missing or the body is encoded (the chunks are decoded)
+        """
+        if not headers or headers.get("Content-Encoding", "identity") != "identity":
+            return None
+        content_length = headers.get("Content-Length")
+        return int(content_length) if content_length and content_length.isdigit() else None
+
+    def check_content_length(self, headers: Mapping[str, str] | None):
+        """
+        Fail fast if the announced size exceeds max_bytes
+        :param headers: the response headers
+        """
+        expected_size = self.expected_size(headers)
+        if self.max_bytes and expected_size and expected_size > self.max_bytes:
+            raise ImageTooLarge(f"{self.url} is {expected_size} bytes, larger than {self.max_bytes} bytes")
 
     def set_file_path(self, file_name: str, directory: str) -> str:
         """
@@ -59,7 +335,7 @@ class ImageDownloader:
         file_name = f"{file_name}{file_format}"
         file_path = os.path.join(directory, file_name)
 
-        if os.path.exists(file_path):
+        if os.path.exists(file_path) and not self.store:
             self.logger.error(f"Failed to set file path {file_path} to {file_name}, file already exists")
             raise FileExistsError(f"File {file_name} already exists in {os.path.dirname(file_path)}")
 
@@ -0,0 +1,68 @@
+import os
+import threading
+from typing import Dict
+
+
+class ImageIndex:
+    """
+    In-memory index of the downloaded images, mapping each image name to its file path.
+    Downloaders publish to it, so consumers look images up without probing the file system.
+    """
+
+    IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".tif", ".tiff", ".bmp"}
+
+    def __init__(self, paths: Dict[str, str] = None):
+        """
+        ImageIndex constructor
+        :param paths: initial mapping of image name to file path
+        """
+        self._lock = threading.Lock()
+        self._paths: Dict[str, str] = {}
+        self._lower_paths: Dict[str, str] = {}
+        for name, path in (paths or {}).items():
+            self.add(name, path)
+
+    @classmethod
+    def from_directory(cls, directory: str) -> "ImageIndex":
+        """
+        Build the index with a single scan of a directory, every image file is indexed by its name without extension
+        :param directory: the images directory
+        :return: the image index
+        """
+        paths = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name, extension = os.path.splitext(entry.name)
+                    if extension.lower() in cls.IMAGE_EXTENSIONS and not entry.name.startswith(".") \
+                            and entry.is_file():
+                        paths[name] = entry.path
+        return cls(paths)
+
+    def add(self, name: str, path: str):
+        """
+        Index an image
+        :param name: the image name
+        :param path: the image file path
+        """
+        with self._lock:
+            self._paths[name] = path
+            self._lower_paths[name.lower()] = path
+
+    def get(self, name: str) -> str | None:
+        """
+        Get the file path of an image, matching the name case-insensitively if there is no exact match
+        :param name: the image name
+        :return: the image file path, None if not indexed
+        """
+        return self._paths.get(name) or self._lower_paths.get(name.lower())
+
+    def items(self) -> Dict[str, str]:
+        """
+        :return: copy of the mapping of image name to file path
+        """
+        with self._lock:
+            return dict(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
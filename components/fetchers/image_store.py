@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+
+
+class ImageStore:
+    """
+    Content addressed image store.
+    Every image is stored once under its content hash, and indexed by the urls it was downloaded from,
+    so identical images are fetched and stored once across animals and runs.
+    The per animal files are hard links (or symlinks, or copies where links are not supported) to the stored images.
+    """
+
+    OBJECTS_DIR = "objects"
+    INDEX_FILE = "urls.jsonl"
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, root_dir: str):
+        """
+        ImageStore constructor
+        :param root_dir: directory to keep the stored images and the url index in
+        """
+        self.logger = logging.getLogger(__name__)
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        # event loop to its url locks, an asyncio lock belongs to a single loop
+        self._async_url_locks = weakref.WeakKeyDictionary()
+        self._counters = {"stored": 0, "deduplicated": 0, "linked": 0}
+
+        os.makedirs(os.path.join(self.root_dir, self.OBJECTS_DIR), exist_ok=True)
+        self._urls = self._load_index()
+
+    def _load_index(self) -> Dict[str, str]:
+        """
+        Load the url index, later lines win
+        :return: dictionary mapping url to its stored image path, relative to the root dir
+        """
+        urls = {}
+        index_path = os.path.join(self.root_dir, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return urls
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    urls[entry["url"]] = entry["object"]
+                except (ValueError, KeyError):
+                    # a crash may leave a truncated last line
+                    self.logger.warning(f"Ignoring corrupted image store index line: {line!r}")
+        return urls
+
+    @contextmanager
+    def url_lock(self, url: str):
+        """
+        Lock a url, so concurrent downloads of the same url fetch it once
+        :param url: the image url
+        """
+        with self._lock:
+            lock = self._url_locks.setdefault(url, threading.Lock())
+        with lock:
+            yield
+
+    @asynccontextmanager
+    async def async_url_lock(self, url: str):
+        """
+        Async counterpart of url_lock, so concurrent coroutines of an event loop fetch a url once
+        :param url: the image url
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            lock = self._async_url_locks.setdefault(loop, {}).setdefault(url, asyncio.Lock())
+        async with lock:
+            yield
+
+    def lookup(self, url: str) -> str | None:
+        """
+        Get the stored image of a url
+        :param url: the image url
+        :return: path of the stored image, None if the url was never stored
+        """
+        with self._lock:
+            relative_path = self._urls.get(url)
+        if relative_path is None:
+            return None
+        object_path = os.path.join(self.root_dir, relative_path)
+        return object_path if os.path.exists(object_path) else None
+
+    def add_file(self, url: str, file_path: str) -> str:
+        """
+        Store a downloaded image file. If an identical image is already stored,
+        the file is replaced by a link to it.
+        :param url: the url the image was downloaded from
+        :param file_path: the downloaded image path
+        :return: path of the stored image
+        """
+        relative_path = self._relative_path(file_path)
+        object_path = os.path.join(self.root_dir, relative_path)
+
+        with self._lock:
+            if os.path.exists(object_path):
+                self.link(object_path, file_path)
+                self._counters["deduplicated"] += 1
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                self.link(file_path, object_path, allow_symlink=False)
+                self._counters["stored"] += 1
+
+            self._urls[url] = relative_path
+            with open(os.path.join(self.root_dir, self.INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"url": url, "object": relative_path}) + "\n")
+
+        return object_path
+
+    def remove_file(self, file_path: str):
+        """
+        Remove the stored image of a file, so the image takes no space once its per animal files are removed.
+        Its urls are downloaded again if ever needed
+        :param file_path: a per animal file of the stored image
+        """
+        object_path = os.path.join(self.root_dir, self._relative_path(file_path))
+        with self._lock:
+            try:
+                os.remove(object_path)
+            except FileNotFoundError:
+                pass
+
+    def _relative_path(self, file_path: str) -> str:
+        """
+        :param file_path: an image file
+        :return: path of the stored image of the file content, relative to the root dir
+        """
+        digest = self.file_hash(file_path)
+        extension = os.path.splitext(file_path)[1]
+        return os.path.join(self.OBJECTS_DIR, digest[:2], f"{digest}{extension}")
+
+    def link_to(self, object_path: str, file_path: str):
+        """
+        Link a per animal file to a stored image
+        :param object_path: the stored image path
+        :param file_path: the per animal file path
+        """
+        self.link(object_path, file_path)
+        with self._lock:
+            self._counters["linked"] += 1
+
+    @staticmethod
+    def link(source_path: str, target_path: str, allow_symlink: bool = True):
+        """
+        Atomically point target path to the source file, with a hard link, a symlink or a copy,
+        the first one supported by the file system.
+        :param source_path: existing file
+        :param target_path: path to create or replace
+        :param allow_symlink: if false, falls back from hard link straight to a copy
+        """
+        if os.path.exists(target_path) and os.path.samefile(source_path, target_path):
+            return
+        tmp_path = f"{target_path}.{os.getpid()}.{threading.get_ident()}.link"
+        try:
+            os.link(source_path, tmp_path)
+        except OSError:
+            linked = False
+            if allow_symlink:
+                try:
+                    os.symlink(os.path.abspath(source_path), tmp_path)
+                    linked = True
+                except OSError:
+                    pass
+            if not linked:
+                shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, target_path)
+
+    @classmethod
+    def file_hash(cls, file_path: str) -> str:
+        """
+        Content hash of a file
+        :param file_path: the file path
+        :return: sha256 hex digest
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(cls.HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def stats(self) -> dict:
+        """
+        Store counters
+        :return: dict with stored (new images), deduplicated (identical content) and linked (known url) counts
+        """
+        with self._lock:
+            return {**self._counters, "urls": len(self._urls)}
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, IO, Mapping
+
+import requests
+
+
+class CacheMissError(requests.exceptions.RequestException):
+    pass
+
+
+class ResponseCache:
+    """
+    Persistent on-disk HTTP response cache.
+    Stores response bodies with their ETag / Last-Modified validators, so fetchers can send conditional
+    requests and serve 304 answers from disk. The cache is bounded in size, least recently used entries are evicted.
+    """
+
+    DEFAULT_MAX_BYTES = 1024 ** 3
+    BODY_SUFFIX = ".body"
+    META_SUFFIX = ".json"
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES, offline: bool = False):
+        """
+        ResponseCache constructor
+        :param cache_dir: directory to store the cached responses in
+        :param max_bytes: maximum total size of the cached bodies, in bytes
+        :param offline: if true, fetchers never hit the network and only serve cached responses
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._entries = self._load_index()
+        self._total_bytes = sum(meta["size"] for meta in self._entries.values())
+
+    def _load_index(self) -> Dict[str, dict]:
+        """
+        Load the metadata of all cached entries from disk
+        :return: dictionary mapping entry key to its metadata
+        """
+        entries = {}
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(self.META_SUFFIX):
+                continue
+            key = file_name[:-len(self.META_SUFFIX)]
+            try:
+                with open(os.path.join(self.cache_dir, file_name), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                # the body mtime is touched on every hit, so it keeps the LRU order across runs
+                meta["last_access"] = os.path.getmtime(self._path(key, self.BODY_SUFFIX))
+                entries[key] = meta
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Ignoring corrupted cache entry {file_name}: {e}")
+        return entries
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        Cache key of a url
+        :param url: the url
+        :return: the key
+        """
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def _write_atomic(self, path: str, write: Callable[[IO], None], mode: str = "wb"):
+        """
+        Write a file aside and rename it in place, so a reader never sees a partial file.
+        The temporary file is unique across the processes sharing the cache directory
+        :param path: the file path
+        :param write: function writing the content to the open temporary file
+        :param mode: the temporary file open mode
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".", suffix=".tmp")
+        try:
+            with open(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """
+        Conditional request headers for a cached url
+        :param url: the url
+        :return: If-None-Match / If-Modified-Since headers, empty if url is not cached
+        """
+        with self._lock:
+            meta = self._entries.get(self.key(url))
+        if not meta:
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def get(self, url: str, revalidated: bool = False) -> requests.Response | None:
+        """
+        Get a cached response
+        :param url: the url
+        :param revalidated: true if the server answered 304 for this url
+        :return: the cached response, None if url is not cached
+        """
+        key = self.key(url)
+        with self._lock:
+            meta = self._entries.get(key)
+            if meta is None:
+                return None
+            meta["last_access"] = time.time()
+            self._counters["revalidated" if revalidated else "hits"] += 1
+
+        body_path = self._path(key, self.BODY_SUFFIX)
+        try:
+            with open(body_path, "rb") as f:
+                content = f.read()
+            os.utime(body_path)
+        except OSError:
+            self._remove(key)
+            return None
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers.update(meta.get("headers", {}))
+        response._content = content
+        response._content_consumed = True
+        response.from_cache = True
+        return response
+
+    def store(self, url: str, content: bytes, headers: Mapping[str, str]) -> None:
+        """
+        Store a response body with its validators
+        :param url: the requested url
+        :param content: the response body
+        :param headers: the response headers
+        """
+        key = self.key(url)
+        content = content or b""
+        self._write_atomic(self._path(key, self.BODY_SUFFIX), lambda f: f.write(content))
+        self._store_meta(key, url, len(content), headers)
+
+    def store_file(self, url: str, file_path: str, headers: Mapping[str, str]) -> None:
+        """
+        Store a response body already written to a file, without loading it to memory
+        :param url: the requested url
+        :param file_path: path of the file holding the response body
+        :param headers: the response headers
+        """
+        key = self.key(url)
+        body_path = self._path(key, self.BODY_SUFFIX)
+
+        def copy(f: IO):
+            with open(file_path, "rb") as source:
+                shutil.copyfileobj(source, f)
+
+        self._write_atomic(body_path, copy)
+        self._store_meta(key, url, os.path.getsize(body_path), headers)
+
+    def _store_meta(self, key: str, url: str, size: int, headers: Mapping[str, str]) -> None:
+        """
+        Store the metadata of a stored body and index it
+        :param key: the entry key
+        :param url: the requested url
+        :param size: the body size
+        :param headers: the response headers
+        """
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "headers": {k: v for k, v in headers.items() if k.lower() == "content-type"},
+            "size": size,
+        }
+        # written aside and renamed like the body, so a crash never leaves a truncated sidecar behind
+        self._write_atomic(self._path(key, self.META_SUFFIX), lambda f: json.dump(meta, f), mode="w")
+        meta["last_access"] = time.time()
+
+        with self._lock:
+            previous = self._entries.get(key)
+            self._total_bytes += meta["size"] - (previous["size"] if previous else 0)
+            self._entries[key] = meta
+            self._counters["stored"] += 1
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Evict least recently used entries until the cache fits in max_bytes
+        """
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            by_access = sorted(self._entries.items(), key=lambda item: item[1]["last_access"])
+            to_remove = []
+            total = self._total_bytes
+            for key, meta in by_access:
+                if total <= self.max_bytes:
+                    break
+                to_remove.append(key)
+                total -= meta["size"]
+
+        for key in to_remove:
+            self._remove(key)
+            with self._lock:
+                self._counters["evicted"] += 1
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            meta = self._entries.pop(key, None)
+            if meta:
+                self._total_bytes -= meta["size"]
+        for suffix in (self.BODY_SUFFIX, self.META_SUFFIX):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        """
+        Cache counters
+        :return: dict with hits (served offline), revalidated (304), stored (downloaded) and evicted counts
+        and the cache size
+        """
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries), "bytes": self._total_bytes}
@@ -0,0 +1,97 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class SessionPool:
+    """
+    Thread safe, keep-alive HTTP session pool shared between fetchers.
+    Wraps a single requests.Session whose adapters hold a connection pool per host,
+    so consecutive requests to the same host reuse the open TCP/TLS connection.
+    """
+
+    DEFAULT_POOL_CONNECTIONS = 10
+    DEFAULT_POOL_MAXSIZE = 10
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, pool_connections: int = DEFAULT_POOL_CONNECTIONS, pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                 pool_block: bool = False) -> None:
+        """
+        SessionPool constructor
+        :param pool_connections: number of hosts to keep a connection pool for
+        :param pool_maxsize: maximum number of connections kept alive per host
+        :param pool_block: if true, requests wait for a free connection instead of opening an extra one
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._adapters = (adapter,)
+
+    @classmethod
+    def default(cls) -> "SessionPool":
+        """
+        Get the process wide shared session pool, creating it on first use
+        :return: the shared session pool
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @classmethod
+    def set_default(cls, pool: "SessionPool | None") -> None:
+        """
+        Replace the process wide shared session pool
+        :param pool: the session pool to share, None to reset to a lazily created one
+        """
+        with cls._default_lock:
+            cls._default = pool
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request through the pooled session
+        :param method: HTTP method
+        :param url: URL to request
+        :return: response
+        """
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request through the pooled session
+        :param url: URL to request
+        :return: response
+        """
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """
+        Connection reuse counters, summed over all host pools
+        :return: dict with requests, connections opened and reused connections count
+        """
+        num_requests = 0
+        num_connections = 0
+        for adapter in self._adapters:
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+        return {
+            "requests": num_requests,
+            "connections": num_connections,
+            "reused": max(num_requests - num_connections, 0),
+        }
+
+    def close(self) -> None:
+        """
+        Close the session and all its pooled connections
+        """
+        self.session.close()
@@ -1,13 +1,24 @@
 import os
-from typing import Any
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
 
-from utils import load_yaml
+from utils import load_yaml, set_default_mode
 
 
 class HTMLGenerator:
     """
     Base class for generating HTML pages.
+    Subclasses implement either generate (the whole page as a string) or generate_chunks (the page as a stream
+    of chunks), the other one is derived. Pages are written chunk by chunk to a temporary file, atomically renamed
+    once complete, so memory stays bounded by the chunk size when generate_chunks is implemented.
     """
+
+    WRITE_BUFFER_SIZE = 1024 * 1024
+    # config path to its (modification time, config), a long running process loads each config once
+    _configs: Dict[str, Tuple[float, dict]] = {}
+    _configs_lock = threading.Lock()
+
     def __init__(self, output_dir: str, output_file_name: str, config_path: str):
         """
         HTMLGenerator constructor.
@@ -15,29 +26,88 @@ class HTMLGenerator:
         :param output_file_name: output file name
         :param config_path: path to config file
         """
-        self.config = load_yaml(config_path)
+        self.config = self.load_config(config_path)
         self.output_dir = output_dir
         self.output_file_name = output_file_name
 
+    @classmethod
+    def load_config(cls, config_path: str) -> dict:
+        """
+        Load a config file, reloaded only once modified. The config is shared, it must not be modified
+        :param config_path: path to config file
+        :return: the config
+        """
+        mtime = os.path.getmtime(config_path)
+        with cls._configs_lock:
+            cached = cls._configs.get(config_path)
+            if cached is None or cached[0] != mtime:
+                cached = cls._configs[config_path] = (mtime, load_yaml(config_path))
+        return cached[1]
+
+    @property
+    def file_path(self) -> str:
+        return os.path.join(self.output_dir, f"{self.output_file_name}.html")
+
     def save_file(self, html: str) -> str:
         """
         save html to file.
-        :param html:
-        :return:
+        :param html: the html page
+        :return: the html page file path
         """
-        file_path = os.path.join(self.output_dir, f"{self.output_file_name}.html")
+        return self.save_chunks([html])
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(html)
+    def save_chunks(self, chunks: Iterable[str], file_path: str = None) -> str:
+        """
+        write html chunks to a buffered temporary file, renamed to the file path once all chunks are written
+        :param chunks: the html page chunks
+        :param file_path: path to write to, the output file path if not given
+        :return: the html page file path
+        """
+        file_path = file_path or self.file_path
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path) or ".", prefix=".", suffix=".html.part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", buffering=self.WRITE_BUFFER_SIZE) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            set_default_mode(tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
 
         return file_path
 
     def generate(self, data: Any) -> str:
         """
-        abstract method for generating HTML pages logic
+        abstract method for generating HTML pages logic, joins generate_chunks if only that one is implemented
         :param data: data for the html page generation
+        :return: the html page
         """
-        raise NotImplementedError("This method must be implemented in subclass")
+        if type(self).generate_chunks is HTMLGenerator.generate_chunks:
+            raise NotImplementedError("This method must be implemented in subclass")
+        return "".join(self.generate_chunks(data))
+
+    def generate_chunks(self, data: Any) -> Iterator[str]:
+        """
+        generate the HTML page as a stream of chunks, a single chunk if only generate is implemented
+        :param data: data for the html page generation
+        :return: iterator over the html page chunks
+        """
+        if type(self).generate is HTMLGenerator.generate:
+            raise NotImplementedError("This method must be implemented in subclass")
+        yield self.generate(data)
+
+    def generate_to(self, data: Any, f: TextIO):
+        """
+        generate the HTML page to an open text file handle, chunk by chunk
+        :param data: data for the html page generation
+        :param f: the file handle to write to
+        """
+        for chunk in self.generate_chunks(data):
+            f.write(chunk)
 
     def generate_and_save(self, data: Any) -> str:
         """
@@ -45,7 +115,4 @@ class HTMLGenerator:
         :param data: data for the html page generation
         :return: the html page file path
         """
-        data = self.generate(data)
-        file_path = self.save_file(data)
-        return file_path
-
+        return self.save_chunks(self.generate_chunks(data))
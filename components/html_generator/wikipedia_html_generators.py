@@ -1,10 +1,13 @@
+import html
 import os
-from typing import Dict, Tuple, List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Tuple, List
 
+from components.fetchers.image_index import ImageIndex
 from components.html_generator.html_generator import HTMLGenerator
 
 
-
 class WikipediaCollateralAdjectiveHTMLGenerator(HTMLGenerator):
     """
     HTML generator for Wikipedia collateral adjectives of animals
@@ -14,48 +17,168 @@ class WikipediaCollateralAdjectiveHTMLGenerator(HTMLGenerator):
         "wikipedia_html_generator_config.yaml"
     )
 
-    def __init__(self, output_dir: str, output_file_name: str, config_path: str = DEFAULT_CONFIG_PATH):
+    PAGE_BY_LETTER = "letter"
+    PAGE_BY_ROWS = "rows"
+    PAGE_BY = (PAGE_BY_LETTER, PAGE_BY_ROWS)
+    DEFAULT_PAGE_SIZE = 500
+    MAX_WORKERS = 4
+
+    def __init__(self, output_dir: str, output_file_name: str, config_path: str = DEFAULT_CONFIG_PATH,
+                 image_index: ImageIndex = None, page_by: str = None, page_size: int = DEFAULT_PAGE_SIZE,
+                 max_workers: int = MAX_WORKERS, thumbnail_index: ImageIndex = None):
         """
         WikipediaCollateralAdjectiveHTMLGenerator constructor
         :param output_dir: output directory
         :param output_file_name: output file name
         :param config_path: path to config file (yaml)
+        :param image_index: index of the downloaded images, built with a single scan of output_dir if not given
+        :param page_by: one of PAGE_BY to split the report into pages by adjective first letter or by page_size rows,
+        linked from an index page. A single page if not given
+        :param page_size: amount of rows per page when paging by rows
+        :param max_workers: amount of pages written in parallel
+        :param thumbnail_index: index of the images thumbnails, displayed instead of the images and linked to them
         """
+        if page_by is not None and page_by not in self.PAGE_BY:
+            raise ValueError(f"Unknown page_by {page_by}, expected one of {self.PAGE_BY}")
         super().__init__(output_dir, output_file_name, config_path)
+        self.image_index = image_index if image_index is not None else ImageIndex.from_directory(output_dir)
+        self.page_by = page_by
+        self.page_size = max(page_size, 1)
+        self.max_workers = max_workers
+        self.image_size = self.config.get("image_size", 150)
+        self.thumbnail_index = thumbnail_index
 
-    def generate(self, data: Dict[str, List[Tuple[str]]]) -> str:
+    def generate_and_save(self, data: Dict[str, List[Tuple[str]]]) -> str:
         """
-        generates the HTML page for collateral adjectives of animals
+        generate and save the html page, or the html pages and their index page if paginated.
+        The pages of a previous run not written by this one (another page_by or page_size) are removed
         :param data: dictionary mapping collateral adjectives to list of animals tuple
-        :return: the HTML page
+        :return: the html page file path, the index page file path if paginated
         """
-        html = self.config.get("html_start")
+        if not self.page_by:
+            file_path = super().generate_and_save(data)
+            self.remove_stale_pages([])
+            return file_path
 
-        for adj, animals_list in data.items():
-            animal_cells = ""
-            for animal in animals_list:
-                name = animal[0]
-
-                if os.path.exists(os.path.join(self.output_dir, f"{name.lower()}.jpg")):
-                    img_path = os.path.join(self.output_dir, f"{name.lower()}.jpg")
-                elif os.path.exists(os.path.join(self.output_dir, f"{name.lower()}.png")):
-                    img_path = os.path.join(self.output_dir, f"{name.lower()}.png")
-                else:
-                    img_path = "No image found"
-
-                animal_cells += f"""
-                <div class="animal-entry">
-                                        <a href="{img_path}">{name}</a><br/>
-                                        <img src="{img_path}" alt="{name}"><br/>
-                                        <span class="local-path">{img_path}</span>
-                                        </div>"""
+        pages = self.split_pages(data)
+        labels = list(pages)
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(labels)), 1)) as executor:
+            list(executor.map(lambda label: self.save_chunks(self.generate_chunks(pages[label], label, labels),
+                                                             self.page_path(label)), labels))
+
+        index_path = self.save_chunks(self.generate_index_chunks(pages))
+        self.remove_stale_pages(labels)
+        return index_path
+
+    def remove_stale_pages(self, labels: List[str]):
+        """
+        remove the page files of the output file name other than the given pages ones
+        :param labels: the labels of the pages written
+        """
+        page_name = re.compile(rf"{re.escape(self.output_file_name)}_(?:[^\W\d_]|other|\d+)\.html")
+        written = {self.page_file_name(label) for label in labels}
+        with os.scandir(self.output_dir) as entries:
+            stale = [entry.path for entry in entries
+                     if page_name.fullmatch(entry.name) and entry.name not in written and entry.is_file()]
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
-            html += f"""        <tr>
+    def split_pages(self, data: Dict[str, List[Tuple[str]]]) -> Dict[str, Dict[str, List[Tuple[str]]]]:
+        """
+        split the data to pages, by adjective first letter or by page_size rows
+        :param data: dictionary mapping collateral adjectives to list of animals tuple
+        :return: dictionary mapping page label to the page data, in page order
+        """
+        pages: Dict[str, Dict[str, List[Tuple[str]]]] = {}
+        if self.page_by == self.PAGE_BY_LETTER:
+            for adj, animals_list in data.items():
+                letter = adj[:1].upper()
+                pages.setdefault(letter if letter.isalpha() else "#", {})[adj] = animals_list
+            return {label: pages[label] for label in sorted(pages, key=lambda label: (label == "#", label))}
+
+        for row_idx, (adj, animals_list) in enumerate(data.items()):
+            pages.setdefault(str(row_idx // self.page_size + 1), {})[adj] = animals_list
+        return pages
+
+    def page_path(self, label: str) -> str:
+        """
+        :param label: the page label
+        :return: the page file path
+        """
+        return os.path.join(self.output_dir, self.page_file_name(label))
+
+    def page_file_name(self, label: str) -> str:
+        """
+        :param label: the page label
+        :return: the page file name
+        """
+        return f"{self.output_file_name}_{'other' if label == '#' else label}.html"
+
+    def generate_chunks(self, data: Dict[str, List[Tuple[str]]], label: str = None,
+                        labels: List[str] = None) -> Iterator[str]:
+        """
+        generates the HTML page for collateral adjectives of animals, one table row per chunk
+        :param data: dictionary mapping collateral adjectives to list of animals tuple
+        :param label: the page label, if the page is one of a paginated report
+        :param labels: all page labels of the paginated report, to navigate between them
+        :return: iterator over the HTML page chunks
+        """
+        yield self.config.get("html_start")
+        if label is not None:
+            yield self.navigation_row(label, labels)
+
+        for adj, animals_list in data.items():
+            yield f"""        <tr>
                 <td>{adj}</td>
-                <td>{animal_cells}</td>
+                <td>{"".join(self.animal_cell(animal[0]) for animal in animals_list)}</td>
+                </tr>
+                """
+
+        if label is not None:
+            yield self.navigation_row(label, labels)
+        yield self.config.get("html_end")
+
+    def navigation_row(self, label: str, labels: List[str]) -> str:
+        """
+        generates the table row linking a page to the index page and to the other pages
+        :param label: the page label
+        :param labels: all page labels
+        :return: the HTML table row
+        """
+        links = "".join(f'<b>{html.escape(other)}</b>' if other == label else
+                        f'<a href="{self.page_file_name(other)}">{html.escape(other)}</a>' for other in labels)
+        return f"""        <tr>
+                <td colspan="2" class="pages"><a href="{self.output_file_name}.html">Index</a> {links}</td>
                 </tr>
                 """
 
-        html += self.config.get("html_end")
+    def generate_index_chunks(self, pages: Dict[str, Dict[str, List[Tuple[str]]]]) -> Iterator[str]:
+        """
+        generates the index page of a paginated report
+        :param pages: dictionary mapping page label to the page data
+        :return: iterator over the HTML page chunks
+        """
+        yield self.config.get("index_start")
+        for label, page in pages.items():
+            adjectives = list(page)
+            yield (f'        <li><a href="{self.page_file_name(label)}">{html.escape(label)}</a> - '
+                   f'{html.escape(adjectives[0])} to {html.escape(adjectives[-1])} ({len(adjectives)} adjectives)</li>\n')
+        yield self.config.get("index_end")
 
-        return html
+    def animal_cell(self, name: str) -> str:
+        """
+        generates the HTML entry of an animal
+        :param name: the animal name
+        :return: the HTML entry
+        """
+        thumb_path = self.thumbnail_index.get(name) if self.thumbnail_index is not None else None
+        img_path = self.image_index.get(name) or thumb_path or "No image found"
+        return f"""
+                <div class="animal-entry">
+                                        <a href="{img_path}">{name}</a><br/>
+                                        <img src="{thumb_path or img_path}" alt="{name}" loading="lazy" width="{self.image_size}" height="{self.image_size}"><br/>
+                                        <span class="local-path">{img_path}</span>
+                                        </div>"""
@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class RunJournal:
+    """
+    Append-only journal of a run progress: the resolved animal pages, the completed image downloads and the failures,
+    one json line per event, flushed as it happens so a killed run keeps its progress.
+    A resumed run replays it to skip the completed animals and the already resolved pages.
+    Every run appends to the journal after a run event. A new run starts from an empty progress: the journal
+    of the previous runs is kept aside as PREVIOUS_SUFFIX, and replaying a new run event clears the progress,
+    so a resumed run only replays the run it resumes.
+    """
+
+    PREVIOUS_SUFFIX = ".previous"
+    RUN = "run"
+    RESOLVED = "resolved"
+    DOWNLOADED = "downloaded"
+    FAILED = "failed"
+    FSYNC_EVERY = 100
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        RunJournal constructor
+        :param path: the journal file path
+        :param resume: if true, replay the existing journal, else start a new run from an empty progress
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        # animal name to its page url and resolved image url (None if the page has no image)
+        self.resolved: Dict[str, Tuple[str, str | None]] = {}
+        self.downloaded: Dict[str, str] = {}
+        # animal name to (stage, error) of its last failure
+        self.failures: Dict[str, Tuple[str, str]] = {}
+
+        if resume and os.path.exists(path):
+            self._replay()
+        elif os.path.exists(path):
+            os.replace(path, f"{path}{self.PREVIOUS_SUFFIX}")
+        self._file = open(path, "a", encoding="utf-8")
+        self._append({"event": self.RUN, "resume": resume})
+
+    def _replay(self):
+        """
+        Load the events of the journal, a crash may leave a truncated last line
+        """
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    self._apply(event)
+                except (ValueError, KeyError):
+                    self.logger.warning(f"Ignoring corrupted journal line: {line!r}")
+        self.logger.info(f"Resuming from journal: {len(self.resolved)} resolved pages, "
+                         f"{len(self.downloaded)} downloaded images")
+
+    def _apply(self, event: dict):
+        if event["event"] == self.RUN:
+            if not event["resume"]:
+                self.resolved.clear()
+                self.downloaded.clear()
+                self.failures.clear()
+            return
+        name = event["name"]
+        if event["event"] == self.RESOLVED:
+            self.resolved[name] = (event["page_url"], event["image_url"])
+        elif event["event"] == self.DOWNLOADED:
+            self.downloaded[name] = event["image_url"]
+        elif event["event"] == self.FAILED:
+            self.failures[name] = (event["stage"], event["error"])
+            return
+        self.failures.pop(name, None)
+
+    def _append(self, event: dict):
+        event["ts"] = time.time()
+        line = json.dumps(event) + "\n"
+        with self._lock:
+            self._apply(event)
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.FSYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def record_resolved(self, name: str, page_url: str, image_url: str | None):
+        """
+        Journal an animal page resolved to its image url
+        :param name: the animal name
+        :param page_url: the animal page url
+        :param image_url: the resolved image url, None if the page has no image
+        """
+        self._append({"event": self.RESOLVED, "name": name, "page_url": page_url, "image_url": image_url})
+
+    def record_downloaded(self, name: str, image_url: str, file_path: str):
+        """
+        Journal a completed image download
+        :param name: the animal name
+        :param image_url: the image url
+        :param file_path: the downloaded image path
+        """
+        self._append({"event": self.DOWNLOADED, "name": name, "image_url": image_url, "file_path": file_path})
+
+    def record_failed(self, name: str, stage: str, error: BaseException):
+        """
+        Journal a failed animal
+        :param name: the animal name
+        :param stage: the failed stage (resolve or download)
+        :param error: the failure exception
+        """
+        self._append({"event": self.FAILED, "name": name, "stage": stage, "error": f"{type(error).__name__}: {error}"})
+
+    def is_done(self, image: Tuple[str, str]) -> bool:
+        """
+        Check if an animal was completed by the journaled run: its image downloaded, or its page has no image
+        :param image: (animal_name, page_url) tuple
+        :return: True if the animal can be skipped
+        """
+        name, page_url = image
+        with self._lock:
+            resolved = self.resolved.get(name)
+            if not resolved or resolved[0] != page_url:
+                return False
+            return resolved[1] is None or self.downloaded.get(name) == resolved[1]
+
+    def pending(self, images: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """
+        Filter the animals not completed by the journaled run
+        :param images: (animal_name, page_url) tuples
+        :return: the (animal_name, page_url) tuples left to do
+        """
+        return {image for image in images if not self.is_done(image)}
+
+    def resolved_images(self) -> Dict[str, str]:
+        """
+        :return: dictionary mapping page url to its journaled image url, of the pages resolved to an image
+        """
+        with self._lock:
+            return {page_url: image_url for page_url, image_url in self.resolved.values() if image_url}
+
+    def failure_list(self) -> List[Tuple[str, str, str]]:
+        """
+        :return: list of (animal name, stage, error) of the animals whose last event is a failure
+        """
+        with self._lock:
+            return [(name, stage, error) for name, (stage, error) in sorted(self.failures.items())]
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
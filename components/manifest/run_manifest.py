@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Set, Tuple
+
+from components.fetchers.image_store import ImageStore
+
+
+class RunManifest:
+    """
+    Manifest of a previous run results: the table mapping, and per animal its page url, resolved image url,
+    image file path, image hash, fetch time and thumbnail path.
+    An incremental run diffs the freshly parsed mapping against it and only handles new or changed animals.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str):
+        """
+        RunManifest constructor, loads the manifest if it exists
+        :param path: the manifest json file path
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.mapping: Dict[str, List[Tuple[str, str]]] = {}
+        self.animals: Dict[str, dict] = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.mapping = {key: [tuple(value) for value in values] for key, values in data["mapping"].items()}
+                self.animals = data["animals"]
+
+    def changed(self, images: Iterable[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """
+        Filter the animals that are new or changed since the previous run
+        :param images: (animal_name, page_url) tuples
+        :return: the new or changed (animal_name, page_url) tuples
+        """
+        return {image for image in images if self.is_changed(image)}
+
+    def is_changed(self, image: Tuple[str, str]) -> bool:
+        """
+        Check if an animal is new, its page url changed, or its image file is gone.
+        The thumbnail of an image whose original was dropped stands for it
+        :param image: (animal_name, page_url) tuple
+        :return: True if the animal should be scraped again
+        """
+        name, page_url = image
+        with self._lock:
+            entry = self.animals.get(name)
+        if not entry or entry.get("page_url") != page_url:
+            return True
+        return bool(entry.get("image_url")) and not os.path.exists(entry.get("file_path") or "") \
+            and not os.path.exists(entry.get("thumbnail_path") or "")
+
+    def is_current(self, name: str, image_url: str) -> bool:
+        """
+        Check if the image file of an animal is already downloaded from the given url and unchanged
+        :param name: the animal name
+        :param image_url: the resolved image url
+        :return: True if the download can be skipped
+        """
+        with self._lock:
+            entry = dict(self.animals.get(name) or {})
+        file_path = entry.get("file_path")
+        if entry.get("image_url") != image_url or not file_path or not os.path.exists(file_path):
+            return False
+        return ImageStore.file_hash(file_path) == entry.get("hash")
+
+    def record_resolved(self, name: str, page_url: str, image_url: str | None):
+        """
+        Record the resolved page and image url of an animal, before its download.
+        The file of a previous image url is forgotten, so an animal whose download then fails stays changed
+        and is scraped again by the next run
+        :param name: the animal name
+        :param page_url: the animal page url
+        :param image_url: the resolved image url, None if no image found
+        """
+        with self._lock:
+            entry = self.animals.setdefault(name, {})
+            if entry.get("image_url") != image_url or not image_url:
+                entry.update(file_path=None, hash=None, thumbnail_path=None)
+            entry.update(page_url=page_url, image_url=image_url)
+
+    def record(self, name: str, **fields):
+        """
+        Update the manifest entry of an animal.
+        Recording a file path also records its hash and fetch time.
+        :param name: the animal name
+        :param fields: entry fields to update (page_url, image_url, file_path)
+        """
+        if fields.get("file_path"):
+            fields["hash"] = ImageStore.file_hash(fields["file_path"])
+            fields["fetched_at"] = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self.animals.setdefault(name, {}).update(fields)
+
+    def record_thumbnails(self, thumbnails: Dict[str, str]):
+        """
+        Record the thumbnail paths of the animals
+        :param thumbnails: dictionary mapping animal name to its thumbnail path
+        """
+        with self._lock:
+            for name, entry in self.animals.items():
+                if name in thumbnails:
+                    entry["thumbnail_path"] = thumbnails[name]
+
+    def update_mapping(self, mapping: Dict[str, List[Tuple[str, str]]]):
+        """
+        Replace the manifest mapping by the fresh one, dropping the animals no longer in it
+        :param mapping: the fresh table mapping
+        """
+        names = {name for values in mapping.values() for name, _ in values}
+        with self._lock:
+            self.mapping = {key: list(values) for key, values in mapping.items()}
+            self.animals = {name: entry for name, entry in self.animals.items() if name in names}
+
+    def save(self):
+        """
+        Atomically write the manifest
+        """
+        with self._lock:
+            data = {"version": self.VERSION, "mapping": self.mapping, "animals": self.animals}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,159 @@
+from array import array
+from collections.abc import Mapping
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Set
+
+
+class CompactMapping(Mapping):
+    """
+    Read only dict-like mapping of keys to lists of values, built row by row.
+    Every distinct key and value is stored once and numbered, and each key holds an array of its value ids,
+    so a value listed under many keys (an animal under each of its adjectives) costs 4 bytes per extra key
+    instead of another tuple and its strings.
+    Getting a key returns a fresh list of its values, in insertion order, repeated values included like
+    a dict of lists. With dedupe, a value is listed once per key: the keys added to are deduped on their next read,
+    which keeps the build a plain array append instead of a membership set per key.
+    """
+
+    # unsigned ids, 4 bytes each
+    TYPECODE = "I"
+
+    def __init__(self, dedupe: bool = False):
+        """
+        CompactMapping constructor
+        :param dedupe: if true, a value already listed under a key isn't added to it again
+        """
+        self.dedupe = dedupe
+        self._keys: List[Hashable] = []
+        self._key_ids: Dict[Hashable, int] = {}
+        self._values: List[Hashable] = []
+        self._value_ids: Dict[Hashable, int] = {}
+        self._adjacency: List[array] = []
+        # ids of the keys added to since their last dedupe
+        self._dirty: Set[int] = set()
+        # value id to the ids of its keys, built on first lookup
+        self._reverse: List[array] | None = None
+
+    def key_id(self, key: Hashable) -> int:
+        """
+        Get the id of a key, numbering it if new
+        :param key: the key
+        :return: the key id
+        """
+        kid = self._key_ids.get(key)
+        if kid is None:
+            kid = self._key_ids[key] = len(self._keys)
+            self._keys.append(key)
+            self._adjacency.append(array(self.TYPECODE))
+        return kid
+
+    def value_id(self, value: Hashable) -> int:
+        """
+        Get the id of a value, numbering it if new
+        :param value: the value
+        :return: the value id
+        """
+        vid = self._value_ids.get(value)
+        if vid is None:
+            vid = self._value_ids[value] = len(self._values)
+            self._values.append(value)
+        return vid
+
+    def add(self, key: Hashable, values: Iterable[Hashable]):
+        """
+        Add values to a key
+        :param key: the key
+        :param values: the values to list under the key
+        """
+        self._add_ids(self.key_id(key), [self.value_id(value) for value in values])
+
+    def _add_ids(self, kid: int, vids: List[int]):
+        self._adjacency[kid].extend(vids)
+        if self.dedupe:
+            self._dirty.add(kid)
+        self._reverse = None
+
+    def _adjacency_of(self, kid: int) -> array:
+        """
+        Get the value ids of a key, deduped first if added to since.
+        Deduping is idempotent, so concurrent readers may race on it safely.
+        """
+        if kid in self._dirty:
+            adjacency = self._adjacency[kid]
+            unique = dict.fromkeys(adjacency)
+            if len(unique) < len(adjacency):
+                self._adjacency[kid] = array(self.TYPECODE, unique)
+            self._dirty.discard(kid)
+        return self._adjacency[kid]
+
+    def add_row(self, keys: Iterable[Hashable], values: Iterable[Hashable]):
+        """
+        Add the values of a table row to each of its keys, a row without keys adds nothing
+        :param keys: the row keys
+        :param values: the row values
+        """
+        keys = list(keys)
+        if not keys:
+            return
+        vids = [self.value_id(value) for value in values]
+        for key in keys:
+            self._add_ids(self.key_id(key), vids)
+
+    def update(self, other: Mapping):
+        """
+        Add the keys and values of another mapping
+        :param other: mapping of keys to lists of values
+        """
+        for key, values in other.items():
+            self.add(key, values)
+
+    def __getitem__(self, key: Hashable) -> List[Any]:
+        values = self._values
+        return [values[vid] for vid in self._adjacency_of(self._key_ids[key])]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._key_ids
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def has_value(self, value: Hashable) -> bool:
+        """
+        :param value: the value
+        :return: True if the value is listed under any key
+        """
+        return value in self._value_ids
+
+    def unique_values(self) -> List[Any]:
+        """
+        :return: the distinct values of all the keys, in insertion order
+        """
+        return list(self._values)
+
+    def keys_of(self, value: Hashable) -> List[Hashable]:
+        """
+        Reverse lookup of the keys a value is listed under
+        :param value: the value
+        :return: the keys listing the value, in insertion order. Empty if the value is unknown
+        """
+        vid = self._value_ids.get(value)
+        if vid is None:
+            return []
+        if self._reverse is None:
+            reverse = [array(self.TYPECODE) for _ in self._values]
+            for kid in range(len(self._keys)):
+                for listed_vid in self._adjacency_of(kid):
+                    reverse[listed_vid].append(kid)
+            self._reverse = reverse
+        return [self._keys[kid] for kid in self._reverse[vid]]
+
+    def edges(self) -> int:
+        """
+        :return: amount of (key, value) pairs
+        """
+        return sum(len(self._adjacency_of(kid)) for kid in range(len(self._keys)))
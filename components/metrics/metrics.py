@@ -0,0 +1,246 @@
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+
+class Summary:
+    """
+    Streaming summary of observed values: count, sum, max and p50 / p95 / p99.
+    The percentiles are computed over a uniform reservoir sample of at most MAX_SAMPLES values,
+    so memory stays bounded however many values are observed.
+    """
+
+    MAX_SAMPLES = 10_000
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._samples: List[float] = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        if len(self._samples) < self.MAX_SAMPLES:
+            self._samples.append(value)
+        else:
+            idx = random.randrange(self.count)
+            if idx < self.MAX_SAMPLES:
+                self._samples[idx] = value
+
+    def quantiles(self) -> Dict[float, float]:
+        """
+        :return: dictionary mapping each of QUANTILES to its value (nearest rank), 0 if nothing was observed
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return {q: 0.0 for q in self.QUANTILES}
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in self.QUANTILES}
+
+    def report(self) -> dict:
+        quantiles = self.quantiles()
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            **{f"p{int(q * 100)}": round(value, 6) for q, value in quantiles.items()},
+        }
+
+
+class Metrics:
+    """
+    Thread safe registry of the run metrics:
+    - counters (requests, bytes, retries, cache hits...)
+    - per stage latency summaries, in seconds (fetch, parse, table_mapping, resolve, download, html_generation)
+    - per pipeline stage queue depth summaries
+    - gauges, last set value wins
+    Components record to the process wide registry (see default), which sinks write out at the end of the run.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.latencies: Dict[str, Summary] = {}
+        self.queue_depths: Dict[str, Summary] = {}
+
+    @classmethod
+    def default(cls) -> "Metrics":
+        """
+        Get the process wide metrics registry, creating it on first use
+        :return: the shared registry
+        """
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    @classmethod
+    def set_default(cls, metrics: "Metrics | None") -> None:
+        """
+        Replace the process wide metrics registry
+        :param metrics: the registry to share, None to reset to a lazily created one
+        """
+        with cls._default_lock:
+            cls._default = metrics
+
+    def inc(self, name: str, value: float = 1):
+        """
+        Increase a counter
+        :param name: the counter name
+        :param value: amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value: float):
+        """
+        Set a gauge
+        :param name: the gauge name
+        :param value: the gauge value
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, stage: str, seconds: float):
+        """
+        Record the latency of a stage operation
+        :param stage: the stage name
+        :param seconds: the operation latency
+        """
+        with self._lock:
+            self.latencies.setdefault(stage, Summary()).observe(seconds)
+
+    def observe_queue_depth(self, stage: str, depth: int):
+        """
+        Record the input queue depth of a pipeline stage
+        :param stage: the pipeline stage name
+        :param depth: the amount of queued items
+        """
+        with self._lock:
+            self.queue_depths.setdefault(stage, Summary()).observe(depth)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Context recording its duration as a stage latency, failed operations included
+        :param stage: the stage name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def report(self) -> dict:
+        """
+        :return: the metrics as a JSON serializable dictionary
+        """
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed_seconds": round(time.time() - self.started, 6),
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "stages": {stage: summary.report() for stage, summary in self.latencies.items()},
+                "queue_depth": {stage: summary.report() for stage, summary in self.queue_depths.items()},
+            }
+
+
+class MetricsSink:
+    """
+    Base class for writing the run metrics out
+    """
+    def __init__(self, path: str):
+        """
+        MetricsSink constructor
+        :param path: the output file path
+        """
+        self.path = path
+
+    def write(self, metrics: Metrics) -> str:
+        """
+        Atomically write the metrics to the output file
+        :param metrics: the metrics registry
+        :return: the output file path
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render(metrics))
+        os.replace(tmp_path, self.path)
+        return self.path
+
+    def render(self, metrics: Metrics) -> str:
+        """
+        abstract method rendering the metrics to the output format
+        :param metrics: the metrics registry
+        """
+        raise NotImplementedError("This method must be implemented in subclass")
+
+
+class JSONSink(MetricsSink):
+    """
+    Writes the metrics as a JSON run report
+    """
+    def render(self, metrics: Metrics) -> str:
+        return json.dumps(metrics.report(), indent=2)
+
+
+class PrometheusTextfileSink(MetricsSink):
+    """
+    Writes the metrics in the Prometheus text exposition format, for the node exporter textfile collector
+    """
+
+    PREFIX = "wikipedia_animals"
+
+    def render(self, metrics: Metrics) -> str:
+        report = metrics.report()
+        lines = []
+
+        def metric(name: str, metric_type: str, samples: List[tuple]):
+            lines.append(f"# TYPE {self.PREFIX}_{name} {metric_type}")
+            for suffix, labels, value in samples:
+                label_str = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{self.PREFIX}_{name}{suffix}{{{label_str}}} {value}" if label_str else
+                             f"{self.PREFIX}_{name}{suffix} {value}")
+
+        metric("elapsed_seconds", "gauge", [("", {}, report["elapsed_seconds"])])
+        for name, value in sorted(report["counters"].items()):
+            metric(f"{name}_total", "counter", [("", {}, value)])
+        for name, value in sorted(report["gauges"].items()):
+            metric(name, "gauge", [("", {}, value)])
+        for name, key, label in (("stage_seconds", "stages", "stage"), ("queue_depth", "queue_depth", "stage")):
+            samples = []
+            for stage, summary in sorted(report[key].items()):
+                for quantile in Summary.QUANTILES:
+                    samples.append(("", {label: stage, "quantile": quantile},
+                                    summary[f"p{int(quantile * 100)}"]))
+                samples.append(("_sum", {label: stage}, summary["sum"]))
+                samples.append(("_count", {label: stage}, summary["count"]))
+            if samples:
+                metric(name, "summary", samples)
+        return "\n".join(lines) + "\n"
+
+
+def sink_for_path(path: str) -> MetricsSink:
+    """
+    Get the metrics sink matching an output file extension, .prom for a Prometheus textfile, JSON otherwise
+    :param path: the output file path
+    :return: the metrics sink
+    """
+    if path.endswith(".prom"):
+        return PrometheusTextfileSink(path)
+    return JSONSink(path)
@@ -0,0 +1,130 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Tuple
+
+from components.metrics.metrics import Metrics
+
+
+class Stage:
+    """
+    A pipeline stage, a function run by a pool of worker threads over the items of its input queue.
+    The function returns an iterable of items for the next stage (or None).
+    An optional flush function is called once the stage input is drained, for stages that buffer items.
+    """
+    def __init__(self, name: str, func: Callable[[Any], Iterable[Any] | None], workers: int = 1,
+                 queue_size: int = 0, flush: Callable[[], Iterable[Any] | None] = None):
+        """
+        Stage constructor
+        :param name: stage name, used for logging
+        :param func: the stage function
+        :param workers: amount of worker threads running the stage
+        :param queue_size: bound of the stage input queue, producers block when it is full. 0 means unbounded
+        :param flush: function returning the buffered items for the next stage, called after the last item
+        """
+        if workers < 1:
+            raise ValueError(f"Stage {name} must have at least one worker, got {workers}")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+        self.flush = flush
+
+
+class StagedPipeline:
+    """
+    Producer / consumer pipeline of stages connected by bounded queues.
+    Every stage starts working on the first item as soon as it is produced, and the bounded queues
+    apply back-pressure on the faster stages, so memory stays flat regardless of the source size.
+    The input queue depth of every stage is recorded to the metrics registry as its items are taken.
+    """
+
+    _DONE = object()
+
+    def __init__(self, stages: List[Stage]):
+        """
+        StagedPipeline constructor
+        :param stages: the pipeline stages, in order
+        """
+        if not stages:
+            raise ValueError("Pipeline must have at least one stage")
+        self.logger = logging.getLogger(type(self).__name__)
+        self.stages = stages
+        self.errors: List[Tuple[str, Any, Exception]] = []
+        self._errors_lock = threading.Lock()
+
+    def run(self, source: Iterable[Any]) -> List[Tuple[str, Any, Exception]]:
+        """
+        Run the pipeline over the source items, returns when every stage is drained.
+        A failing item is logged and recorded, it doesn't stop the pipeline.
+        If the source raises, the items already produced are drained and the exception is raised once
+        the stage workers exited.
+        :param source: items for the first stage
+        :return: list of (stage name, item, exception) of the failed items
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        threads = []
+        for idx, stage in enumerate(self.stages):
+            out_queue = queues[idx + 1] if idx + 1 < len(queues) else None
+            stage_threads = [
+                threading.Thread(target=self._work, args=(stage, queues[idx], out_queue),
+                                 name=f"{stage.name}-{worker}", daemon=True)
+                for worker in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        try:
+            for item in source:
+                queues[0].put(item)
+        finally:
+            # a stage is done once all its workers exit, then the next stage workers are signaled to exit
+            for idx, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    queues[idx].put(self._DONE)
+                for thread in threads[idx]:
+                    thread.join()
+                if stage.flush:
+                    self._flush(stage, queues[idx + 1] if idx + 1 < len(queues) else None)
+
+        return self.errors
+
+    def _flush(self, stage: Stage, out_queue: queue.Queue | None):
+        """
+        Flush the stage buffered items to the next stage
+        :param stage: the drained stage
+        :param out_queue: the next stage input queue, None for the last stage
+        """
+        try:
+            results = stage.flush()
+            if out_queue is not None and results is not None:
+                for result in results:
+                    out_queue.put(result)
+        except Exception as e:
+            self.logger.error(f"Stage {stage.name} failed to flush: {e}", exc_info=True)
+            with self._errors_lock:
+                self.errors.append((stage.name, None, e))
+
+    def _work(self, stage: Stage, in_queue: queue.Queue, out_queue: queue.Queue | None):
+        """
+        Worker loop, runs the stage function over the input queue items until signaled to exit
+        :param stage: the stage to run
+        :param in_queue: the stage input queue
+        :param out_queue: the next stage input queue, None for the last stage
+        """
+        metrics = Metrics.default()
+        while True:
+            item = in_queue.get()
+            if item is self._DONE:
+                return
+            metrics.observe_queue_depth(stage.name, in_queue.qsize())
+            try:
+                results = stage.func(item)
+                if out_queue is not None and results is not None:
+                    for result in results:
+                        out_queue.put(result)
+            except Exception as e:
+                self.logger.error(f"Stage {stage.name} failed on {item}: {e}", exc_info=True)
+                with self._errors_lock:
+                    self.errors.append((stage.name, item, e))
@@ -1,11 +1,22 @@
 import logging
-from collections import defaultdict
-from typing import List, Dict
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
 
-from bs4 import BeautifulSoup, Tag, ResultSet
+from bs4 import BeautifulSoup, Tag, ResultSet, SoupStrainer
 
 from components.scrapers.extractors.base_extractor import BaseCellsExtractor
 from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import HostThrottle
+from components.fetchers.response_cache import ResponseCache
+from components.fetchers.session_pool import SessionPool
+from components.mapping.compact_mapping import CompactMapping
+from components.metrics.metrics import Metrics
+
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
 
 
 class ImageNotFound(Exception):
@@ -14,18 +25,30 @@ class ImageNotFound(Exception):
 
 class BaseHTMLScraper:
     """
-    Base class for fetchers page scrapers
+    Base class for fetchers page scrapers.
+    The page is parsed with the PARSER backend (lxml when installed), limited to PARSE_ONLY tags if set.
     """
-    def __init__(self, url: str):
+
+    PARSER = DEFAULT_PARSER
+    PARSE_ONLY: SoupStrainer | None = None
+
+    def __init__(self, url: str, session_pool: SessionPool = None, html: bytes | str = None,
+                 cache: ResponseCache = None, throttle: HostThrottle = None):
         """
         BaseHTMLScraper constructor
         :param url: the url of the fetchers page
+        :param session_pool: keep-alive session pool to fetch through, the shared default pool if not given
+        :param html: already fetched page content, if given the page is not fetched again
+        :param cache: on-disk response cache to revalidate against, no caching if not given
+        :param throttle: per host throttle to fetch through, not throttled if not given
         """
         self.logger = logging.getLogger(type(self).__name__)
-        self.fetcher = BaseHTMLFetcher(url)
-        html = self.fetcher.fetch_content()
+        self.fetcher = BaseHTMLFetcher(url, session_pool=session_pool, cache=cache, throttle=throttle)
+        if html is None:
+            html = self.fetcher.fetch_content()
         try:
-            self.soup = BeautifulSoup(html, 'html.parser')
+            with Metrics.default().timer("parse"):
+                self.soup = BeautifulSoup(html, self.PARSER, parse_only=self.PARSE_ONLY)
         except Exception as e:
             self.logger.error(f'Failed to scrape {url}: {e}', exc_info=True)
             raise e
@@ -67,37 +90,135 @@ class BaseTableScraper:
         return row.find_all(['td', 'th'])
 
 
+class TableSpec(NamedTuple):
+    """
+    Table to map: its key and value column headers, and the extractor classes of their cells
+    """
+    key_header: str
+    value_header: str
+    keys_extractor: type = BaseCellsExtractor
+    values_extractor: type = BaseCellsExtractor
+
+
 class TableMappingScraper(BaseTableScraper):
     """
     Table scraper class to handle general mapping creation from fetchers table.
     The mapping is based on keys and values extractors, given to the class in initialize.
     """
-    def __init__(self, table: Tag, keys_extractor: BaseCellsExtractor, values_extractor: BaseCellsExtractor):
+    def __init__(self, table: Tag, keys_extractor: BaseCellsExtractor, values_extractor: BaseCellsExtractor,
+                 dedupe: bool = False):
         """
         TableMappingScraper constructor
         :param table: the table tag
         :param keys_extractor: the keys extractor
         :param values_extractor: the values extractor
+        :param dedupe: if true, a value repeated under a key is mapped once
         """
         super().__init__(table=table)
         self.key_extractor = keys_extractor
         self.value_extractor = values_extractor
         self.cells_range = max(keys_extractor.col_idx, values_extractor.col_idx)
+        self.dedupe = dedupe
 
-    def create_mapping(self) -> Dict[str, List[Dict[str, str]]]:
+    def create_mapping(self, mapping: CompactMapping = None) -> CompactMapping:
         """
         Builds a mapping from the keys to the values, using the class given extractors.
-        :return: dictionary mapping keys to values
+        :param mapping: mapping to add the rows to, so several tables build a single mapping. A new one if not given
+        :return: read only dict-like mapping of keys to values
         """
-        mapping: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        if mapping is None:
+            mapping = CompactMapping(dedupe=self.dedupe)
         for row in self.rows():
-            cells = self.cells(row)
-            if len(cells) <= self.cells_range:
-                continue
-            keys = self.key_extractor.extract(cells)
-            values = self.value_extractor.extract(cells)
+            mapping.add_row(*self.map_row(row))
+
+        return mapping
+
+    def map_row(self, row: Tag) -> Tuple[List[Any], List[Any]]:
+        """
+        Extract the keys and values of a single row, using the class given extractors.
+        :param row: the row tag
+        :return: tuple of (keys, values), both empty if the row is too short
+        """
+        cells = self.cells(row)
+        if len(cells) <= self.cells_range:
+            return [], []
+        return self.key_extractor.extract(cells), self.value_extractor.extract(cells)
+
+
+class ColumnarTableScraper(BaseTableScraper):
+    """
+    Table scraper feeding any number of extractors in a single pass over the rows.
+    Each row is split into cells once, and each distinct extractor (class and column) runs once per row
+    however many (keys, values) column pairs use it, so mapping several column pairs of a table costs one scan.
+    """
+    def __init__(self, table: Tag | None, pairs: List[Tuple[BaseCellsExtractor, BaseCellsExtractor]],
+                 dedupe: bool = False):
+        """
+        ColumnarTableScraper constructor
+        :param table: the table tag, None if its rows are given to map_row one by one
+        :param pairs: the (keys extractor, values extractor) of each column pair to map
+        :param dedupe: if true, a value repeated under a key is mapped once
+        """
+        super().__init__(table=table)
+        self.extractors: List[BaseCellsExtractor] = []
+        # (extractor class, column index) to its index in extractors
+        extractor_ids: Dict[Tuple[type, int], int] = {}
+        # (keys extractor index, values extractor index) of each column pair
+        self.pairs: List[Tuple[int, int]] = []
+        for keys_extractor, values_extractor in pairs:
+            ids = []
+            for extractor in (keys_extractor, values_extractor):
+                key = (type(extractor), extractor.col_idx)
+                if key not in extractor_ids:
+                    extractor_ids[key] = len(self.extractors)
+                    self.extractors.append(extractor)
+                ids.append(extractor_ids[key])
+            self.pairs.append((ids[0], ids[1]))
+        self.dedupe = dedupe
+
+    def extract_row(self, row: Tag) -> List[List[Any] | None]:
+        """
+        Run every extractor on a row
+        :param row: the row tag
+        :return: the values of each extractor, None for the extractors of a column the row is too short for
+        """
+        cells = self.cells(row)
+        return [extractor.extract(cells) if extractor.col_idx < len(cells) else None for extractor in self.extractors]
 
-            for key in keys:
-                mapping[key].extend(values)
+    def columns(self, rows: Iterable[Tag] = None) -> List[List[List[Any] | None]]:
+        """
+        Extract rows into column arrays
+        :param rows: the rows to extract, the table rows without the header if not given
+        :return: an array per extractor, of its values of each row in order
+        """
+        columns = [[] for _ in self.extractors]
+        for row in self.rows() if rows is None else rows:
+            for column, values in zip(columns, self.extract_row(row)):
+                column.append(values)
+        return columns
 
-        return mapping
\ No newline at end of file
+    def map_row(self, row: Tag) -> List[Tuple[List[Any], List[Any]]]:
+        """
+        Extract the keys and values of each column pair of a single row
+        :param row: the row tag
+        :return: list of (keys, values) of the column pairs the row is long enough for
+        """
+        extracted = self.extract_row(row)
+        return [(extracted[keys_id], extracted[values_id]) for keys_id, values_id in self.pairs
+                if extracted[keys_id] is not None and extracted[values_id] is not None]
+
+    def create_mappings(self, mappings: List[CompactMapping] = None) -> List[CompactMapping]:
+        """
+        Builds a mapping of each column pair out of the column arrays of the table
+        :param mappings: the mapping to add each column pair to, the same mapping may be given for several pairs.
+        New mappings if not given
+        :return: the mappings, one per column pair
+        """
+        if mappings is None:
+            mappings = [CompactMapping(dedupe=self.dedupe) for _ in self.pairs]
+        columns = self.columns()
+        for mapping, (keys_id, values_id) in zip(mappings, self.pairs):
+            for keys, values in zip(columns[keys_id], columns[values_id]):
+                if keys is not None and values is not None:
+                    mapping.add_row(keys, values)
+        return mappings
\ No newline at end of file
@@ -20,9 +20,12 @@ class AnimalExtractor(BaseCellsExtractor):
         :return: list of (animal, href) tuples.
         """
         a_tag = cells[self.col_idx].find('a')
-        if not a_tag or not a_tag.text.strip():
+        if not a_tag:
             return []
-        return [(clean_str(a_tag.text), urlparse.urljoin(self.URL_PREFIX, a_tag.get("href", "")))]
+        name = a_tag.text
+        if not name.strip():
+            return []
+        return [(clean_str(name), urlparse.urljoin(self.URL_PREFIX, a_tag.get("href", "")))]
 
 
 class CollateralAdjectivesExtractor(BaseCellsExtractor):
@@ -32,9 +35,6 @@ class CollateralAdjectivesExtractor(BaseCellsExtractor):
     def extract(self, cells: ResultSet) -> List[str]:
         """Extracts collateral adjectives from a table cell."""
         cell_text = cells[self.col_idx].get_text(separator="\n")
-        adjectives = [
-            clean_str(p.strip())
-            for p in cell_text.split("\n")
-            if p.strip() and p.strip() != "—" and len(p.strip()) > 1
-        ]
+        # stripped once, the "—" of a cell without adjectives is a single character
+        adjectives = [clean_str(p) for p in map(str.strip, cell_text.split("\n")) if len(p) > 1]
         return adjectives or ["Null"]
@@ -0,0 +1,140 @@
+import codecs
+from html.parser import HTMLParser
+from typing import Iterable, Iterator, List, Tuple
+
+from bs4 import BeautifulSoup, Tag
+
+from components.scrapers.base_scrapers import DEFAULT_PARSER
+
+# (header pair index, key column index, value column index) of a header pair matched by a table
+TableMatch = Tuple[int, int, int]
+
+
+class _TableState:
+    def __init__(self, table_id: int):
+        self.table_id = table_id
+        self.header_done = False
+        self.matches: List[TableMatch] = []
+
+
+class StreamingTableReader(HTMLParser):
+    """
+    Incremental reader of the table rows of a page, fed with the page chunks as they are downloaded.
+    A table matches a (key header, value header) pair if both are header cells of its first row,
+    the rows of the other tables are skipped without being kept.
+    Each row of a matching table is rebuilt as a small BeautifulSoup <tr> tag once complete and handed over,
+    so memory holds a single row whatever the page size, and rows are mapped while the page still downloads.
+    """
+
+    def __init__(self, header_pairs: List[Tuple[str, str]], parser: str = DEFAULT_PARSER):
+        """
+        StreamingTableReader constructor
+        :param header_pairs: the (key header, value header) pairs of the tables to read
+        :param parser: the BeautifulSoup backend the rows are parsed with
+        """
+        # the character references are kept as is, the rows are parsed again
+        super().__init__(convert_charrefs=False)
+        self.header_pairs = header_pairs
+        self.parser = parser
+        self.tables_found = 0
+        self._tables: List[_TableState] = []
+        self._table_count = 0
+        # raw html parts of the current row, and the depth of its table
+        self._row: List[str] | None = None
+        self._row_depth = 0
+        self._ready: List[Tuple[int, List[TableMatch], Tag]] = []
+
+    def iter_rows(self, chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[Tuple[int, List[TableMatch], Tag]]:
+        """
+        Read the rows of the matching tables out of the page chunks
+        :param chunks: the page content chunks, in order
+        :param encoding: the page encoding
+        :return: generator of (table id, table matches, row tag), in page order
+        """
+        decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        for chunk in chunks:
+            yield from self.feed_text(decoder.decode(chunk))
+        yield from self.feed_text(decoder.decode(b"", final=True))
+        self.close()
+        yield from self._take_ready()
+
+    def feed_text(self, text: str) -> List[Tuple[int, List[TableMatch], Tag]]:
+        """
+        Feed a decoded chunk of the page
+        :param text: the chunk
+        :return: list of (table id, table matches, row tag) of the rows completed by the chunk
+        """
+        self.feed(text)
+        return self._take_ready()
+
+    def _take_ready(self) -> List[Tuple[int, List[TableMatch], Tag]]:
+        ready, self._ready = self._ready, []
+        return ready
+
+    def handle_starttag(self, tag: str, attrs):
+        raw = self.get_starttag_text()
+        if tag == "tr" and self._row is not None and self._row_depth == len(self._tables):
+            # the previous row end tag was omitted
+            self._end_row()
+        if tag == "tr" and self._row is None and self._tables:
+            table = self._tables[-1]
+            if not table.header_done or table.matches:
+                self._row = [raw]
+                self._row_depth = len(self._tables)
+            return
+        if self._row is not None:
+            self._row.append(raw)
+        if tag == "table":
+            self._tables.append(_TableState(self._table_count))
+            self._table_count += 1
+
+    def handle_startendtag(self, tag: str, attrs):
+        if self._row is not None:
+            self._row.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag: str):
+        in_row_table = self._row is not None and self._row_depth == len(self._tables)
+        if tag == "tr" and in_row_table:
+            self._row.append("</tr>")
+            self._end_row()
+            return
+        if tag == "table" and in_row_table:
+            self._end_row()
+        if self._row is not None:
+            self._row.append(f"</{tag}>")
+        if tag == "table" and self._tables:
+            self._tables.pop()
+
+    def handle_data(self, data: str):
+        if self._row is not None:
+            self._row.append(data)
+
+    def handle_entityref(self, name: str):
+        if self._row is not None:
+            self._row.append(f"&{name};")
+
+    def handle_charref(self, name: str):
+        if self._row is not None:
+            self._row.append(f"&#{name};")
+
+    def _end_row(self):
+        """
+        Parse the buffered row: the header row of its table is matched against the header pairs,
+        the following rows of a matching table are handed over
+        """
+        row_html, self._row = "".join(self._row), None
+        table = self._tables[self._row_depth - 1]
+        # wrapped in a table, so every parser backend keeps the <tr>
+        row = BeautifulSoup(f"<table>{row_html}</table>", self.parser).find("tr")
+        if row is None:
+            return
+        if not table.header_done:
+            table.header_done = True
+            headers = [th.get_text(strip=True) for th in row.find_all("th")]
+            table.matches = [(idx, headers.index(key_header), headers.index(value_header))
+                             for idx, (key_header, value_header) in enumerate(self.header_pairs)
+                             if key_header in headers and value_header in headers]
+            if table.matches:
+                self.tables_found += 1
+            return
+        self._ready.append((table.table_id, table.matches, row))
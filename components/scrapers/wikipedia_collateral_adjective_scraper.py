@@ -1,86 +1,690 @@
+import asyncio
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor
-from typing import Set, Tuple
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Set, Tuple
 
+import requests
+from bs4 import Tag
+
+from components.export.mapping_export import EXPORTS, export_for
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import HostThrottle
 from components.fetchers.image_downloader import ImageDownloader
+from components.fetchers.image_index import ImageIndex
+from components.fetchers.image_store import ImageStore
+from components.fetchers.response_cache import ResponseCache
+from components.fetchers.session_pool import SessionPool
 from components.html_generator.wikipedia_html_generators import WikipediaCollateralAdjectiveHTMLGenerator
-from components.scrapers.base_scrapers import TableMappingScraper
-from components.scrapers.wikipedia_scraper import WikiScraper
+from components.manifest.run_journal import RunJournal
+from components.manifest.run_manifest import RunManifest
+from components.mapping.compact_mapping import CompactMapping
+from components.metrics.metrics import Metrics
+from components.pipeline.staged_pipeline import Stage, StagedPipeline
+from components.scrapers.base_scrapers import ColumnarTableScraper, TableSpec
+from components.scrapers.streaming_table import StreamingTableReader
+from components.scrapers.wikipedia_image_resolver import WikiPageImagesResolver
+from components.scrapers.wikipedia_scraper import WikiScraper, WikiImageScraper, extract_image_url
 from components.scrapers.extractors.wikipedia_extractors import CollateralAdjectivesExtractor, AnimalExtractor
+from components.thumbnails.thumbnailer import Thumbnailer
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class StageFailed(Exception):
+    """
+    Failure of an image stage (resolve or download), wrapping the error that failed it
+    """
+
+    def __init__(self, stage: str, error: Exception):
+        super().__init__(f"{stage} failed: {error}")
+        self.stage = stage
+        self.error = error
 
 
 class WikipediaCollateralAdjectiveScraper(WikiScraper):
     """
     Scraper for collateral adjectives of animals out of wikipedia page.
     It manages the scraping process and all the relevant components.
-    Also holding the relevant args as class properties (KEY_HEADER, VALUE_HEADER, WIKI_URL)
+    Also holding the relevant args as class properties (KEY_HEADER, VALUE_HEADER, WIKI_URL, TABLES)
     """
 
     WIKI_URL = "https://en.wikipedia.org/wiki/List_of_animal_names"
+    IMAGES_API_URL = WikiPageImagesResolver.API_URL
     KEY_HEADER = "Collateral adjective"
     VALUE_HEADER = "Animal"
+    TABLES = (TableSpec(KEY_HEADER, VALUE_HEADER, CollateralAdjectivesExtractor, AnimalExtractor),)
     MAX_THREADS = 64
+    MAX_ASYNC_REQUESTS = 256
+    IMAGE_STORE_DIR = ".images"
+    MANIFEST_FILE = "manifest.json"
+    JOURNAL_FILE = "journal.jsonl"
+    # the exports file name in the output directory, suffixed by the format
+    EXPORT_FILE = "mapping"
+    # bytes of the list page read at once when streaming its tables
+    STREAM_CHUNK_SIZE = 64 * 1024
 
-    def __init__(self, output_dir: str, use_threading: bool = True):
+    SEQUENTIAL_MODE = "sequential"
+    THREADED_MODE = "threaded"
+    ASYNC_MODE = "async"
+    PIPELINE_MODE = "pipeline"
+    MODES = (SEQUENTIAL_MODE, THREADED_MODE, ASYNC_MODE, PIPELINE_MODE)
+
+    # worker threads of each pipeline mode stage, the rows stage is single worker to keep the table order
+    PIPELINE_WORKERS = {"pages": 32, "images": 32}
+    PIPELINE_QUEUE_SIZE = 128
+    # pipeline stage to the journaled stage of its failed items, the items are (image_name, ...) tuples
+    PIPELINE_FAILED_STAGES = {"batches": "resolve", "pages": "resolve", "images": "download"}
+
+    def __init__(self, output_dir: str, use_threading: bool = True, session_pool: SessionPool = None,
+                 mode: str = None, cache: ResponseCache = None, pipeline_workers: Dict[str, int] = None,
+                 parse_processes: int = 0, use_images_api: bool = False, max_image_bytes: int = None,
+                 image_store: ImageStore = None, incremental: bool = False, page_by: str = None,
+                 page_size: int = WikipediaCollateralAdjectiveHTMLGenerator.DEFAULT_PAGE_SIZE,
+                 thumbnails_format: str = None, thumbnail_size: int = Thumbnailer.DEFAULT_SIZE,
+                 keep_originals: bool = True, throttle: HostThrottle = None, rate_limit: float = None,
+                 resume: bool = False, journal_path: str = None, html: bytes | str = None, url: str = None,
+                 tables: List[TableSpec] = None, stream_table: bool = False, export_formats: List[str] = None):
         """
         WikipediaCollateralAdjectiveScraper constructor
         :param output_dir: Directory to save output to
+        :param use_threading: if true, download images with a thread pool, ignored if mode is given
+        :param session_pool: keep-alive session pool shared by all page and image fetches,
+        a pool sized to MAX_THREADS connections per host if not given
+        :param mode: images execution mode, one of MODES
+        :param cache: on-disk response cache shared by all page and image fetches, no caching if not given
+        :param pipeline_workers: pipeline mode worker threads per stage ("pages", "images"),
+        overrides PIPELINE_WORKERS
+        :param parse_processes: size of the process pool parsing the animal pages,
+        0 parses in the fetching threads
+        :param use_images_api: if true, resolve the images in batches with the IMAGES_API_URL MediaWiki API,
+        scraping only the pages the API has no image for
+        :param max_image_bytes: maximum size of a downloaded image, no limit if not given
+        :param image_store: content addressed image store, a store in the IMAGE_STORE_DIR of the output directory
+        if not given, so re-runs into the same output directory are incremental
+        :param incremental: if true, keeps a manifest of the run results in the output directory,
+        and only scrapes the animals that are new or changed since the previous run
+        :param page_by: split the report into pages linked from an index page, by adjective first letter ("letter")
+        or by page_size rows ("rows"). A single page if not given
+        :param page_size: amount of rows per report page when paging by rows
+        :param thumbnails_format: if given, create thumbnails of the images in this format (one of Thumbnailer.FORMATS)
+        in a process pool after the downloads, and display them in the report. Requires Pillow
+        :param thumbnail_size: maximum width and height of the thumbnails in pixels
+        :param keep_originals: if false, the original images are removed once their thumbnail is created
+        :param throttle: per host throttle shared by all page and image fetches, adapting the concurrent requests
+        of each host up to MAX_THREADS (MAX_ASYNC_REQUESTS in async mode) if not given
+        :param rate_limit: maximum requests per second to each host of the throttle created if not given,
+        no rate limit if not given
+        :param resume: if true, continue the run journaled in the JOURNAL_FILE of the output directory,
+        skipping its completed animals and resolved pages. Otherwise a new journal is started
+        :param journal_path: the journal file path, the JOURNAL_FILE of the output directory if not given
+        :param html: already fetched list page content, if given the page is not fetched again.
+        A shard worker, which doesn't map the table, passes an empty page
+        :param url: the list page url, WIKI_URL if not given
+        :param tables: the tables to map, every table of the page matching one of them is mapped. TABLES if not given
+        :param stream_table: if true, the list page is not parsed whole: its table rows are read one by one
+        as the page downloads, so mapping starts with the first row and memory holds a single row.
+        A table is then matched by the header cells of its first row only
+        :param export_formats: formats (any of EXPORTS) to also export the mapping and its image paths in,
+        alongside the report, to the EXPORT_FILE of the output directory
         """
-        super().__init__(url=self.WIKI_URL)
+        if mode is not None and mode not in self.MODES:
+            raise ValueError(f"Unknown mode {mode}, expected one of {self.MODES}")
+        unknown_formats = set(export_formats or ()) - set(EXPORTS)
+        if unknown_formats:
+            raise ValueError(f"Unknown export formats {sorted(unknown_formats)}, expected any of {tuple(EXPORTS)}")
+
+        self.mode = mode or (self.THREADED_MODE if use_threading else self.SEQUENTIAL_MODE)
+        self.session_pool = session_pool or SessionPool(pool_maxsize=self.MAX_THREADS)
+        self.cache = cache
+        self.throttle = throttle or HostThrottle(
+            rate=rate_limit, max_concurrency=self.MAX_ASYNC_REQUESTS if self.mode == self.ASYNC_MODE else self.MAX_THREADS)
+        self.tables = list(tables or self.TABLES)
+        self.stream_table = stream_table
+        if stream_table and html is None:
+            # the page is fetched when its rows are read
+            html = ""
+        super().__init__(url=url or self.WIKI_URL, session_pool=self.session_pool, html=html, cache=self.cache,
+                         throttle=self.throttle)
         self.output_dir = output_dir
-        self.use_threading = use_threading
+        self.pipeline_workers = {**self.PIPELINE_WORKERS, **(pipeline_workers or {})}
+        self.parse_processes = parse_processes
+        self.parse_executor = None
+        self.max_image_bytes = max_image_bytes
+        self.images_resolver = None
+        if use_images_api:
+            self.images_resolver = WikiPageImagesResolver(api_url=self.IMAGES_API_URL, session_pool=self.session_pool,
+                                                          cache=self.cache, throttle=self.throttle)
+        # page url to image url, of the images resolved in batches
+        self.resolved_images: Dict[str, str | None] = {}
 
         self.create_output_dir()
+        self.image_store = image_store or ImageStore(os.path.join(self.output_dir, self.IMAGE_STORE_DIR))
+        # one scan for the images of previous runs, the downloads of this run publish to it
+        self.image_index = ImageIndex.from_directory(self.output_dir)
+        self.manifest = RunManifest(os.path.join(self.output_dir, self.MANIFEST_FILE)) if incremental else None
+        self.page_by = page_by
+        self.page_size = page_size
+        self.export_formats = list(export_formats or ())
+        self.thumbnailer = None
+        if thumbnails_format:
+            self.thumbnailer = Thumbnailer(os.path.join(self.output_dir, Thumbnailer.THUMBS_DIR),
+                                           size=thumbnail_size, image_format=thumbnails_format,
+                                           keep_originals=keep_originals, store=self.image_store)
+        self.resume = resume
+        self.journal = None
+        self.open_journal(journal_path or os.path.join(self.output_dir, self.JOURNAL_FILE), resume=resume)
+
+    def open_journal(self, path: str, resume: bool = False):
+        """
+        Close the current journal, if any, and journal to another file
+        :param path: the journal file path
+        :param resume: if true, resume the journaled run, its resolved pages are reused
+        """
+        if self.journal:
+            self.journal.close()
+        self.journal = RunJournal(path, resume=resume)
+        if resume:
+            self.resolved_images.update(self.journal.resolved_images())
+
+    def reopen_journal(self):
+        """
+        Reopen the journal closed by a previous scrape of this scraper, so the scraper runs again.
+        The new run resumes the journaled one if resume was set, else it starts over
+        """
+        if self.journal.closed:
+            self.open_journal(self.journal.path, resume=self.resume)
+
+    @property
+    def failures(self) -> List[Tuple[str, str, str]]:
+        """
+        :return: list of (animal name, stage, error) of the animals that failed, and were not completed since
+        """
+        return self.journal.failure_list()
+
+    def failure_summary(self, failures: List[Tuple[str, str, str]] = None) -> str:
+        """
+        :param failures: list of (animal name, stage, error) to summarize, the journaled failures if not given
+        :return: human readable summary of the failed animals, empty if none failed
+        """
+        failures = self.failures if failures is None else failures
+        if not failures:
+            return ""
+        lines = [f"{len(failures)} animals failed:"]
+        lines.extend(f"  {name} [{stage}] {error}" for name, stage, error in failures)
+        return "\n".join(lines)
 
     def scrape(self):
         """
         Scrapes wikipedia page to get collateral adjectives mapped to animals list
         """
-        table, key_idx, value_idx = self.get_table_to_map(self.KEY_HEADER, self.VALUE_HEADER)
+        self.reopen_journal()
+        try:
+            return self._scrape()
+        finally:
+            self.journal.close()
+            summary = self.failure_summary()
+            if summary:
+                self.logger.error(summary)
+
+    def regenerate_report(self) -> str:
+        """
+        Regenerate the report with the images already downloaded, without scraping the animal pages.
+        The mapping of the manifest is reused in incremental runs, the list page is mapped again otherwise
+        :return: the report (or its index page) path
+        """
+        self.reopen_journal()
+        try:
+            mapping_dict = self.manifest.mapping if self.manifest and self.manifest.mapping else self.map_table()
+            return self.generate_report(mapping_dict)
+        finally:
+            self.journal.close()
+
+    def _scrape(self):
+        if self.mode == self.PIPELINE_MODE:
+            mapping_dict = self.scrape_with_pipeline(self.table_rows())
+        else:
+            mapping_dict = self.map_table()
+
+            # creating set of tuples (animal_name, animal_page_url) to avoid collisions
+            # of same image treated more than once
+            images_set = set(mapping_dict.unique_values())
+            if self.manifest:
+                images_set = self.manifest.changed(images_set)
+                self.logger.info(f"Incremental run, {len(images_set)} new or changed animals")
+            self.download_images(self.journal.pending(images_set))
+        self.log_stats()
+
+        if self.manifest:
+            self.manifest.update_mapping(mapping_dict)
+            self.manifest.save()
+            mapping_dict = self.manifest.mapping
+
+        return self.generate_report(mapping_dict)
+
+    def table_scrapers(self) -> List[ColumnarTableScraper]:
+        """
+        :return: a mapping scraper of every table of the page matching one or more of the tables to map,
+        each maps all its matching column pairs in a single pass over the rows
+        """
+        # table tag id to the table and the extractors of its matching column pairs
+        tables: Dict[int, Tuple[Tag, list]] = {}
+        for spec in self.tables:
+            for table, key_idx, value_idx in self.get_tables_to_map(spec.key_header, spec.value_header):
+                tables.setdefault(id(table), (table, []))[1].append(
+                    (spec.keys_extractor(col_idx=key_idx), spec.values_extractor(col_idx=value_idx)))
+        return [ColumnarTableScraper(table=table, pairs=pairs) for table, pairs in tables.values()]
+
+    def table_rows(self) -> Iterator[Tuple[ColumnarTableScraper, Tag]]:
+        """
+        Iterate the rows of every matching table, the header rows excluded.
+        With stream_table, the rows are read as the page downloads, see stream_table_rows
+        :return: generator of (table mapping scraper, row) tuples
+        """
+        if self.stream_table:
+            yield from self.stream_table_rows()
+            return
+        for table_scraper in self.table_scrapers():
+            for row in table_scraper.rows():
+                yield table_scraper, row
+
+    def stream_table_rows(self) -> Iterator[Tuple[ColumnarTableScraper, Tag]]:
+        """
+        Fetch the list page as a stream, and read the rows of its matching tables one by one as they download
+        :return: generator of (table mapping scraper, row) tuples, in page order
+        """
+        response = self.fetcher.fetch(stream=True)
+        # requests defaults text without a charset to ISO-8859-1, while the pages are UTF-8
+        content_type = response.headers.get("Content-Type", "").lower()
+        encoding = response.encoding if "charset" in content_type else "utf-8"
+        reader = StreamingTableReader([(spec.key_header, spec.value_header) for spec in self.tables],
+                                      parser=self.PARSER)
+        # table id to the mapping scraper of its rows
+        table_scrapers: Dict[int, ColumnarTableScraper] = {}
+        for table_id, matches, row in reader.iter_rows(self.page_chunks(response), encoding=encoding):
+            table_scraper = table_scrapers.get(table_id)
+            if table_scraper is None:
+                table_scraper = table_scrapers[table_id] = ColumnarTableScraper(
+                    table=None, pairs=[(self.tables[spec_idx].keys_extractor(col_idx=key_idx),
+                                        self.tables[spec_idx].values_extractor(col_idx=value_idx))
+                                       for spec_idx, key_idx, value_idx in matches])
+            yield table_scraper, row
 
-        table_scraper = TableMappingScraper(table=table,
-                                            keys_extractor=CollateralAdjectivesExtractor(col_idx=key_idx),
-                                            values_extractor=AnimalExtractor(col_idx=value_idx))
+        if reader.tables_found:
+            self.logger.info(f"Streamed {reader.tables_found} matching tables of {self.fetcher.url}")
+        else:
+            self.logger.warning(f"No matching table found in {self.fetcher.url}")
 
-        mapping_dict = table_scraper.create_mapping()
+    def page_chunks(self, response: requests.Response) -> Iterator[bytes]:
+        """
+        Iterate a streamed response content in STREAM_CHUNK_SIZE chunks.
+        A fetched page is written to the cache through a temporary file meanwhile, so it is never held whole
+        :param response: the streamed response
+        :return: generator of the content chunks
+        """
+        metrics = Metrics.default()
+        from_cache = getattr(response, "from_cache", False)
+        tmp = None
+        if self.cache and not from_cache:
+            tmp = tempfile.NamedTemporaryFile(dir=self.output_dir, prefix=".", suffix=".part", delete=False)
+        try:
+            for chunk in response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                if not from_cache:
+                    metrics.inc("bytes", len(chunk))
+                if tmp:
+                    tmp.write(chunk)
+                yield chunk
+            if tmp:
+                tmp.close()
+                self.cache.store_file(self.fetcher.url, tmp.name, response.headers)
+        finally:
+            response.close()
+            if tmp:
+                tmp.close()
+                os.remove(tmp.name)
 
-        # creating set of tuples (animal_name, animal_page_url) to avoid collisions
-        # of same image treated more than once
-        images_set = set().union(*mapping_dict.values())
+    def map_table(self) -> CompactMapping:
+        """
+        Map all the matching tables into a single mapping
+        :return: read only dict-like mapping of the collateral adjectives to their (animal_name, animal_page_url)
+        tuples, every animal is stored once however many adjectives list it
+        """
+        mapping_dict = CompactMapping(dedupe=True)
+        with Metrics.default().timer("table_mapping"):
+            for table_scraper, row in self.table_rows():
+                for keys, values in table_scraper.map_row(row):
+                    mapping_dict.add_row(keys, values)
+        return mapping_dict
+
+    def download_images(self, images_set: Set[Tuple[str, str]]):
+        """
+        Resolve the image urls in batches, if the images API is used, then scrape and download the images
+        :param images_set: set of (image_name, page_url) tuples
+        """
+        if self.images_resolver:
+            self.resolved_images.update(self.images_resolver.resolve(page_url for _, page_url in images_set))
         self.download_images_with_scraper(images_set)
 
-        return WikipediaCollateralAdjectiveHTMLGenerator(
-            output_dir=self.output_dir, output_file_name="output_file").generate_and_save(mapping_dict)
+    def log_stats(self):
+        self.logger.info(f"Connection pool stats: {self.session_pool.stats()}")
+        if self.cache:
+            self.logger.info(f"Response cache stats: {self.cache.stats()}")
+        self.logger.info(f"Image store stats: {self.image_store.stats()}")
+        self.logger.info(f"Throttle stats: {self.throttle.stats()}")
+
+    def generate_report(self, mapping_dict: Dict[str, List[Tuple[str, str]]]) -> str:
+        """
+        Create the thumbnails, if enabled, and generate the HTML report of the mapping with the indexed images,
+        then export it in the export formats
+        :param mapping_dict: dictionary mapping the collateral adjectives to their animals
+        :return: the report (or its index page) path
+        """
+        metrics = Metrics.default()
+        thumbnail_index = None
+        if self.thumbnailer:
+            with metrics.timer("thumbnails"):
+                thumbnail_index = self.thumbnailer.create(self.image_index.items())
+            if self.manifest:
+                self.manifest.record_thumbnails(thumbnail_index.items())
+                self.manifest.save()
+            if not self.thumbnailer.keep_originals:
+                self.image_index = ImageIndex()
+
+        metrics.set("animals", sum(len(animals) for animals in mapping_dict.values()))
+        metrics.set("adjectives", len(mapping_dict))
+        with metrics.timer("html_generation"):
+            report_path = WikipediaCollateralAdjectiveHTMLGenerator(
+                output_dir=self.output_dir, output_file_name="output_file",
+                image_index=self.image_index, page_by=self.page_by, page_size=self.page_size,
+                thumbnail_index=thumbnail_index).generate_and_save(mapping_dict)
+        for export_format in self.export_formats:
+            with metrics.timer(f"export_{export_format}"):
+                export_path = export_for(export_format, os.path.join(self.output_dir, self.EXPORT_FILE)).write(
+                    mapping_dict, self.image_index, thumbnail_index)
+            self.logger.info(f"Exported the mapping to {export_path}")
+        return report_path
 
     def download_images_with_scraper(self, images_set: Set[Tuple[str, str]]):
         """
         Method to handle get images requests and download them
-        If use_threading is True will use ThreadPoolExecutor, otherwise will loop over them.
+        In threaded mode will use ThreadPoolExecutor, in async mode will run them as coroutines,
+        otherwise will loop over them.
         :param images_set:
         """
 
         # The download_image_with_scraper is mostly I/O bound task since it's getting the image by request
         # and then writing it to disk, therefore its make sense to use multithreading over it.
 
-        if self.use_threading:
-            max_threads = min(self.MAX_THREADS, len(images_set))
-            with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                executor.map(self.download_image_with_scraper,images_set)
-        else:
-            for image in images_set:
-                self.download_image_with_scraper(image)
+        with self.parse_pool():
+            if self.mode == self.ASYNC_MODE:
+                asyncio.run(self.download_images_async(images_set))
+            elif self.mode == self.THREADED_MODE:
+                max_threads = max(min(self.MAX_THREADS, len(images_set)), 1)
+                with ThreadPoolExecutor(max_workers=max_threads) as executor:
+                    # consumed, so an unexpected error is raised instead of silently dropped
+                    list(executor.map(self.download_image_with_scraper, images_set))
+            else:
+                for image in images_set:
+                    self.download_image_with_scraper(image)
+
+    @contextmanager
+    def parse_pool(self):
+        """
+        Context of the animal pages parsing process pool, if parse_processes is set.
+        The fetching threads (or coroutines) hand the raw pages to the pool and get back only the image urls,
+        so the CPU bound parsing escapes the GIL.
+        """
+        if not self.parse_processes:
+            yield
+            return
+
+        # spawn, forking a process that already runs fetching threads is not safe
+        with ProcessPoolExecutor(max_workers=self.parse_processes,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            self.parse_executor = executor
+            try:
+                yield
+            finally:
+                self.parse_executor = None
 
     def download_image_with_scraper(self, image_tuple):
         """
         Scrapes wikipedia page to get image url and download it
+        Failures are journaled, they don't stop the other images.
         :param image_tuple: tuple of (image_name, page_url)
         """
-        image_name, page_url = image_tuple
-        image_url = WikiScraper(url=page_url).get_image_url()
+        try:
+            image_name, image_url = self.resolve_image_url(image_tuple)
+        except Exception as e:
+            self.record_failed(image_tuple[0], "resolve", e)
+            return
         if image_url:
-            ImageDownloader(file_name=image_name, url=image_url, directory=self.output_dir).download()
-        else:
+            try:
+                self.download_image(image_name, image_url)
+            except Exception as e:
+                self.record_failed(image_name, "download", e)
+
+    def resolve_image_url(self, image_tuple: Tuple[str, str]) -> Tuple[str, str | None]:
+        """
+        Get the image url out of the batch resolved images, or scrapes wikipedia page to get it
+        :param image_tuple: tuple of (image_name, page_url)
+        :return: tuple of (image_name, image_url), image_url is None if no image found
+        """
+        image_name, page_url = image_tuple
+        image_url = self.resolved_images.get(page_url)
+        if not image_url:
+            with Metrics.default().timer("resolve"):
+                if self.parse_executor:
+                    html = BaseHTMLFetcher(page_url, session_pool=self.session_pool, cache=self.cache,
+                                           throttle=self.throttle).fetch_content()
+                    # parsed in another process, timed here
+                    with Metrics.default().timer("parse"):
+                        image_url = self.parse_executor.submit(extract_image_url, page_url, html).result()
+                else:
+                    image_url = WikiImageScraper(url=page_url, session_pool=self.session_pool,
+                                                 cache=self.cache, throttle=self.throttle).get_image_url()
+
+        self.record_resolved(image_name, page_url, image_url)
+        return image_name, image_url
+
+    def record_resolved(self, image_name: str, page_url: str, image_url: str | None):
+        """
+        Log a missing image, journal the resolved animal page and record it in the manifest, if incremental
+        :param image_name: the image name
+        :param page_url: the animal page url
+        :param image_url: the resolved image url, None if no image found
+        """
+        if not image_url:
             self.logger.warning(f"No image found for {image_name} at {page_url}")
+        self.journal.record_resolved(image_name, page_url, image_url)
+        if self.manifest:
+            self.manifest.record_resolved(image_name, page_url, image_url)
+
+    def download_image(self, image_name: str, image_url: str):
+        """
+        Downloads image to the output directory
+        :param image_name: the image name
+        :param image_url: the image url
+        """
+        if self.is_current(image_name, image_url):
+            return
+        downloader = ImageDownloader(file_name=image_name, url=image_url, directory=self.output_dir,
+                                     session_pool=self.session_pool, cache=self.cache, max_bytes=self.max_image_bytes,
+                                     store=self.image_store, index=self.image_index, throttle=self.throttle)
+        downloader.download()
+        self.record_downloaded(image_name, image_url, downloader.file_path)
+
+    def is_current(self, image_name: str, image_url: str) -> bool:
+        """
+        Check if the image is unchanged since the previous run, if incremental. A current image is journaled as done
+        :param image_name: the image name
+        :param image_url: the resolved image url
+        :return: True if the download can be skipped
+        """
+        if not self.manifest or not self.manifest.is_current(image_name, image_url):
+            return False
+        self.journal.record_downloaded(image_name, image_url, self.manifest.animals[image_name]["file_path"])
+        return True
+
+    def record_downloaded(self, image_name: str, image_url: str, file_path: str):
+        """
+        Journal a downloaded image and record it in the manifest, if incremental
+        :param image_name: the image name
+        :param image_url: the image url
+        :param file_path: the downloaded image path
+        """
+        self.journal.record_downloaded(image_name, image_url, file_path)
+        if self.manifest:
+            self.manifest.record(image_name, image_url=image_url, file_path=file_path)
+
+    def record_failed(self, image_name: str, stage: str, error: Exception):
+        """
+        Log and journal a failed animal
+        :param image_name: the image name
+        :param stage: the failed stage, resolve or download
+        :param error: the failure exception
+        """
+        self.logger.error(f"Failed to {stage} image of {image_name}: {error}")
+        Metrics.default().inc(f"{stage}_failures")
+        self.journal.record_failed(image_name, stage, error)
+
+    def scrape_with_pipeline(self, table_rows: Iterator[Tuple[ColumnarTableScraper, Tag]]) -> CompactMapping:
+        """
+        Maps the table rows, resolves the image urls and downloads the images as overlapping pipeline stages,
+        so fetching starts as soon as the first row is parsed.
+        :param table_rows: the (table mapping scraper, row) tuples of the tables rows, mapped in order
+        :return: dictionary mapping the table keys to values
+        """
+        mapping_dict = CompactMapping(dedupe=True)
+        mapping_seconds = [0.0]
+
+        def map_row(table_row):
+            table_scraper, row = table_row
+            start = time.perf_counter()
+            new_values = []
+            for keys, values in table_scraper.map_row(row):
+                # same as the images set of the phased modes, each image is treated once
+                new_values.extend(value for value in dict.fromkeys(values) if not mapping_dict.has_value(value))
+                mapping_dict.add_row(keys, values)
+            mapping_seconds[0] += time.perf_counter() - start
+            for value in new_values:
+                if (not self.manifest or self.manifest.is_changed(value)) and not self.journal.is_done(value):
+                    yield value
+
+        batch = []
+
+        def resolve_batch(image_tuple=None):
+            if image_tuple:
+                batch.append(image_tuple)
+                if len(batch) < self.images_resolver.batch_size:
+                    return
+            if not batch:
+                return
+            self.resolved_images.update(self.images_resolver.resolve(page_url for _, page_url in batch))
+            yield from batch
+            batch.clear()
+
+        def resolve(image_tuple):
+            image_name, image_url = self.resolve_image_url(image_tuple)
+            if image_url:
+                yield image_name, image_url
+
+        batch_stages = []
+        if self.images_resolver:
+            batch_stages.append(Stage("batches", resolve_batch, workers=1, queue_size=self.PIPELINE_QUEUE_SIZE,
+                                      flush=resolve_batch))
+
+        pipeline = StagedPipeline([
+            Stage("rows", map_row, workers=1, queue_size=self.PIPELINE_QUEUE_SIZE),
+            *batch_stages,
+            Stage("pages", resolve, workers=self.pipeline_workers["pages"], queue_size=self.PIPELINE_QUEUE_SIZE),
+            Stage("images", lambda image: self.download_image(*image), workers=self.pipeline_workers["images"],
+                  queue_size=self.PIPELINE_QUEUE_SIZE),
+        ])
+        with self.parse_pool():
+            errors = pipeline.run(table_rows)
+        # the rows stage is single worker, its mapping time sums to the time of mapping the whole table
+        Metrics.default().observe("table_mapping", mapping_seconds[0])
+        for stage, item, error in errors:
+            if stage in self.PIPELINE_FAILED_STAGES and item:
+                self.record_failed(item[0], self.PIPELINE_FAILED_STAGES[stage], error)
+            else:
+                self.logger.error(f"Pipeline stage {stage} failed: {error}")
+
+        return mapping_dict
+
+    async def download_images_async(self, images_set: Set[Tuple[str, str]]):
+        """
+        Runs the page fetch, image url extraction and image download chain of every image as coroutines,
+        bounded by MAX_ASYNC_REQUESTS requests in flight.
+        :param images_set: set of (image_name, page_url) tuples
+        """
+        # imported on use, the other modes don't pay for importing aiohttp
+        import aiohttp
+
+        semaphore = asyncio.Semaphore(self.MAX_ASYNC_REQUESTS)
+        connector = aiohttp.TCPConnector(limit=self.MAX_ASYNC_REQUESTS)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            images = list(images_set)
+            results = await asyncio.gather(
+                *(self.download_image_async(session, semaphore, image) for image in images),
+                return_exceptions=True)
+
+        for (image_name, _), result in zip(images, results):
+            if isinstance(result, StageFailed):
+                self.record_failed(image_name, result.stage, result.error)
+            elif isinstance(result, Exception):
+                self.record_failed(image_name, "resolve", result)
+
+    async def download_image_async(self, session: "aiohttp.ClientSession", semaphore: asyncio.Semaphore,
+                                   image_tuple: Tuple[str, str]):
+        """
+        Async counterpart of download_image_with_scraper.
+        The page parsing is CPU bound, so it runs in the parsing process pool if set,
+        otherwise in the loop default executor to keep the loop responsive.
+        :param session: aiohttp client session to fetch through
+        :param semaphore: semaphore bounding the requests in flight
+        :param image_tuple: tuple of (image_name, page_url)
+        """
+        from components.fetchers.async_fetcher import AsyncHTMLFetcher
+
+        loop = asyncio.get_running_loop()
+        image_name, page_url = image_tuple
+        image_url = self.resolved_images.get(page_url)
+        if not image_url:
+            metrics = Metrics.default()
+            with metrics.timer("resolve"):
+                async with semaphore:
+                    html = await AsyncHTMLFetcher(url=page_url, session=session, cache=self.cache,
+                                                  throttle=self.throttle).fetch_content()
+
+                if self.parse_executor:
+                    # parsed in another process, timed here
+                    with metrics.timer("parse"):
+                        image_url = await loop.run_in_executor(self.parse_executor, extract_image_url, page_url,
+                                                               html)
+                else:
+                    image_url = await loop.run_in_executor(None, extract_image_url, page_url, html)
+
+        self.record_resolved(image_name, page_url, image_url)
+        # the manifest hashes the image files, off the event loop
+        if not image_url or await loop.run_in_executor(None, self.is_current, image_name, image_url):
+            return
+
+        try:
+            downloader = ImageDownloader(file_name=image_name, url=image_url, directory=self.output_dir,
+                                         session_pool=self.session_pool, cache=self.cache,
+                                         max_bytes=self.max_image_bytes, store=self.image_store,
+                                         index=self.image_index, throttle=self.throttle)
+            async with semaphore:
+                await downloader.download_async(session)
+        except Exception as e:
+            raise StageFailed("download", e) from e
+        await loop.run_in_executor(None, self.record_downloaded, image_name, image_url, downloader.file_path)
 
     def create_output_dir(self):
         """
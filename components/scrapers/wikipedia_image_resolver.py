@@ -0,0 +1,127 @@
+import json
+import logging
+import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import HostThrottle
+from components.fetchers.response_cache import ResponseCache
+from components.fetchers.session_pool import SessionPool
+from components.metrics.metrics import Metrics
+
+
+class WikiPageImagesResolver:
+    """
+    Resolves the main image of many wikipedia pages with batched MediaWiki API requests
+    (prop=pageimages, up to MAX_TITLES titles per request), instead of fetching and parsing every article.
+    """
+
+    API_URL = "https://en.wikipedia.org/w/api.php"
+    MAX_TITLES = 50
+    THUMB_SIZE = 250
+    MAX_WORKERS = 4
+
+    def __init__(self, api_url: str = API_URL, session_pool: SessionPool = None, cache: ResponseCache = None,
+                 batch_size: int = MAX_TITLES, thumb_size: int = THUMB_SIZE, max_workers: int = MAX_WORKERS,
+                 throttle: HostThrottle = None):
+        """
+        WikiPageImagesResolver constructor
+        :param api_url: the MediaWiki API endpoint
+        :param session_pool: keep-alive session pool to fetch through, the shared default pool if not given
+        :param cache: on-disk response cache to revalidate against, no caching if not given
+        :param batch_size: amount of titles per request, at most MAX_TITLES
+        :param thumb_size: width in pixels of the resolved thumbnails
+        :param max_workers: amount of batch requests in flight
+        :param throttle: per host throttle to fetch through, not throttled if not given
+        """
+        self.logger = logging.getLogger(type(self).__name__)
+        self.api_url = api_url
+        self.session_pool = session_pool
+        self.cache = cache
+        self.batch_size = min(batch_size, self.MAX_TITLES)
+        self.thumb_size = thumb_size
+        self.max_workers = max_workers
+        self.throttle = throttle
+
+    @staticmethod
+    def page_title(page_url: str) -> str | None:
+        """
+        Get the page title out of a wikipedia article url
+        :param page_url: the article url
+        :return: the page title, None if the url is not an article url
+        """
+        path = urlparse.urlparse(page_url).path
+        if not path.startswith("/wiki/"):
+            return None
+        return urlparse.unquote(path[len("/wiki/"):]) or None
+
+    def resolve(self, page_urls: Iterable[str]) -> Dict[str, str | None]:
+        """
+        Resolve the main image url of the given wikipedia pages
+        :param page_urls: the article urls
+        :return: dictionary mapping each article url to its main image url, None if not resolved
+        """
+        titles: Dict[str, List[str]] = {}
+        resolved: Dict[str, str | None] = {}
+        for page_url in page_urls:
+            title = self.page_title(page_url)
+            resolved[page_url] = None
+            if title:
+                titles.setdefault(title, []).append(page_url)
+
+        unique_titles = list(titles)
+        batches = [unique_titles[i:i + self.batch_size] for i in range(0, len(unique_titles), self.batch_size)]
+        with Metrics.default().timer("resolve_batches"), \
+                ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(batches)), 1)) as executor:
+            for batch_images in executor.map(self.resolve_batch, batches):
+                for title, image_url in batch_images.items():
+                    for page_url in titles.get(title, []):
+                        resolved[page_url] = image_url
+
+        self.logger.info(f"Resolved {sum(1 for url in resolved.values() if url)} of {len(resolved)} images "
+                         f"in {len(batches)} requests")
+        return resolved
+
+    def resolve_batch(self, titles: List[str]) -> Dict[str, str]:
+        """
+        Resolve the main image url of up to batch_size titles in a single API request
+        :param titles: the page titles
+        :return: dictionary mapping the requested titles to their main image url, titles without image are omitted
+        """
+        params = {
+            "action": "query",
+            "format": "json",
+            "prop": "pageimages",
+            "piprop": "thumbnail",
+            "pithumbsize": self.thumb_size,
+            "pilimit": len(titles),
+            "redirects": 1,
+            "titles": "|".join(titles),
+        }
+        url = f"{self.api_url}?{urlparse.urlencode(params)}"
+        try:
+            content = BaseHTMLFetcher(url, timeout=30, session_pool=self.session_pool, cache=self.cache,
+                                      throttle=self.throttle).fetch_content()
+            query = json.loads(content).get("query", {})
+        except Exception as e:
+            self.logger.warning(f"Failed to resolve images batch of {len(titles)} titles: {e}", exc_info=True)
+            return {}
+
+        # the API answers with normalized and redirect target titles, map them back to the requested titles.
+        # Several requested titles may normalize or redirect to the same page, each of them gets its image
+        requested_by_title: Dict[str, List[str]] = {title: [title] for title in titles}
+        for key in ("normalized", "redirects"):
+            for item in query.get(key, []):
+                if item.get("from") in requested_by_title:
+                    requested = requested_by_title.pop(item["from"])
+                    requested_by_title.setdefault(item["to"], []).extend(requested)
+
+        images = {}
+        for page in query.get("pages", {}).values():
+            source = page.get("thumbnail", {}).get("source")
+            if not source:
+                continue
+            for requested in requested_by_title.get(page.get("title"), []):
+                images[requested] = urlparse.urljoin("https:", source)
+        return images
@@ -1,7 +1,8 @@
 import re
-from typing import Tuple
+import urllib.parse as urlparse
+from typing import List, Tuple
 
-from bs4 import Tag
+from bs4 import Tag, SoupStrainer
 
 from components.scrapers.base_scrapers import BaseHTMLScraper
 
@@ -11,15 +12,27 @@ class WikiScraper(BaseHTMLScraper):
     Wikipedia scraper class.
     Implement get_image_url logic specifically for Wikipedia pages.
     """
+
+    THUMB_PATTERN = re.compile('wikipedia/.*/thumb/')
+    SVG_PATTERN = re.compile('.svg')
+
+    @classmethod
+    def is_image_src(cls, img_src: str | None) -> bool:
+        """
+        Check if an <img> src is a main image candidate (a non svg wikipedia thumbnail)
+        :param img_src: the img src attribute
+        :return: True if the src is a main image candidate
+        """
+        return bool(img_src) and bool(cls.THUMB_PATTERN.search(img_src)) and not cls.SVG_PATTERN.search(img_src)
+
     def get_image_url(self) -> str | None:
         """
         Get the main image url of a wikipedia page
-        :return: the main image url as https url if found, None otherwise.
+        :return: the main image url as https url (unless the src is already absolute) if found, None otherwise.
         """
-        for raw_img in self.soup.find_all('img'):
-            img_src = raw_img.get('src')
-            if re.search('wikipedia/.*/thumb/', img_src) and not re.search('.svg', img_src):
-                return "https:" + img_src
+        raw_img = self.soup.find('img', src=self.is_image_src)
+        if raw_img:
+            return urlparse.urljoin("https:", raw_img.get('src'))
         return None
 
     def get_table_to_map(self, key_header: str, value_header: str) -> Tuple[Tag | None, int | None, int | None]:
@@ -30,12 +43,49 @@ class WikiScraper(BaseHTMLScraper):
         :param value_header: value header to map
         :return: table tag, key index in table, value index in table, key header, value header
         """
-        tables = self.soup.find_all('table')
-        for table in tables:
+        tables = self.get_tables_to_map(key_header, value_header, first_only=True)
+        return tables[0] if tables else (None, None, None)
+
+    def get_tables_to_map(self, key_header: str, value_header: str,
+                          first_only: bool = False) -> List[Tuple[Tag, int, int]]:
+        """
+        Get all the tables to map based on key and value headers, a list page is often split into several tables
+        :param key_header: key header to map
+        :param value_header: value header to map
+        :param first_only: if true, stop at the first matching table
+        :return: list of (table tag, key index in table, value index in table) of the matching tables, in page order
+        """
+        found = []
+        for table in self.soup.find_all('table'):
             headers = [th.get_text(strip=True) for th in table.find_all('th')]
             if all(header in headers for header in (key_header, value_header)):
-                self.logger.info(f'Found table with key {key_header} and value {value_header} in {self.fetcher.url}')
-                return table, headers.index(key_header), headers.index(value_header)
+                found.append((table, headers.index(key_header), headers.index(value_header)))
+                if first_only:
+                    break
 
-        self.logger.warning(f'No table with key {key_header} and value {value_header} found in {self.fetcher.url}')
-        return None, None, None
\ No newline at end of file
+        if found:
+            self.logger.info(f'Found {len(found)} tables with key {key_header} and value {value_header} '
+                             f'in {self.fetcher.url}')
+        else:
+            self.logger.warning(f'No table with key {key_header} and value {value_header} found in {self.fetcher.url}')
+        return found
+
+
+class WikiImageScraper(WikiScraper):
+    """
+    Wikipedia scraper for the main image lookup only.
+    Only the main image candidate <img> tags are kept while parsing, so no full tree is built for the page.
+    """
+
+    PARSE_ONLY = SoupStrainer('img', src=WikiScraper.is_image_src)
+
+
+def extract_image_url(url: str, html: bytes | str) -> str | None:
+    """
+    Get the main image url out of a fetched wikipedia page.
+    Takes and returns plain values only, so it can run in a process pool without pickling soup objects.
+    :param url: the page url
+    :param html: the page content
+    :return: the main image url if found, None otherwise.
+    """
+    return WikiImageScraper(url=url, html=html).get_image_url()
@@ -0,0 +1,301 @@
+import importlib
+import json
+import logging
+import math
+import os
+import socketserver
+import threading
+import time
+import urllib.parse as urlparse
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from components.batch.batch_scraper import BatchScraper
+from components.fetchers.response_cache import ResponseCache
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+
+
+class JobConflict(Exception):
+    pass
+
+
+class ScrapeService:
+    """
+    Long running scraping service, so the runs don't pay for the process startup, the imports, the config loading
+    and cold connections and caches each time. It keeps one connection pool, response cache, image store and
+    host throttle warm across jobs, and runs up to max_jobs of the submitted jobs concurrently,
+    each into its own directory of the output directory:
+    - scrape: map the job list page, scrape and download its images and generate its report
+    - regenerate: regenerate the report of a job directory with its downloaded images, without scraping
+    A job is a batch job (see BatchScraper): its name, and optionally its url, tables and options.
+    The run metrics are the process wide default metrics, summed over the jobs.
+    The statuses of the last MAX_FINISHED_JOBS finished jobs are kept, the older ones are evicted.
+    """
+
+    MAX_JOBS = 4
+    MAX_FINISHED_JOBS = 1000
+    SCRAPE = "scrape"
+    REGENERATE = "regenerate"
+    KINDS = (SCRAPE, REGENERATE)
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    # imported on use by the one-shot runs, imported once up front here so the first job doesn't pay for them
+    PRELOAD_MODULES = ("aiohttp", "components.fetchers.async_fetcher")
+
+    def __init__(self, output_dir: str, cache: ResponseCache = None, rate_limit: float = None,
+                 max_jobs: int = MAX_JOBS, defaults: dict = None, max_finished_jobs: int = MAX_FINISHED_JOBS,
+                 scraper_class: type = WikipediaCollateralAdjectiveScraper):
+        """
+        ScrapeService constructor
+        :param output_dir: directory the job directories are created in
+        :param cache: on-disk response cache shared by the jobs, no caching if not given
+        :param rate_limit: maximum requests per second to each host, shared by the jobs. No limit if not given
+        :param max_jobs: jobs run at once, the next ones are queued
+        :param defaults: the default options of the jobs, any of BatchScraper.JOB_OPTIONS
+        :param max_finished_jobs: finished job statuses kept, the oldest are evicted beyond it
+        :param scraper_class: the scraper class of the jobs
+        """
+        self.logger = logging.getLogger(__name__)
+        for module_name in self.PRELOAD_MODULES:
+            importlib.import_module(module_name)
+        self.batch = BatchScraper(None, output_dir=output_dir, cache=cache, rate_limit=rate_limit,
+                                  scraper_class=scraper_class)
+        self.defaults = defaults or {}
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="job")
+        # job id to its status
+        self.jobs: Dict[str, dict] = {}
+        self.max_finished_jobs = max_finished_jobs
+        # ids of the finished jobs, oldest first
+        self._finished = deque()
+        # names of the queued and running jobs, a job directory is used by one job at a time
+        self._active = set()
+        self._changed = threading.Condition()
+        self.started = time.time()
+
+    def submit(self, request: dict) -> dict:
+        """
+        Queue a job
+        :param request: the job kind (one of KINDS, SCRAPE if not given), name, url, tables and options
+        :return: the job status
+        """
+        kind = request.get("kind", self.SCRAPE)
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown job kind {kind}, expected one of {self.KINDS}")
+        job = self.batch.parse_job({key: value for key, value in request.items() if key != "kind"}, self.defaults,
+                                   default_target=True, trusted=False)
+        with self._changed:
+            if job["name"] in self._active:
+                raise JobConflict(f"Job {job['name']} is already queued or running")
+            self._active.add(job["name"])
+            job_id = uuid.uuid4().hex[:12]
+            status = self.jobs[job_id] = {"id": job_id, "kind": kind, "name": job["name"], "state": self.QUEUED,
+                                          "submitted": time.time()}
+        self.executor.submit(self._run, status, job)
+        self.logger.info(f"Queued {kind} job {job['name']} as {job_id}")
+        return dict(status)
+
+    def _run(self, status: dict, job: dict):
+        self._update(status, state=self.RUNNING, started=time.time())
+        try:
+            if status["kind"] == self.SCRAPE:
+                report = self.batch.run_job(job)
+            else:
+                report = self.batch.create_scraper(job, resume=True).regenerate_report()
+            failures = [list(failure) for failure in self.batch.scrapers[job["name"]].failures]
+            self._update(status, state=self.DONE, report=report, failures=failures)
+        except Exception as e:
+            self.logger.error(f"Job {status['id']} ({job['name']}) failed: {e}", exc_info=True)
+            self._update(status, state=self.FAILED, error=str(e))
+        finally:
+            with self._changed:
+                status["seconds"] = round(time.time() - status["started"], 3)
+                # the job failures are in its status, the scraper is not needed anymore
+                self.batch.scrapers.pop(job["name"], None)
+                self._active.discard(job["name"])
+                self._finished.append(status["id"])
+                while len(self._finished) > self.max_finished_jobs:
+                    self.jobs.pop(self._finished.popleft(), None)
+                self._changed.notify_all()
+
+    def _update(self, status: dict, **fields):
+        with self._changed:
+            status.update(fields)
+            self._changed.notify_all()
+
+    def status(self, job_id: str, wait: float = 0) -> dict | None:
+        """
+        :param job_id: the job id
+        :param wait: seconds to wait for the job to finish
+        :return: the job status, None if unknown
+        """
+        deadline = time.monotonic() + wait
+        with self._changed:
+            status = self.jobs.get(job_id)
+            while status and status["state"] in (self.QUEUED, self.RUNNING) and time.monotonic() < deadline:
+                self._changed.wait(deadline - time.monotonic())
+            return dict(status) if status else None
+
+    def list_jobs(self) -> List[dict]:
+        with self._changed:
+            return [dict(status) for status in self.jobs.values()]
+
+    def stats(self) -> dict:
+        """
+        :return: the service uptime, job counts by state and the shared pool, cache and store stats
+        """
+        with self._changed:
+            states = [status["state"] for status in self.jobs.values()]
+        stats = {"uptime": round(time.time() - self.started, 3),
+                 "jobs": {state: states.count(state) for state in (self.QUEUED, self.RUNNING, self.DONE, self.FAILED)},
+                 "session_pool": self.batch.session_pool.stats(), "image_store": self.batch.image_store.stats()}
+        if self.batch.cache:
+            stats["cache"] = self.batch.cache.stats()
+        return stats
+
+    def close(self):
+        """
+        Wait for the submitted jobs to finish
+        """
+        self.executor.shutdown(wait=True)
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ServiceServer:
+    """
+    JSON over HTTP front of a ScrapeService, on a local TCP port or a Unix socket:
+    - POST /jobs                     queue a job, 202 with its status
+    - GET  /jobs                     the statuses of all the jobs
+    - GET  /jobs/<id>?wait=seconds   the status of a job, waiting up to wait seconds for it to finish
+    - GET  /health                   the service stats
+    """
+
+    HOST = "127.0.0.1"
+    PORT = 8765
+
+    def __init__(self, service: ScrapeService, host: str = HOST, port: int = PORT, socket_path: str = None):
+        """
+        ServiceServer constructor
+        :param service: the service
+        :param host: the host to listen on, local only by default
+        :param port: the port to listen on, 0 for any free port
+        :param socket_path: if given, listen on this Unix socket instead, accessible to the current user only
+        """
+        self.logger = logging.getLogger(__name__)
+        self.service = service
+        self.socket_path = socket_path
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = _UnixServer(socket_path, self._handler_class())
+            os.chmod(socket_path, 0o600)
+        else:
+            self.server = _TCPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def address(self) -> str:
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self.logger.info(f"Serving on {self.address}")
+        self.server.serve_forever()
+
+    def start(self) -> "ServiceServer":
+        """
+        Serve in a background thread
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="service", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Stop serving, then wait for the submitted jobs to finish
+        """
+        if self._thread:
+            self.server.shutdown()
+            self._thread.join()
+        self.server.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.service.close()
+
+    def __enter__(self) -> "ServiceServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _handler_class(self):
+        service = self.service
+        logger = self.logger
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def address_string(self) -> str:
+                # a Unix socket client has no address
+                return self.client_address[0] if self.client_address else "unix"
+
+            def log_message(self, format, *args):
+                logger.info(f"{self.address_string()} {format % args}")
+
+            def reply(self, status: int, body):
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                url = urlparse.urlsplit(self.path)
+                parts = [part for part in url.path.split("/") if part]
+                if parts == ["health"]:
+                    return self.reply(200, service.stats())
+                if parts == ["jobs"]:
+                    return self.reply(200, service.list_jobs())
+                if len(parts) == 2 and parts[0] == "jobs":
+                    try:
+                        wait = float(urlparse.parse_qs(url.query).get("wait", ["0"])[0])
+                        if not math.isfinite(wait) or wait < 0:
+                            raise ValueError(wait)
+                    except ValueError:
+                        return self.reply(400, {"error": "wait must be a non negative number of seconds"})
+                    status = service.status(parts[1], wait=wait)
+                    return self.reply(200, status) if status else self.reply(404, {"error": "unknown job"})
+                self.reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if urlparse.urlsplit(self.path).path.rstrip("/") != "/jobs":
+                    return self.reply(404, {"error": "not found"})
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    if not isinstance(request, dict):
+                        raise ValueError("The job must be a JSON object")
+                    self.reply(202, service.submit(request))
+                except JobConflict as e:
+                    self.reply(409, {"error": str(e)})
+                except (ValueError, TypeError, KeyError) as e:
+                    self.reply(400, {"error": str(e)})
+                except Exception as e:
+                    logger.error(f"Failed to queue job: {e}", exc_info=True)
+                    self.reply(500, {"error": "internal error"})
+
+        return Handler
+
@@ -0,0 +1,42 @@
+import bisect
+import hashlib
+from typing import Iterable, List
+
+
+class HashRing:
+    """
+    Consistent hashing ring: every node is placed at replicas points of the ring, and a key belongs to the first
+    node point following its hash.
+    Adding or removing a node only moves the keys of its own points, about 1 / nodes of them.
+    """
+
+    REPLICAS = 64
+
+    def __init__(self, nodes: Iterable[str], replicas: int = REPLICAS):
+        """
+        HashRing constructor
+        :param nodes: the node names
+        :param replicas: amount of points of each node, more points spread the keys more evenly
+        """
+        points = sorted((self.hash(f"{node}#{replica}"), node) for node in nodes for replica in range(replicas))
+        if not points:
+            raise ValueError("Hash ring needs at least one node")
+        self._hashes: List[int] = [point_hash for point_hash, _ in points]
+        self._nodes: List[str] = [node for _, node in points]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        """
+        Stable hash of a key, unlike the builtin hash it is the same in every process
+        :param key: the key
+        :return: 64 bits hash
+        """
+        return int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big")
+
+    def node_for(self, key: str) -> str:
+        """
+        :param key: the key
+        :return: the node the key belongs to
+        """
+        idx = bisect.bisect(self._hashes, self.hash(key)) % len(self._hashes)
+        return self._nodes[idx]
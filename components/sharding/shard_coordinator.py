@@ -0,0 +1,229 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from typing import Dict, List, Tuple
+
+from components.fetchers.image_index import ImageIndex
+from components.fetchers.response_cache import ResponseCache
+from components.mapping.compact_mapping import CompactMapping
+from components.metrics.metrics import Metrics
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from components.sharding.hash_ring import HashRing
+from components.sharding.work_queue import Lease, LeaseLost, WorkQueue
+
+
+class ShardWorker:
+    """
+    Worker scraping and downloading the images of the queued shards, until every shard is done.
+    Workers on several processes or hosts share the queue, each shard is leased to one of them at a time.
+    The shards of a dead worker are taken over once their lease expires, resuming from their journal.
+    """
+
+    POLL_SECONDS = 1.0
+    # images downloaded between checks that the shard lease is still held
+    LEASE_CHECK_IMAGES = 256
+
+    def __init__(self, queue: WorkQueue, output_dir: str = None, worker_id: str = None,
+                 scraper_class: type = WikipediaCollateralAdjectiveScraper, cache_dir: str = None,
+                 cache_max_bytes: int = ResponseCache.DEFAULT_MAX_BYTES, offline: bool = False, **scraper_kwargs):
+        """
+        ShardWorker constructor
+        :param queue: the shared work queue
+        :param output_dir: the directory to download to, the output directory of the queue plan if not given
+        :param worker_id: the worker name, unique across hosts. Host name and process id if not given
+        :param scraper_class: the scraper class downloading the images
+        :param cache_dir: on-disk response cache directory of the scrapers, no caching if not given.
+        The worker opens the cache itself, so the settings are passed to the worker processes as is
+        :param cache_max_bytes: maximum total size of the cached bodies, in bytes
+        :param offline: if true, the scrapers only serve cached responses, requires cache_dir
+        :param scraper_kwargs: the scraper arguments (mode, use_images_api, max_image_bytes, rate_limit...),
+        the pipeline mode maps the table rows so it can't scrape a shard
+        """
+        if scraper_kwargs.get("mode") == WikipediaCollateralAdjectiveScraper.PIPELINE_MODE:
+            raise ValueError("A shard worker can't run in pipeline mode")
+        if offline and not cache_dir:
+            raise ValueError("An offline shard worker requires cache_dir")
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue
+        self.output_dir = output_dir
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.scraper_class = scraper_class
+        self.scraper_kwargs = scraper_kwargs
+        if cache_dir:
+            self.scraper_kwargs["cache"] = ResponseCache(cache_dir, max_bytes=cache_max_bytes, offline=offline)
+
+    def run(self) -> int:
+        """
+        Claim and process shards until the queue is complete, waiting for the queue to be created if needed
+        :return: amount of shards processed by this worker
+        """
+        while not self.queue.is_ready():
+            time.sleep(self.POLL_SECONDS)
+        output_dir = self.output_dir or self.queue.plan()["output_dir"]
+
+        scraper = None
+        processed = 0
+        try:
+            while True:
+                lease = self.queue.claim(self.worker_id)
+                if lease is None:
+                    if self.queue.is_complete():
+                        break
+                    # the other shards are leased, wait for them to be done or their lease to expire
+                    time.sleep(self.POLL_SECONDS)
+                    continue
+                scraper = self.process(lease, scraper, output_dir)
+                if not lease.lost.is_set():
+                    processed += 1
+        finally:
+            if scraper:
+                scraper.journal.close()
+        self.logger.info(f"Worker {self.worker_id} processed {processed} shards")
+        return processed
+
+    def process(self, lease: Lease, scraper: WikipediaCollateralAdjectiveScraper | None,
+                output_dir: str) -> WikipediaCollateralAdjectiveScraper:
+        """
+        Scrape and download the images of a leased shard, renewing the lease meanwhile,
+        in batches of LEASE_CHECK_IMAGES so a lost lease stops the work on the shard
+        :param lease: the shard lease
+        :param scraper: the scraper of the previous shards, created if None, so its pools stay warm across shards
+        :param output_dir: the directory to download to
+        :return: the scraper. If the lease was lost meanwhile, the shard is left to the worker that took it over,
+        which resumes it from its journal, and lease.lost is set
+        """
+        images = self.queue.shard(lease.shard_id)
+        journal_path = self.queue.journal_path(lease.shard_id)
+        start = time.perf_counter()
+        try:
+            with lease.keep_alive():
+                if scraper is None:
+                    # the list page is mapped by the coordinator only
+                    scraper = self.scraper_class(output_dir=output_dir, journal_path=journal_path, resume=True,
+                                                 html="", **self.scraper_kwargs)
+                else:
+                    scraper.open_journal(journal_path, resume=True)
+                pending = sorted(scraper.journal.pending(images))
+                for batch_start in range(0, len(pending), self.LEASE_CHECK_IMAGES):
+                    if lease.lost.is_set():
+                        raise LeaseLost(f"Lease of {lease.shard_id} lost by {self.worker_id}")
+                    scraper.download_images(set(pending[batch_start:batch_start + self.LEASE_CHECK_IMAGES]))
+                failures = scraper.journal.failure_list()
+
+            self.queue.complete(lease, {"images": len(images), "scraped": len(pending), "failures": failures,
+                                        "seconds": round(time.perf_counter() - start, 3)})
+        except LeaseLost as e:
+            lease.lost.set()
+            self.logger.warning(f"Worker {self.worker_id} stopped: {e}")
+            return scraper
+        self.logger.info(f"Worker {self.worker_id} done with {lease.shard_id}: {len(pending)} of {len(images)} "
+                         f"images scraped, {len(failures)} failed")
+        return scraper
+
+def run_worker(queue_dir: str, lease_seconds: float, worker_id: str, scraper_kwargs: dict) -> int:
+    """
+    Entry point of the local worker processes
+    """
+    queue = WorkQueue(queue_dir, lease_seconds=lease_seconds)
+    return ShardWorker(queue, worker_id=worker_id, **scraper_kwargs).run()
+
+
+class ShardCoordinator:
+    """
+    Runs a scrape split over worker processes:
+    - plan: maps the table and splits its images into shards by consistent hashing of the animal name,
+      written to the work queue
+    - run_workers: starts the local worker processes, workers of other hosts may join through a shared queue directory
+    - merge: once every shard is done, generates the HTML report of the mapping with the downloaded images
+    """
+
+    SHARDS_PER_WORKER = 4
+    QUEUE_DIR = ".queue"
+
+    def __init__(self, scraper: WikipediaCollateralAdjectiveScraper, workers: int = 2, shards: int = None,
+                 queue_dir: str = None, lease_seconds: float = WorkQueue.LEASE_SECONDS, worker_kwargs: dict = None,
+                 resume: bool = False):
+        """
+        ShardCoordinator constructor
+        :param scraper: the scraper mapping the table and generating the report
+        :param workers: amount of local worker processes, 0 to only rely on workers of other hosts
+        :param shards: amount of shards, SHARDS_PER_WORKER per worker if not given
+        :param queue_dir: the work queue directory, QUEUE_DIR in the scraper output directory if not given
+        :param lease_seconds: seconds a shard lease lasts without being renewed
+        :param worker_kwargs: the ShardWorker arguments (mode, use_images_api, max_image_bytes, rate_limit,
+        cache_dir, offline...), passed to the worker processes so they must be picklable
+        :param resume: if true, the shard journals of the previous queue are kept, so its completed animals are skipped
+        """
+        self.logger = logging.getLogger(__name__)
+        self.scraper = scraper
+        self.workers = workers
+        self.shards = shards or max(workers, 1) * self.SHARDS_PER_WORKER
+        self.queue = WorkQueue(queue_dir or os.path.join(scraper.output_dir, self.QUEUE_DIR),
+                               lease_seconds=lease_seconds)
+        self.worker_kwargs = worker_kwargs or {}
+        self.resume = resume
+        self.failures: List[Tuple[str, str, str]] = []
+
+    def run(self) -> str:
+        """
+        Plan, work and merge
+        :return: the report (or its index page) path
+        """
+        try:
+            self.plan()
+            self.run_workers()
+            return self.merge()
+        finally:
+            self.scraper.journal.close()
+
+    def plan(self) -> CompactMapping:
+        """
+        Map the table and queue its images in shards
+        :return: the table mapping
+        """
+        mapping = self.scraper.map_table()
+        ring = HashRing([f"shard-{idx:04d}" for idx in range(self.shards)])
+        shards: Dict[str, List[Tuple[str, str]]] = {}
+        for image in mapping.unique_values():
+            shards.setdefault(ring.node_for(image[0]), []).append(image)
+        self.queue.create(shards, mapping, self.scraper.output_dir, resume=self.resume)
+        return mapping
+
+    def run_workers(self):
+        """
+        Run the local worker processes until they are done
+        """
+        # spawn, the workers run their own thread and process pools
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=run_worker,
+                                     args=(self.queue.queue_dir, self.queue.lease_seconds,
+                                           f"{socket.gethostname()}-worker{idx}", self.worker_kwargs))
+                     for idx in range(self.workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            if process.exitcode:
+                self.logger.error(f"Worker process {process.name} exited with code {process.exitcode}")
+
+    def merge(self) -> str:
+        """
+        Wait for every shard to be done, then generate the report.
+        The shards left by dead workers are processed here, once their lease expires.
+        :return: the report (or its index page) path
+        """
+        if not self.queue.is_complete():
+            ShardWorker(self.queue, output_dir=self.scraper.output_dir,
+                        worker_id=f"{socket.gethostname()}-coordinator", **self.worker_kwargs).run()
+
+        results = self.queue.results()
+        self.failures = sorted(tuple(failure) for result in results for failure in result["failures"])
+        Metrics.default().set("shards", len(results))
+        # the workers downloaded to the output directory, the images are indexed once
+        self.scraper.image_index = ImageIndex.from_directory(self.scraper.output_dir)
+        return self.scraper.generate_report(self.queue.mapping())
+
+    def failure_summary(self) -> str:
+        return self.scraper.failure_summary(self.failures)
@@ -0,0 +1,280 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Mapping, Tuple
+
+from components.mapping.compact_mapping import CompactMapping
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class Lease:
+    """
+    Exclusive claim of a worker on a shard, held as long as its lease file keeps being renewed
+    """
+    def __init__(self, queue: "WorkQueue", shard_id: str, worker_id: str, inode: int):
+        """
+        Lease constructor
+        :param queue: the work queue of the shard
+        :param shard_id: the leased shard
+        :param worker_id: the worker holding the lease
+        :param inode: the inode of the lease file created by the worker
+        """
+        self.queue = queue
+        self.shard_id = shard_id
+        self.worker_id = worker_id
+        self.inode = inode
+        self.path = queue.lease_path(shard_id)
+        # set by the keep alive heartbeat once the lease is lost
+        self.lost = threading.Event()
+
+    def is_held(self) -> bool:
+        """
+        :return: True if the lease file is still the one of this worker, an expired lease may be taken over
+        """
+        return self._renew(touch=False)
+
+    def renew(self) -> bool:
+        """
+        Extend the lease by another lease period
+        :return: True if renewed, False if the lease was lost to another worker
+        """
+        return self._renew(touch=True)
+
+    def _renew(self, touch: bool) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                if os.fstat(f.fileno()).st_ino != self.inode or json.load(f).get("worker") != self.worker_id:
+                    return False
+                if touch:
+                    # touches the opened file, never a lease file that replaced it meanwhile
+                    os.utime(f.fileno() if os.utime in os.supports_fd else self.path)
+                return True
+        except (OSError, ValueError):
+            return False
+
+    def release(self):
+        if self.is_held():
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def keep_alive(self):
+        """
+        Context renewing the lease in a background thread, every third of the lease period.
+        The lost event is set once the lease is lost, the holder should then stop working on the shard
+        """
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.queue.lease_seconds / 3):
+                if not self.renew():
+                    self.queue.logger.warning(f"Lease of {self.shard_id} lost by {self.worker_id}")
+                    self.lost.set()
+                    return
+
+        thread = threading.Thread(target=heartbeat, name=f"lease-{self.shard_id}", daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+
+class WorkQueue:
+    """
+    Work queue of image shards in a directory, shared by the coordinator and the workers through the file system,
+    so the workers may run on other hosts mounting it. No broker, every state change is an atomic file operation:
+    - plan.json: the shard ids and the output directory, written last so a worker never sees a partial queue
+    - mapping.json: the table mapping, for the merge step
+    - shards/<shard_id>.json: the (animal_name, page_url) tuples of the shard
+    - leases/<shard_id>.lease: exclusive claim of a worker, created with O_EXCL and renewed by touching it.
+      A lease not renewed for lease_seconds is expired, and taken over by the next worker claiming the shard:
+      renamed away, checked to still be expired once renamed, and replaced by a new O_EXCL lease file
+    - journals/<shard_id>.jsonl: the run journal of the shard, a taken over shard resumes from it
+    - done/<shard_id>.json: the shard result, its worker, size and failures
+    """
+
+    PLAN_FILE = "plan.json"
+    MAPPING_FILE = "mapping.json"
+    DIRS = ("shards", "leases", "journals", "done")
+    LEASE_SECONDS = 60.0
+
+    def __init__(self, queue_dir: str, lease_seconds: float = LEASE_SECONDS):
+        """
+        WorkQueue constructor
+        :param queue_dir: the queue directory
+        :param lease_seconds: seconds a lease lasts without being renewed
+        """
+        self.logger = logging.getLogger(__name__)
+        self.queue_dir = queue_dir
+        self.lease_seconds = lease_seconds
+
+    def path(self, *parts: str) -> str:
+        return os.path.join(self.queue_dir, *parts)
+
+    def lease_path(self, shard_id: str) -> str:
+        return self.path("leases", f"{shard_id}.lease")
+
+    def journal_path(self, shard_id: str) -> str:
+        return self.path("journals", f"{shard_id}.jsonl")
+
+    def done_path(self, shard_id: str) -> str:
+        return self.path("done", f"{shard_id}.json")
+
+    @staticmethod
+    def write_json(path: str, data):
+        """
+        Atomically write a json file
+        :param path: the file path
+        :param data: JSON serializable data
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def read_json(path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def create(self, shards: Dict[str, List[Tuple[str, str]]], mapping: Mapping[str, List[Tuple[str, str]]],
+               output_dir: str, resume: bool = False):
+        """
+        Write a new queue, replacing the previous one
+        :param shards: dictionary mapping the shard ids to their (animal_name, page_url) tuples
+        :param mapping: the table mapping
+        :param output_dir: the output directory the workers download to
+        :param resume: if true, the shard journals of the previous queue are kept, so its completed animals are skipped
+        """
+        for name in self.DIRS:
+            if not (resume and name == "journals"):
+                shutil.rmtree(self.path(name), ignore_errors=True)
+            os.makedirs(self.path(name), exist_ok=True)
+        for name in (self.PLAN_FILE, self.MAPPING_FILE):
+            if os.path.exists(self.path(name)):
+                os.remove(self.path(name))
+
+        for shard_id, images in shards.items():
+            self.write_json(self.path("shards", f"{shard_id}.json"), sorted(images))
+        self.write_json(self.path(self.MAPPING_FILE), dict(mapping.items()))
+        self.write_json(self.path(self.PLAN_FILE), {"shards": sorted(shards), "output_dir": output_dir,
+                                                    "created": time.time()})
+        self.logger.info(f"Queued {sum(len(images) for images in shards.values())} images "
+                         f"in {len(shards)} shards to {self.queue_dir}")
+
+    def is_ready(self) -> bool:
+        """
+        :return: True if the queue was created
+        """
+        return os.path.exists(self.path(self.PLAN_FILE))
+
+    def plan(self) -> dict:
+        return self.read_json(self.path(self.PLAN_FILE))
+
+    def mapping(self) -> CompactMapping:
+        mapping = CompactMapping()
+        for key, values in self.read_json(self.path(self.MAPPING_FILE)).items():
+            mapping.add(key, (tuple(value) for value in values))
+        return mapping
+
+    def shard(self, shard_id: str) -> List[Tuple[str, str]]:
+        """
+        :param shard_id: the shard id
+        :return: the (animal_name, page_url) tuples of the shard
+        """
+        return [tuple(image) for image in self.read_json(self.path("shards", f"{shard_id}.json"))]
+
+    def pending(self) -> List[str]:
+        """
+        :return: ids of the shards not done yet, leased or not
+        """
+        return [shard_id for shard_id in self.plan()["shards"] if not os.path.exists(self.done_path(shard_id))]
+
+    def is_complete(self) -> bool:
+        return self.is_ready() and not self.pending()
+
+    def claim(self, worker_id: str) -> Lease | None:
+        """
+        Lease the first pending shard that is not leased, or whose lease expired
+        :param worker_id: the claiming worker
+        :return: the lease, None if every pending shard is leased
+        """
+        for shard_id in self.pending():
+            lease = self._acquire(shard_id, worker_id)
+            if lease:
+                return lease
+        return None
+
+    def _acquire(self, shard_id: str, worker_id: str) -> Lease | None:
+        path = self.lease_path(shard_id)
+        try:
+            expired = time.time() - os.stat(path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            expired = None
+        if expired is False:
+            return None
+        if expired:
+            # the rename is atomic, a single worker takes the expired lease over
+            stale_path = f"{path}.{worker_id}.{threading.get_ident()}.expired"
+            try:
+                os.rename(path, stale_path)
+            except FileNotFoundError:
+                return None
+            if time.time() - os.stat(stale_path).st_mtime <= self.lease_seconds:
+                # renewed or taken over by another worker since checked, put it back unless claimed meanwhile
+                try:
+                    os.link(stale_path, path)
+                except FileExistsError:
+                    pass
+                os.remove(stale_path)
+                return None
+            os.remove(stale_path)
+            self.logger.warning(f"Lease of {shard_id} expired, taken over by {worker_id}")
+
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"worker": worker_id, "claimed": time.time()}, f)
+            inode = os.fstat(f.fileno()).st_ino
+
+        lease = Lease(self, shard_id, worker_id, inode)
+        if not lease.is_held():
+            return None
+        # the shard may have been completed since listed as pending
+        if os.path.exists(self.done_path(shard_id)):
+            lease.release()
+            return None
+        return lease
+
+    def complete(self, lease: Lease, result: dict):
+        """
+        Record the result of a leased shard and release its lease
+        :param lease: the shard lease
+        :param result: JSON serializable shard result
+        :raise LeaseLost: if the lease is no longer held by its worker, the shard result is then not recorded
+        """
+        if lease.lost.is_set() or not lease.is_held():
+            raise LeaseLost(f"Lease of {lease.shard_id} lost by {lease.worker_id}")
+        self.write_json(self.done_path(lease.shard_id), {"shard": lease.shard_id, "worker": lease.worker_id,
+                                                         **result})
+        lease.release()
+
+    def results(self) -> List[dict]:
+        """
+        :return: the results of the done shards
+        """
+        return [self.read_json(self.done_path(shard_id)) for shard_id in self.plan()["shards"]
+                if os.path.exists(self.done_path(shard_id))]
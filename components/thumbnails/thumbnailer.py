@@ -0,0 +1,155 @@
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from components.fetchers.image_index import ImageIndex
+from components.fetchers.image_store import ImageStore
+from utils import set_default_mode
+
+
+def make_thumbnail(source_path: str, thumbs_dir: str, size: int, image_format: str,
+                   extension: str) -> str | None:
+    """
+    Create the thumbnail of an image, named by the source content hash so unchanged images are never re-encoded.
+    Module level function, so it can be sent to a process pool.
+    :param source_path: the image path
+    :param thumbs_dir: directory to write the thumbnail to
+    :param size: maximum width and height of the thumbnail in pixels
+    :param image_format: the Pillow format name to encode the thumbnail with
+    :param extension: the thumbnail file extension
+    :return: the thumbnail path, None if the image can not be decoded
+    """
+    # imported on use, the runs without thumbnails don't pay for importing Pillow
+    from PIL import Image
+
+    thumb_path = os.path.join(thumbs_dir, f"{ImageStore.file_hash(source_path)}_{size}{extension}")
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    try:
+        with Image.open(source_path) as image:
+            image.thumbnail((size, size))
+            if image_format == "JPEG" and image.mode != "RGB":
+                image = image.convert("RGB")
+            fd, tmp_path = tempfile.mkstemp(dir=thumbs_dir, prefix=".", suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, format=image_format)
+                set_default_mode(tmp_path)
+                os.replace(tmp_path, thumb_path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Failed to create thumbnail of {source_path}: {e}")
+        return None
+    return thumb_path
+
+
+class Thumbnailer:
+    """
+    Creates fixed size thumbnails of the downloaded images in a process pool.
+    Thumbnails are named by the source image content hash, so re-runs only decode and encode new or changed images.
+    The image name to thumbnail mapping is kept in INDEX_FILE, so thumbnails outlive their dropped originals.
+    Requires Pillow (pip install Pillow).
+    """
+
+    FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+    DEFAULT_FORMAT = "webp"
+    DEFAULT_SIZE = 150
+    THUMBS_DIR = "thumbnails"
+    INDEX_FILE = "index.json"
+
+    def __init__(self, thumbs_dir: str, size: int = DEFAULT_SIZE, image_format: str = DEFAULT_FORMAT,
+                 processes: int = None, keep_originals: bool = True, store: ImageStore = None):
+        """
+        Thumbnailer constructor
+        :param thumbs_dir: directory to write the thumbnails to
+        :param size: maximum width and height of the thumbnails in pixels
+        :param image_format: thumbnails format, one of FORMATS
+        :param processes: size of the process pool, the cores count if not given, 0 creates them in process
+        :param keep_originals: if false, the original images are removed once their thumbnail is created
+        :param store: the image store of the original images, their stored copy is removed with them
+        """
+        try:
+            import PIL.Image  # noqa: F401
+        except ImportError:
+            raise ImportError("Thumbnails require Pillow, install it with: pip install Pillow")
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unknown thumbnails format {image_format}, expected one of {tuple(self.FORMATS)}")
+
+        self.logger = logging.getLogger(__name__)
+        self.thumbs_dir = thumbs_dir
+        self.size = size
+        self.image_format, self.extension = self.FORMATS[image_format]
+        self.processes = os.cpu_count() if processes is None else processes
+        self.keep_originals = keep_originals
+        self.store = store
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+
+    def create(self, images: Dict[str, str]) -> ImageIndex:
+        """
+        Create the thumbnails of the given images
+        :param images: dictionary mapping image name to its path
+        :return: index mapping each image name to its thumbnail path, of the given images and of the ones created
+        by previous runs. Images that can not be decoded are omitted
+        """
+        args = [(path, self.thumbs_dir, self.size, self.image_format, self.extension) for path in images.values()]
+        if self.processes and len(args) > 1:
+            # spawn, forking a process that may still run fetching threads is not safe
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(args)),
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                thumbs = list(executor.map(make_thumbnail, *zip(*args), chunksize=16))
+        else:
+            thumbs = [make_thumbnail(*arg) for arg in args]
+
+        thumb_names = self.load_index()
+        created = 0
+        for (name, path), thumb_path in zip(images.items(), thumbs):
+            if thumb_path:
+                thumb_names[name] = os.path.basename(thumb_path)
+                created += 1
+                if not self.keep_originals:
+                    if self.store and os.path.exists(path):
+                        self.store.remove_file(path)
+                    self.remove(path)
+        self.save_index(thumb_names)
+        self.logger.info(f"Created thumbnails of {created} of {len(images)} images")
+
+        return ImageIndex({name: os.path.join(self.thumbs_dir, thumb_name) for name, thumb_name in thumb_names.items()
+                           if os.path.exists(os.path.join(self.thumbs_dir, thumb_name))})
+
+    def load_index(self) -> Dict[str, str]:
+        """
+        :return: dictionary mapping image name to its thumbnail file name, of the previous runs
+        """
+        try:
+            with open(os.path.join(self.thumbs_dir, self.INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            self.logger.warning(f"Ignoring corrupted thumbnails index: {e}")
+            return {}
+
+    def save_index(self, thumb_names: Dict[str, str]):
+        """
+        Atomically write the thumbnails index
+        :param thumb_names: dictionary mapping image name to its thumbnail file name
+        """
+        index_path = os.path.join(self.thumbs_dir, self.INDEX_FILE)
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(thumb_names, f)
+        os.replace(tmp_path, index_path)
+
+    @staticmethod
+    def remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
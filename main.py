@@ -1,9 +1,15 @@
 import argparse
+import os
 import webbrowser
 import logging
 import time
 
+from components.export.mapping_export import EXPORTS
+from components.fetchers.response_cache import ResponseCache
+from components.html_generator.wikipedia_html_generators import WikipediaCollateralAdjectiveHTMLGenerator
+from components.metrics.metrics import Metrics, sink_for_path
 from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from components.thumbnails.thumbnailer import Thumbnailer
 from utils import abs_path
 
 
@@ -12,8 +18,36 @@ def parse_args():
     parse command line arguments:
     -v or --verbose to control log level (INFO if passed, ERROR if not), default is ERROR
     -d or --debug to control using of threading (if passed will not use threading), default is using threads
+    --mode to choose the images execution mode (sequential, threaded, async or pipeline), overrides --debug
     --output_directory to control the output directory name, default is /tmp
     --display_results to display results on browser at the end of run, default is False
+    --parse_processes to parse the animal pages in a process pool of that size, default is 0 (parse in threads)
+    --images_api to resolve the images in batches with the MediaWiki API, default is scraping every animal page
+    --max_image_mb to fail images larger than that size, default is no limit
+    --incremental to only scrape the animals that are new or changed since the previous run into the output directory
+    --resume to continue the journaled run of the output directory, skipping its completed animals
+    --stream_table to read the list page table rows as the page downloads, default is parsing the whole page
+    --cache_dir to keep an on-disk HTTP response cache between runs, default is no cache
+    --cache_max_mb to bound the response cache size, default is 1024MB
+    --offline to only serve responses from the cache, requires --cache_dir
+    --page_by to split the report into pages by adjective first letter or by rows, default is a single page
+    --page_size to set the amount of rows per report page when paging by rows, default is 500
+    --thumbnails to create thumbnails of the images in that format (webp or jpeg), default is no thumbnails
+    --thumbnail_size to set the maximum width and height of the thumbnails in pixels, default is 150
+    --drop_originals to remove the original images once their thumbnail is created, default is keeping them
+    --export to also export the mapping and its image paths as an indexed SQLite database and/or JSON Lines,
+    default is the HTML report only
+    --rate_limit to limit the requests per second sent to each host, default is no limit
+    --metrics_out to write the run metrics to that file, a Prometheus textfile if it ends with .prom, JSON otherwise
+    --workers to split the images over that many worker processes, default is a single process run
+    --worker to only join the work queue of a sharded run as a worker, default is running the whole scrape
+    --queue_dir to set the work queue directory of a sharded run, default is .queue in the output directory
+    --batch_config to run the scraping jobs of that YAML config file, each into its own output subdirectory
+    --serve to run as a long running service accepting scrape and regenerate jobs, default is a one-shot run
+    --socket to serve on that Unix socket, default is serving HTTP on --host and --port
+    --host to set the host the service listens on, default is 127.0.0.1
+    --port to set the port the service listens on, default is 8765
+    --max_jobs to set the amount of service jobs run at once, default is 4
     """
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -21,11 +55,165 @@ def parse_args():
         action="store_true",
         help="If true, will not use threading",
     )
+    parser.add_argument(
+        "--mode",
+        choices=WikipediaCollateralAdjectiveScraper.MODES,
+        default=None,
+        help="Images execution mode, overrides --debug",
+    )
     parser.add_argument(
         "--output_dir",
         type=abs_path,
         default="tmp",
     )
+    parser.add_argument(
+        "--parse_processes",
+        type=int,
+        default=0,
+        help="Size of the process pool parsing the animal pages, 0 parses in the fetching threads",
+    )
+    parser.add_argument(
+        "--images_api",
+        action="store_true",
+        help="If true, will resolve the images in batches with the MediaWiki API, scraping only the misses",
+    )
+    parser.add_argument(
+        "--max_image_mb",
+        type=float,
+        default=None,
+        help="Maximum size of a downloaded image in MB, larger images are skipped",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="If true, keeps a manifest of the run results and only scrapes new or changed animals",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="If true, continues the journaled run of the output directory instead of starting over",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=abs_path,
+        default=None,
+        help="Directory of the on-disk HTTP response cache, no caching if not given",
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=int,
+        default=ResponseCache.DEFAULT_MAX_BYTES // 1024 ** 2,
+        help="Maximum size of the response cache in MB, least recently used entries are evicted",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="If true, will only serve responses from the cache (requires --cache_dir)",
+    )
+    parser.add_argument(
+        "--page_by",
+        choices=WikipediaCollateralAdjectiveHTMLGenerator.PAGE_BY,
+        default=None,
+        help="Split the report into pages linked from an index page, by adjective first letter or by rows",
+    )
+    parser.add_argument(
+        "--page_size",
+        type=int,
+        default=WikipediaCollateralAdjectiveHTMLGenerator.DEFAULT_PAGE_SIZE,
+        help="Amount of rows per report page when paging by rows",
+    )
+    parser.add_argument(
+        "--thumbnails",
+        choices=Thumbnailer.FORMATS,
+        default=None,
+        help="Create thumbnails of the images in this format in a process pool and display them (requires Pillow)",
+    )
+    parser.add_argument(
+        "--thumbnail_size",
+        type=int,
+        default=Thumbnailer.DEFAULT_SIZE,
+        help="Maximum width and height of the thumbnails in pixels",
+    )
+    parser.add_argument(
+        "--drop_originals",
+        action="store_true",
+        help="If true, will remove the original images once their thumbnail is created",
+    )
+    parser.add_argument(
+        "--export",
+        nargs="+",
+        choices=tuple(EXPORTS),
+        default=None,
+        help="Also export the mapping and its image paths in these formats alongside the report",
+    )
+    parser.add_argument(
+        "--rate_limit",
+        type=float,
+        default=None,
+        help="Maximum requests per second sent to each host, no limit if not given",
+    )
+    parser.add_argument(
+        "--metrics_out",
+        type=abs_path,
+        default=None,
+        help="File to write the run metrics to, a Prometheus textfile if it ends with .prom, a JSON report otherwise",
+    )
+    parser.add_argument(
+        "--stream_table",
+        action="store_true",
+        help="If true, will read the list page table rows one by one as the page downloads",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Amount of local worker processes the images are sharded over, 0 to rely on --worker runs only",
+    )
+    parser.add_argument(
+        "--worker",
+        action="store_true",
+        help="If true, only process the shards of the work queue of a sharded run, until they are all done",
+    )
+    parser.add_argument(
+        "--queue_dir",
+        type=abs_path,
+        default=None,
+        help="Work queue directory of a sharded run, shared by its workers. Default is .queue in the output directory",
+    )
+    parser.add_argument(
+        "--batch_config",
+        type=abs_path,
+        default=None,
+        help="YAML config file of scraping jobs to run in one process, sharing connections, cache and images",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="If true, will run as a service accepting scrape and regenerate jobs, sharing warm pools and caches",
+    )
+    parser.add_argument(
+        "--socket",
+        type=abs_path,
+        default=None,
+        help="Unix socket the service listens on, instead of --host and --port",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Host the service listens on",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="Port the service listens on",
+    )
+    parser.add_argument(
+        "--max_jobs",
+        type=int,
+        default=4,
+        help="Amount of service jobs run at once, the next ones are queued",
+    )
     parser.add_argument(
         "--display_results",
         action="store_true",
@@ -36,7 +224,19 @@ def parse_args():
         action="store_true",
         help="If true, set logging level to INFO, otherwise ERROR",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.offline and not args.cache_dir:
+        parser.error("--offline requires --cache_dir")
+    sharded = args.workers is not None or args.worker
+    if sharded and args.mode == WikipediaCollateralAdjectiveScraper.PIPELINE_MODE:
+        parser.error("--workers and --worker can't run in pipeline mode")
+    if sharded and args.incremental:
+        parser.error("--workers and --worker can't be combined with --incremental")
+    if sharded and args.batch_config:
+        parser.error("--batch_config can't be sharded")
+    if args.serve and (sharded or args.batch_config):
+        parser.error("--serve can't be combined with --workers, --worker or --batch_config")
+    return args
 
 def main():
     """
@@ -48,8 +248,96 @@ def main():
         level=logging.INFO if args.verbose else logging.ERROR,
     )
 
-    output_file_path = WikipediaCollateralAdjectiveScraper(use_threading=not args.debug,
-                                                           output_dir=args.output_dir).scrape()
+    max_image_bytes = int(args.max_image_mb * 1024 ** 2) if args.max_image_mb else None
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(cache_dir=args.cache_dir, max_bytes=args.cache_max_mb * 1024 ** 2, offline=args.offline)
+
+    # the sharding, batch and service modules are imported by their modes only, to keep the one-shot startup short
+    worker_kwargs = {"use_threading": not args.debug, "mode": args.mode, "parse_processes": args.parse_processes,
+                     "use_images_api": args.images_api, "max_image_bytes": max_image_bytes,
+                     "rate_limit": args.rate_limit, "cache_dir": args.cache_dir,
+                     "cache_max_bytes": args.cache_max_mb * 1024 ** 2, "offline": args.offline}
+    if args.worker:
+        from components.sharding.shard_coordinator import ShardCoordinator, ShardWorker
+        from components.sharding.work_queue import WorkQueue
+
+        queue_dir = args.queue_dir or os.path.join(args.output_dir, ShardCoordinator.QUEUE_DIR)
+        ShardWorker(WorkQueue(queue_dir), **worker_kwargs).run()
+        if args.metrics_out:
+            sink_for_path(args.metrics_out).write(Metrics.default())
+        return
+
+    if args.serve:
+        from components.service.scrape_service import ScrapeService, ServiceServer
+
+        defaults = {"use_threading": not args.debug, "mode": args.mode, "parse_processes": args.parse_processes,
+                    "use_images_api": args.images_api, "max_image_bytes": max_image_bytes,
+                    "incremental": args.incremental, "page_by": args.page_by, "page_size": args.page_size,
+                    "thumbnails_format": args.thumbnails, "thumbnail_size": args.thumbnail_size,
+                    "keep_originals": not args.drop_originals, "stream_table": args.stream_table,
+                    "export_formats": args.export}
+        service = ScrapeService(args.output_dir, cache=cache, rate_limit=args.rate_limit, max_jobs=args.max_jobs,
+                                defaults=defaults)
+        server = ServiceServer(service, host=args.host, port=args.port, socket_path=args.socket)
+        print(f"Serving on {server.address}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return
+
+    if args.batch_config:
+        from components.batch.batch_scraper import BatchScraper
+
+        batch = BatchScraper(args.batch_config, output_dir=args.output_dir, cache=cache, rate_limit=args.rate_limit)
+        results = batch.run()
+        for name, path in results.items():
+            print(f"{name}: {path or 'failed'}")
+        if batch.failure_summary():
+            print(batch.failure_summary())
+        if args.metrics_out:
+            sink_for_path(args.metrics_out).write(Metrics.default())
+        if args.display_results:
+            for path in filter(None, results.values()):
+                webbrowser.open_new_tab(path)
+        return
+
+    scraper = WikipediaCollateralAdjectiveScraper(use_threading=not args.debug,
+                                                  output_dir=args.output_dir,
+                                                  mode=args.mode,
+                                                  cache=cache,
+                                                  parse_processes=args.parse_processes,
+                                                  use_images_api=args.images_api,
+                                                  max_image_bytes=max_image_bytes,
+                                                  incremental=args.incremental,
+                                                  page_by=args.page_by,
+                                                  page_size=args.page_size,
+                                                  thumbnails_format=args.thumbnails,
+                                                  thumbnail_size=args.thumbnail_size,
+                                                  keep_originals=not args.drop_originals,
+                                                  rate_limit=args.rate_limit,
+                                                  resume=args.resume,
+                                                  stream_table=args.stream_table,
+                                                  export_formats=args.export)
+    if args.workers is not None:
+        from components.sharding.shard_coordinator import ShardCoordinator
+
+        runner = ShardCoordinator(scraper, workers=args.workers, queue_dir=args.queue_dir, worker_kwargs=worker_kwargs,
+                                  resume=args.resume)
+        output_file_path = runner.run()
+    else:
+        runner = scraper
+        output_file_path = scraper.scrape()
+
+    failure_summary = runner.failure_summary()
+    if failure_summary:
+        print(failure_summary)
+
+    if args.metrics_out:
+        sink_for_path(args.metrics_out).write(Metrics.default())
 
     if args.display_results:
         webbrowser.open_new_tab(output_file_path)
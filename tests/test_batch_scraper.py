@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+import pytest
+import yaml
+
+from components.batch.batch_scraper import BatchScraper
+from components.scrapers.extractors.wikipedia_extractors import AnimalExtractor
+from tests.tests_data.local_server import LocalServer
+from tests.tests_data.test_data import test_image_path
+
+
+def list_page(base_url: str, tables: list) -> bytes:
+    """
+    :param tables: list of (headers, rows) of the page tables, rows of (animal index, key) tuples
+    """
+    html = ""
+    for headers, rows in tables:
+        cells = "".join(f'<tr><td><a href="{base_url}/wiki/Animal{idx}">Animal{idx}</a></td><td>{key}</td></tr>'
+                        for idx, key in rows)
+        html += f'<table><tr>{"".join(f"<th>{header}</th>" for header in headers)}</tr>{cells}</table>'
+    return f"<html><body>{html}</body></html>".encode()
+
+
+@pytest.fixture(scope="module")
+def batch_server():
+    with open(test_image_path, "rb") as f:
+        image_bytes = f.read()
+    with LocalServer({}) as server:
+        headers = ("Animal", "Collateral adjective")
+        server.routes["/wiki/List_A"] = (list_page(server.base_url, [
+            (headers, [(idx, f"adj{idx % 3}") for idx in range(0, 10)]),
+            (("Animal", "Young"), [(idx, f"young{idx}") for idx in range(0, 10)]),
+            # the list continues in a second table with the same headers
+            (headers, [(idx, f"adj{idx % 3}") for idx in range(10, 20)]),
+        ]), "text/html")
+        server.routes["/wiki/List_B"] = (list_page(server.base_url, [
+            (("Animal", "Group"), [(idx, f"group{idx % 2}") for idx in range(15, 25)]),
+        ]), "text/html")
+        for idx in range(25):
+            server.routes[f"/wiki/Animal{idx}"] = (
+                f'<html><body><img src="{server.base_url}/wikipedia/commons/thumb/animal{idx}.jpg" /></body></html>'
+                .encode(), "text/html")
+            server.routes[f"/wikipedia/commons/thumb/animal{idx}.jpg"] = (image_bytes, "image/jpeg")
+        yield server
+
+
+def write_config(tmpdir: str, config: dict) -> str:
+    path = os.path.join(tmpdir, "batch.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+def test_batch_scrape(batch_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = write_config(tmpdir, {"defaults": {"mode": "threaded"}, "jobs": [
+            {"name": "adjectives", "url": batch_server.url("/wiki/List_A"), "tables": [
+                {"key_header": "Collateral adjective", "value_header": "Animal",
+                 "keys_extractor": "collateral_adjectives", "values_extractor": "animal"},
+                {"key_header": "Young", "value_header": "Animal",
+                 "keys_extractor": "text", "values_extractor": "tests.test_batch_scraper:AnimalExtractor"}]},
+            {"name": "groups", "url": batch_server.url("/wiki/List_B"), "mode": "sequential", "tables": [
+                {"key_header": "Group", "value_header": "Animal", "keys_extractor": "text"}]},
+        ]})
+        output_dir = os.path.join(tmpdir, "out")
+        batch = BatchScraper(config_path, output_dir)
+        results = batch.run()
+
+        assert all(results.values()) and set(results) == {"adjectives", "groups"}
+        adjectives = batch.scrapers["adjectives"].map_table()
+        assert len(adjectives["adj0"]) == 7, "Should map the rows of both tables with the same headers"
+        assert "young3" in adjectives, "Should map the other header pair of the job"
+        for name, count in (("adjectives", 20), ("groups", 10)):
+            images = [file for file in os.listdir(os.path.join(output_dir, name)) if file.endswith(".jpg")]
+            assert len(images) == count, f"Job {name} should have {count} images, instead got {len(images)}"
+
+        image_hits = sum(hits for path, hits in batch_server.hits.items() if path.startswith("/wikipedia/"))
+        assert image_hits == 25, "Images listed by both jobs should be downloaded once through the shared store"
+        assert batch.failures == []
+
+
+def test_batch_config_errors():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        job = {"name": "job", "url": "https://unused", "tables": [{"key_header": "A", "value_header": "B"}]}
+        for config in ({"jobs": [{**job, "unknown_option": 1}]},
+                       {"jobs": [job, job]},
+                       {"jobs": [{**job, "tables": [{"key_header": "A", "value_header": "B",
+                                                     "keys_extractor": "missing"}]}]},
+                       {"jobs": [{"name": "job"}]}):
+            with pytest.raises(ValueError):
+                BatchScraper(write_config(tmpdir, config), tmpdir)
+        for table in ({"key_header": "A"}, {"key_header": "A", "value_header": "B", "keys_extractor": "nosuchmod:X"},
+                      {"key_header": "A", "value_header": "B", "keys_extractor": "os:NoSuchClass"},
+                      {"key_header": "A", "value_header": "B", "keys_extractor": "os:sep"}, "A"):
+            with pytest.raises(ValueError):
+                BatchScraper(write_config(tmpdir, {"jobs": [{**job, "tables": [table]}]}), tmpdir)
+        for name in ("/tmp/x", "../x", "a/b", "..", "", "job.d", 1):
+            with pytest.raises(ValueError):
+                BatchScraper(write_config(tmpdir, {"jobs": [{**job, "name": name}]}), tmpdir)
+    assert BatchScraper.extractor("components.scrapers.extractors.wikipedia_extractors:AnimalExtractor") \
+        is AnimalExtractor
@@ -0,0 +1,252 @@
+import os
+import tempfile
+
+import pytest
+
+from components.export.mapping_export import MappingIndex
+from components.fetchers.response_cache import ResponseCache
+from components.manifest.run_journal import RunJournal
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from tests.tests_data.local_server import LocalServer, wiki_routes
+from tests.tests_data.test_data import test_image_path
+
+N_ANIMALS = 120
+
+
+@pytest.fixture(scope="module")
+def wiki_server():
+    with open(test_image_path, "rb") as f:
+        image_bytes = f.read()
+    with LocalServer({}, latency=0.01) as server:
+        server.routes.update(wiki_routes(server.base_url, N_ANIMALS, image_bytes))
+        yield server
+
+
+def local_scraper(server: LocalServer, output_dir: str, mode: str, **kwargs) -> WikipediaCollateralAdjectiveScraper:
+    scraper_class = type("LocalScraper", (WikipediaCollateralAdjectiveScraper,),
+                         {"WIKI_URL": server.url("/wiki/List_of_animal_names"),
+                          "IMAGES_API_URL": server.url("/w/api.php")})
+    return scraper_class(output_dir=output_dir, mode=mode, **kwargs)
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_scrape_modes(wiki_server, mode):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_file = local_scraper(wiki_server, tmpdir, mode).scrape()
+
+        assert os.path.exists(output_file), f"Should generate {output_file}"
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+
+
+@pytest.mark.parametrize("mode", [WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                  WikipediaCollateralAdjectiveScraper.ASYNC_MODE,
+                                  WikipediaCollateralAdjectiveScraper.PIPELINE_MODE])
+def test_scrape_with_parse_processes(wiki_server, mode):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_scraper(wiki_server, tmpdir, mode, parse_processes=2).scrape()
+
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_scrape_with_images_api(wiki_server, mode):
+    article_hits = lambda: sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wiki/Animal"))
+    api_hits, articles_before = wiki_server.hits.get("/w/api.php", 0), article_hits()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_scraper(wiki_server, tmpdir, mode, use_images_api=True).scrape()
+
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+
+    misses = len(range(0, N_ANIMALS, 7))
+    assert article_hits() - articles_before == misses, f"Should scrape only the {misses} API misses"
+    assert wiki_server.hits["/w/api.php"] - api_hits == -(-N_ANIMALS // 50), "Should resolve in batches of 50"
+
+
+def test_scrape_rerun_is_incremental(wiki_server):
+    image_hits = lambda: sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wikipedia/"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE).scrape()
+        hits_before = image_hits()
+        local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE).scrape()
+
+        assert image_hits() == hits_before, "Re-run should link the stored images instead of downloading them"
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should keep {N_ANIMALS} images, instead got {len(images)}"
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_incremental_scrape(wiki_server, mode):
+    article_hits = lambda: sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wiki/Animal"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        first_output = local_scraper(wiki_server, tmpdir, mode, incremental=True).scrape()
+        with open(first_output, encoding="utf-8") as f:
+            first_html = f.read()
+
+        hits_before = article_hits()
+        os.remove(os.path.join(tmpdir, "Animal3.jpg"))
+        second_output = local_scraper(wiki_server, tmpdir, mode, incremental=True).scrape()
+
+        assert article_hits() - hits_before == 1, "Should scrape only the animal whose image is gone"
+        assert os.path.exists(os.path.join(tmpdir, "Animal3.jpg")), "Should download the missing image again"
+        with open(second_output, encoding="utf-8") as f:
+            assert f.read().split("Generated on")[0] == first_html.split("Generated on")[0], \
+                "Should generate the same output from the manifest"
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_incremental_scrape_retries_failed_download(wiki_server, mode):
+    image_path = "/wikipedia/commons/thumb/animal5.jpg"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        route = wiki_server.routes.pop(image_path)
+        try:
+            local_scraper(wiki_server, tmpdir, mode, incremental=True).scrape()
+        finally:
+            wiki_server.routes[image_path] = route
+        assert not os.path.exists(os.path.join(tmpdir, "Animal5.jpg")), "Should fail the download of Animal5"
+
+        hits_before = wiki_server.hits[image_path]
+        local_scraper(wiki_server, tmpdir, mode, incremental=True).scrape()
+
+        assert wiki_server.hits[image_path] - hits_before == 1, "Should retry the failed download in the next run"
+        assert os.path.exists(os.path.join(tmpdir, "Animal5.jpg")), "Should download the failed image"
+
+
+@pytest.mark.parametrize("mode", [WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                  WikipediaCollateralAdjectiveScraper.PIPELINE_MODE])
+def test_scrape_with_stream_table(wiki_server, mode):
+    list_path = "/wiki/List_of_animal_names"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        expected = local_scraper(wiki_server, tmpdir, mode).map_table()
+        cache = ResponseCache(cache_dir=os.path.join(tmpdir, "cache"))
+        list_hits = wiki_server.hits[list_path]
+        scraper = local_scraper(wiki_server, os.path.join(tmpdir, "out"), mode, stream_table=True, cache=cache)
+
+        assert wiki_server.hits[list_path] == list_hits, "Should not fetch the list page before reading its rows"
+        assert dict(scraper.map_table().items()) == dict(expected.items()), "Should map the same as the parsed page"
+        assert cache.get(wiki_server.url(list_path)) is not None, "Should cache the streamed page"
+
+        scraper.scrape()
+        images = [name for name in os.listdir(os.path.join(tmpdir, "out")) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+
+
+def test_scrape_with_exports(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scraper = local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                export_formats=["sqlite", "jsonl"])
+        mapping = scraper.map_table()
+        scraper.scrape()
+
+        with open(os.path.join(tmpdir, "mapping.jsonl"), encoding="utf-8") as f:
+            assert sum(1 for _ in f) == len(mapping)
+        adjective, animals = next(iter(mapping.items()))
+        with MappingIndex(os.path.join(tmpdir, "mapping.sqlite")) as index:
+            assert [(name, url) for name, url, _ in index.animals_of(adjective)] == list(animals)
+            name = animals[0][0]
+            assert adjective in index.adjectives_of(name)
+            assert index.image_path(name) == scraper.image_index.get(name) is not None
+
+
+def test_unknown_export_format():
+    with pytest.raises(ValueError):
+        WikipediaCollateralAdjectiveScraper(output_dir="unused", export_formats=["csv"])
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_resume_after_failure(wiki_server, mode):
+    wiki_hits = lambda: sum(hits for path, hits in wiki_server.hits.items()
+                            if path.startswith(("/wiki/Animal", "/wikipedia/")))
+    image_path = "/wikipedia/commons/thumb/animal5.jpg"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        route = wiki_server.routes.pop(image_path)
+        try:
+            scraper = local_scraper(wiki_server, tmpdir, mode)
+            scraper.scrape()
+        finally:
+            wiki_server.routes[image_path] = route
+
+        assert [(name, stage) for name, stage, _ in scraper.failures] == [("Animal5", "download")]
+        assert "Animal5 [download]" in scraper.failure_summary()
+
+        hits_before = wiki_hits()
+        resumed = local_scraper(wiki_server, tmpdir, mode, resume=True)
+        resumed.scrape()
+
+        assert wiki_hits() - hits_before == 1, "Should only download the failed image, without scraping its page"
+        assert resumed.failures == []
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+
+
+def test_scrape_twice(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scraper = local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE)
+        first = scraper.scrape()
+        second = scraper.scrape()
+
+        assert first == second, f"Should write the same report twice, instead got {first} and {second}"
+        assert scraper.journal.closed, "Should close the journal of the second run"
+        assert os.path.exists(f"{scraper.journal.path}{RunJournal.PREVIOUS_SUFFIX}"), \
+            "Should keep the journal of the first run aside"
+
+
+def test_async_mode_sends_requests_concurrently(wiki_server):
+    """
+    Async mode keeps at least as many requests in flight as threaded mode.
+    Wall time on a shared test host is too noisy to compare the modes throughput, bench_scrape measures it
+    against a latency injecting stand-in server and checks it against its baseline
+    """
+    peaks = {}
+    for mode in (WikipediaCollateralAdjectiveScraper.THREADED_MODE, WikipediaCollateralAdjectiveScraper.ASYNC_MODE):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            scraper = local_scraper(wiki_server, tmpdir, mode)
+            images_set = {(f"Animal{i}", wiki_server.url(f"/wiki/Animal{i}")) for i in range(N_ANIMALS)}
+            wiki_server.reset_peak()
+            scraper.download_images_with_scraper(images_set)
+            peaks[mode] = wiki_server.peak_in_flight
+
+    # the single event loop thread competes with the local server for the cpu, the bounds leave room for it
+    assert peaks["async"] >= N_ANIMALS // 4, f"Async mode should send the requests concurrently, instead got {peaks}"
+    assert peaks["async"] >= peaks["threaded"], f"Async mode should match threaded mode, instead got {peaks}"
+
+
+def test_scrape_with_thumbnails(wiki_server):
+    pytest.importorskip("PIL")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_file = local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                    thumbnails_format="webp", keep_originals=False).scrape()
+
+        assert not [name for name in os.listdir(tmpdir) if name.endswith(".jpg")], "Originals should be removed"
+        with open(output_file, encoding="utf-8") as f:
+            html = f.read()
+        assert html.count(".webp") == 3 * N_ANIMALS
+        assert "No image found" not in html
+
+
+def test_incremental_scrape_with_dropped_originals(wiki_server):
+    pytest.importorskip("PIL")
+    image_hits = lambda: sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wikipedia/"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        options = {"thumbnails_format": "webp", "keep_originals": False, "incremental": True}
+        local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE, **options).scrape()
+        objects_dir = os.path.join(tmpdir, WikipediaCollateralAdjectiveScraper.IMAGE_STORE_DIR, "objects")
+        stored = [name for _, _, names in os.walk(objects_dir) for name in names]
+        assert stored == [], f"Should remove the stored originals too, instead got {stored}"
+
+        hits_before = image_hits()
+        output_file = local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                    **options).scrape()
+
+        assert image_hits() == hits_before, \
+            f"Should not download the images again, instead got {image_hits() - hits_before} downloads"
+        with open(output_file, encoding="utf-8") as f:
+            html = f.read()
+        assert html.count(".webp") == 3 * N_ANIMALS, "Should display the thumbnails of the previous run"
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        WikipediaCollateralAdjectiveScraper(output_dir="unused", mode="unknown")
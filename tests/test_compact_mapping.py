@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+import pytest
+
+from components.mapping.compact_mapping import CompactMapping
+
+ROWS = [
+    (["feline"], [("Cat", "url/Cat")]),
+    (["canine", "lupine"], [("Wolf", "url/Wolf")]),
+    (["feline"], [("Lion", "url/Lion"), ("Cat", "url/Cat")]),
+    (["canine"], [("Dog", "url/Dog")]),
+]
+
+
+def test_compact_mapping_matches_dict():
+    expected = defaultdict(list)
+    for keys, values in ROWS:
+        for key in keys:
+            expected[key].extend(value for value in values if value not in expected[key])
+
+    mapping = CompactMapping(dedupe=True)
+    for keys, values in ROWS:
+        mapping.add_row(keys, values)
+
+    assert mapping == expected
+    assert list(mapping) == ["feline", "canine", "lupine"], "Should keep the keys insertion order"
+    assert mapping["feline"] == [("Cat", "url/Cat"), ("Lion", "url/Lion")], "Should dedupe the values of a key"
+    assert "lupine" in mapping and "ursine" not in mapping
+    with pytest.raises(KeyError):
+        mapping["ursine"]
+    assert mapping.unique_values() == [("Cat", "url/Cat"), ("Wolf", "url/Wolf"), ("Lion", "url/Lion"),
+                                       ("Dog", "url/Dog")]
+    assert mapping.keys_of(("Wolf", "url/Wolf")) == ["canine", "lupine"]
+    assert mapping.keys_of(("Bear", "url/Bear")) == []
+    assert mapping.edges() == 5
+
+
+def test_compact_mapping_without_dedupe():
+    mapping = CompactMapping()
+    for keys, values in ROWS:
+        mapping.add_row(keys, values)
+    assert mapping["feline"] == [("Cat", "url/Cat"), ("Lion", "url/Lion"), ("Cat", "url/Cat")], \
+        f"Should keep the repeated values by default, like a dict of lists, instead got {mapping['feline']}"
+
+
+def test_compact_mapping_row_without_keys():
+    mapping = CompactMapping()
+    mapping.add_row([], [("Bear", "url/Bear")])
+    mapping.add_row(iter(["ursine"]), [("Panda", "url/Panda")])
+
+    assert not mapping.has_value(("Bear", "url/Bear")), "A value of a row without keys should not be listed"
+    assert mapping.unique_values() == [("Panda", "url/Panda")], f"Unexpected values {mapping.unique_values()}"
+    assert mapping["ursine"] == [("Panda", "url/Panda")], f"Should add a row of iterated keys, " \
+                                                          f"instead got {mapping['ursine']}"
+
+
+def test_compact_mapping_dedupes_after_reads():
+    mapping = CompactMapping(dedupe=True)
+    for _ in range(2):
+        for idx in range(100):
+            mapping.add("Null", [f"Animal{idx}"])
+        assert len(mapping["Null"]) == 100
+    assert mapping.keys_of("Animal0") == ["Null"]
+    mapping.add("Null", ["Animal999"])
+    assert mapping.keys_of("Animal999") == ["Null"], "Should rebuild the reverse index after an add"
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import aiohttp
+import pytest
+import requests
+
+from components.fetchers.async_fetcher import AsyncHTMLFetcher
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.host_throttle import AIMDLimit, HostThrottle, backoff_delay, retry_after
+from components.fetchers.session_pool import SessionPool
+from tests.tests_data.local_server import LocalServer
+
+
+def flaky_route(failures: int, status: int = 429, headers: dict = None):
+    """
+    :return: route answering status failures times, then 200
+    """
+    calls = {"count": 0}
+
+    def route(params):
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            return b"slow down", "text/plain", status, headers or {}
+        return b"ok", "text/plain"
+    return route
+
+
+def test_retry_after_parsing():
+    assert retry_after({"Retry-After": "3"}) == 3.0, "Should parse seconds"
+    date_delay = retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert 0 <= date_delay < 1, f"Should not wait for a past date, instead got {date_delay}"
+    assert retry_after({"Retry-After": "soon"}) is None, "Should ignore an invalid value"
+    assert retry_after({}) is None, "Should be None without the header"
+
+
+def test_backoff_delay():
+    for attempt in range(1, 6):
+        delay = backoff_delay(attempt, base=0.5, cap=4)
+        assert 0 <= delay <= min(4, 0.5 * 2 ** (attempt - 1)), f"Delay {delay} of attempt {attempt} out of bounds"
+    delay = backoff_delay(1, retry_after_seconds=2, base=0.5)
+    assert delay >= 2, f"Should wait at least the Retry-After, instead got {delay}"
+    delay = backoff_delay(1, retry_after_seconds=100, cap=4)
+    assert delay == 4, f"Should cap the Retry-After, instead got {delay}"
+
+
+def test_aimd_limit():
+    limit = AIMDLimit(initial=4, minimum=1, maximum=10)
+    for _ in range(10):
+        limit.on_success()
+    assert limit.limit == 10, f"Should grow up to the maximum while healthy, instead got {limit.limit}"
+
+    limit.on_congestion()
+    assert limit.limit == 5, f"Should halve on congestion, instead got {limit.limit}"
+    limit.on_congestion(cooldown=60)
+    assert limit.limit == 5, f"Should decrease once per cooldown, instead got {limit.limit}"
+
+    limit.on_success()
+    assert limit.value < 6, f"Should grow additively after the first decrease, instead got {limit.value}"
+
+
+def test_limit_holds_under_varying_latency():
+    throttle = HostThrottle(max_concurrency=16)
+    latencies = [0.001, 0.05, 0.002, 0.08, 0.001, 0.03] * 5
+
+    def request(latency):
+        with throttle.slot("http://host/"):
+            time.sleep(latency)
+
+    threads = [threading.Thread(target=request, args=(latency,)) for latency in latencies]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = throttle.stats()["host"]
+    assert stats["limit"] == 16, f"Should start at the maximum and not back off without congestion, instead got {stats}"
+    assert stats["congested"] == 0, f"Should not count slow requests as congested, instead got {stats}"
+
+
+def test_slot_bounds_host_concurrency():
+    throttle = HostThrottle(max_concurrency=2, initial_concurrency=2)
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def request(url):
+        with throttle.slot(url):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+
+    threads = [threading.Thread(target=request, args=(f"http://host/{i}",)) for i in range(10)]
+    threads.append(threading.Thread(target=request, args=("http://other/",)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] <= 3, f"At most 2 requests per host should be in flight, got {peak[0]}"
+    requests_count = throttle.stats()["host"]["requests"]
+    assert requests_count == 10, f"Should count the 10 requests of the host, instead got {requests_count}"
+
+
+def test_slot_rate_limit():
+    throttle = HostThrottle(rate=20, burst=1)
+    start = time.monotonic()
+    for _ in range(5):
+        with throttle.slot("http://host/"):
+            pass
+    assert time.monotonic() - start >= 0.19, "5 requests at 20 per second should take at least 0.2s"
+
+
+def test_async_slot_bounds_host_concurrency():
+    throttle = HostThrottle(max_concurrency=3, initial_concurrency=3)
+    in_flight, peak = [0], [0]
+
+    async def request():
+        async with throttle.async_slot("http://host/"):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak[0] == 3, f"Should run up to 3 requests at once, instead got {peak[0]}"
+
+
+def test_fetch_retries_congestion_honoring_retry_after():
+    routes = {"/page": flaky_route(1, headers={"Retry-After": "1"})}
+    throttle = HostThrottle(initial_concurrency=8)
+    with LocalServer(routes) as server:
+        start = time.monotonic()
+        content = BaseHTMLFetcher(server.url("/page"), session_pool=SessionPool(), throttle=throttle).fetch_content()
+
+        assert content == b"ok", f"Should get the page once retried, instead got {content}"
+        assert time.monotonic() - start >= 1, "Retry should wait for the Retry-After"
+        assert server.hits["/page"] == 2, f"Should retry once, instead got {server.hits['/page']} hits"
+        host_stats = throttle.stats()[server.base_url.split("//")[1]]
+        assert host_stats["congested"] == 1, f"Should count the 429 as congested, instead got {host_stats}"
+        assert host_stats["limit"] < 8, f"Congestion should decrease the concurrency limit, instead got {host_stats}"
+
+
+def test_fetch_does_not_retry_client_errors():
+    throttle = HostThrottle(backoff_base=0.01)
+    with LocalServer({}) as server:
+        with pytest.raises(requests.exceptions.HTTPError):
+            BaseHTMLFetcher(server.url("/missing"), session_pool=SessionPool(), throttle=throttle).fetch()
+        assert server.hits["/missing"] == 1, f"Should not retry a 404, instead got {server.hits['/missing']} hits"
+
+
+def test_fetch_gives_up_after_retries():
+    throttle = HostThrottle(retries=2, backoff_base=0.01)
+    with LocalServer({"/page": flaky_route(5, status=503)}) as server:
+        with pytest.raises(requests.exceptions.HTTPError):
+            BaseHTMLFetcher(server.url("/page"), session_pool=SessionPool(), throttle=throttle).fetch()
+        assert server.hits["/page"] == 2, f"Should stop after 2 attempts, instead got {server.hits['/page']} hits"
+
+
+def test_async_fetch_retries_congestion():
+    throttle = HostThrottle(backoff_base=0.01)
+
+    async def fetch(url):
+        async with aiohttp.ClientSession() as session:
+            return await AsyncHTMLFetcher(url, session=session, throttle=throttle).fetch_content()
+
+    with LocalServer({"/page": flaky_route(2)}) as server:
+        content = asyncio.run(fetch(server.url("/page")))
+        assert content == b"ok", f"Should get the page once retried, instead got {content}"
+        assert server.hits["/page"] == 3, f"Should retry twice, instead got {server.hits['/page']} hits"
@@ -1,8 +1,13 @@
 import tempfile
 import os
 
+import pytest
+
+from components.fetchers.image_index import ImageIndex
+from components.html_generator.html_generator import HTMLGenerator
 from components.html_generator.wikipedia_html_generators import WikipediaCollateralAdjectiveHTMLGenerator
 from tests.tests_data.test_data import mapping_dict
+from utils import UMASK
 
 
 def test_wikipedia_animal_html_generate_and_save():
@@ -12,4 +17,129 @@ def test_wikipedia_animal_html_generate_and_save():
 
         assert os.path.exists(os.path.join(tmpdir, "test.html")), \
         f"WikipediaCollateralAdjectiveHTMLGenerator failed to generate {os.path.join(tmpdir, 'test.html')}"
+        mode = os.stat(os.path.join(tmpdir, "test.html")).st_mode & 0o777
+        assert mode == 0o666 & ~UMASK, f"Should create the page with the default mode, instead got {oct(mode)}"
+
+
+
+def test_wikipedia_animal_html_image_paths_from_directory_scan():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for file_name in ("Dunlin.JPEG", "Eagle.svg", ".Sandpiper.part"):
+            with open(os.path.join(tmpdir, file_name), "wb") as f:
+                f.write(b"image")
+
+        html = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test").generate(
+            mapping_dict)
+
+        assert os.path.join(tmpdir, "Dunlin.JPEG") in html, "Should find an image of an upper case extension"
+        assert os.path.join(tmpdir, "Eagle.svg") in html, "Should find an image of any extension"
+        assert ".part" not in html, "Should skip the partial downloads"
+
+
+def test_wikipedia_animal_html_image_paths_from_index():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        index = ImageIndex({"dunlin": "/images/dunlin.png"})
+        index.add("Eagle", "/images/Eagle.gif")
+
+        html = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test",
+                                                         image_index=index).generate(mapping_dict)
+
+        assert "/images/dunlin.png" in html, "Should look the image up case-insensitively"
+        assert "/images/Eagle.gif" in html, "Should look the image up by its exact name"
+        assert len(index) == 2, f"Should not scan the directory into a given index, instead got {len(index)} images"
+
+
+def test_wikipedia_animal_html_generate_chunks_streams_rows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generator = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test")
+        chunks = list(generator.generate_chunks(mapping_dict))
+
+        assert len(chunks) == len(mapping_dict) + 2
+        assert "".join(chunks) == generator.generate(mapping_dict)
+
+
+def test_html_generator_subclass_with_generate_only():
+    class StringGenerator(HTMLGenerator):
+        def generate(self, data):
+            return f"<html>{data}</html>"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generator = StringGenerator(tmpdir, "test", WikipediaCollateralAdjectiveHTMLGenerator.DEFAULT_CONFIG_PATH)
+        file_path = generator.generate_and_save("data")
+
+        with open(file_path, encoding="utf-8") as f:
+            assert f.read() == "<html>data</html>"
+        with pytest.raises(NotImplementedError):
+            HTMLGenerator(tmpdir, "test", WikipediaCollateralAdjectiveHTMLGenerator.DEFAULT_CONFIG_PATH).generate("data")
+
+
+def test_html_generator_failed_generation_keeps_previous_file():
+    class FailingGenerator(HTMLGenerator):
+        def generate_chunks(self, data):
+            yield "<html>"
+            raise RuntimeError("generation failed")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generator = FailingGenerator(tmpdir, "test", WikipediaCollateralAdjectiveHTMLGenerator.DEFAULT_CONFIG_PATH)
+        generator.save_file("previous")
+
+        with pytest.raises(RuntimeError):
+            generator.generate_and_save("data")
+
+        assert os.listdir(tmpdir) == ["test.html"]
+        with open(generator.file_path, encoding="utf-8") as f:
+            assert f.read() == "previous"
+
+
+def test_wikipedia_animal_html_paginated_by_letter():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        data = {**mapping_dict, "1st": [("Ant", "https://en.wikipedia.org/wiki/Ant")]}
+        generator = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test",
+                                                              page_by="letter")
+        index_path = generator.generate_and_save(data)
+
+        assert index_path == os.path.join(tmpdir, "test.html")
+        assert sorted(os.listdir(tmpdir)) == ["test.html", "test_A.html", "test_S.html", "test_other.html"]
+        with open(index_path, encoding="utf-8") as f:
+            index_html = f.read()
+        assert index_html.index("test_A.html") < index_html.index("test_S.html") < index_html.index("test_other.html")
+        with open(os.path.join(tmpdir, "test_S.html"), encoding="utf-8") as f:
+            page_html = f.read()
+        assert "Dunlin" in page_html and "Eagle" not in page_html
+        assert 'loading="lazy" width="150" height="150"' in page_html
+
+
+def test_wikipedia_animal_html_paginated_by_rows():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        data = {f"adjective{row}": [(f"Animal{row}", "")] for row in range(5)}
+        generator = WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test",
+                                                              page_by="rows", page_size=2)
+        generator.generate_and_save(data)
+
+        assert sorted(os.listdir(tmpdir)) == ["test.html", "test_1.html", "test_2.html", "test_3.html"]
+        with open(os.path.join(tmpdir, "test_3.html"), encoding="utf-8") as f:
+            assert "Animal4" in f.read()
+
+
+def test_wikipedia_animal_html_unknown_page_by():
+    with pytest.raises(ValueError):
+        WikipediaCollateralAdjectiveHTMLGenerator(output_dir="", output_file_name="test", page_by="size")
+
+
+def test_wikipedia_animal_html_rerun_removes_stale_pages():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        data = {f"adjective{row}": [(f"Animal{row}", "")] for row in range(5)}
+        with open(os.path.join(tmpdir, "test_notes.html"), "w") as f:
+            f.write("not a page")
+        WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test", page_by="rows",
+                                                  page_size=2).generate_and_save(data)
+        WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test",
+                                                  page_by="letter").generate_and_save(data)
+
+        files = sorted(os.listdir(tmpdir))
+        assert files == ["test.html", "test_A.html", "test_notes.html"], \
+            f"Should replace the pages of the previous run, instead got {files}"
 
+        WikipediaCollateralAdjectiveHTMLGenerator(output_dir=tmpdir, output_file_name="test").generate_and_save(data)
+        files = sorted(os.listdir(tmpdir))
+        assert files == ["test.html", "test_notes.html"], f"Should remove the pages of a single page run, got {files}"
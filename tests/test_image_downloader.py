@@ -2,11 +2,12 @@ from unittest.mock import patch, Mock
 
 import pytest
 
-from components.fetchers.image_downloader import ImageDownloader
+from components.fetchers.image_downloader import ImageDownloader, ImageTooLarge, IncompleteDownload
 import os
 import tempfile
 
 from tests.tests_data.test_data import test_image_path
+from utils import UMASK
 
 
 @patch("components.fetchers.image_downloader.BaseHTMLFetcher.fetch")
@@ -14,19 +15,23 @@ def test_download_image(mock_fetch):
     with open(test_image_path, 'rb') as f:
         image_bytes = f.read()
     mock_response = Mock()
-    mock_response.content = image_bytes
+    mock_response.iter_content.return_value = [image_bytes]
+    mock_response.headers = {"Content-Length": str(len(image_bytes))}
     mock_fetch.return_value = mock_response
 
     with tempfile.TemporaryDirectory() as tmpdir:
         ImageDownloader(url="mock", directory=tmpdir, file_name="test.png").download()
         assert os.path.exists(os.path.join(tmpdir, "test.png")), \
             f"ImageDownloader failed to create the file {os.path.join(tmpdir, 'test.png')}"
+        mode = os.stat(os.path.join(tmpdir, "test.png")).st_mode & 0o777
+        assert mode == 0o666 & ~UMASK, f"Should create the file with the default mode, instead got {oct(mode)}"
 
 
 @patch("components.fetchers.image_downloader.BaseHTMLFetcher.fetch")
 def test_download_image_empty_content(mock_fetch):
     mock_response = Mock()
-    mock_response.content = None
+    mock_response.iter_content.return_value = []
+    mock_response.headers = {}
     mock_fetch.return_value = mock_response
 
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -34,5 +39,39 @@ def test_download_image_empty_content(mock_fetch):
             ImageDownloader(url="mock", directory=tmpdir, file_name="test.png").download()
 
 
+@patch("components.fetchers.image_downloader.BaseHTMLFetcher.fetch")
+def test_download_image_interrupted(mock_fetch):
+    def broken_stream(**kwargs):
+        yield b"partial"
+        raise ConnectionError("connection reset")
+
+    mock_response = Mock()
+    mock_response.iter_content.side_effect = broken_stream
+    mock_response.headers = {}
+    mock_fetch.return_value = mock_response
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(ConnectionError):
+            ImageDownloader(url="mock.png", directory=tmpdir, file_name="test").download()
+        assert os.listdir(tmpdir) == [], f"Interrupted download should leave no file, found {os.listdir(tmpdir)}"
 
 
+@pytest.mark.parametrize(
+    "chunks, headers, max_bytes, expected_exception",
+    [
+        ([b"a" * 10], {"Content-Length": "20"}, None, IncompleteDownload),
+        ([b"a" * 10] * 3, {}, 25, ImageTooLarge),
+        ([b"a" * 10], {"Content-Length": "100"}, 25, ImageTooLarge),
+    ]
+)
+@patch("components.fetchers.image_downloader.BaseHTMLFetcher.fetch")
+def test_download_image_size_verification(mock_fetch, chunks, headers, max_bytes, expected_exception):
+    mock_response = Mock()
+    mock_response.iter_content.return_value = chunks
+    mock_response.headers = headers
+    mock_fetch.return_value = mock_response
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(expected_exception):
+            ImageDownloader(url="mock.png", directory=tmpdir, file_name="test", max_bytes=max_bytes).download()
+        assert os.listdir(tmpdir) == [], f"Failed download should leave no file, found {os.listdir(tmpdir)}"
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import tempfile
+from unittest.mock import patch, Mock
+
+import aiohttp
+
+from components.fetchers.image_downloader import ImageDownloader
+from components.fetchers.image_store import ImageStore
+from tests.tests_data.local_server import LocalServer
+from tests.tests_data.test_data import test_image_path
+
+
+def write_file(path: str, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def test_image_store_deduplicates_content():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ImageStore(os.path.join(tmpdir, "store"))
+        write_file(os.path.join(tmpdir, "a.jpg"), b"same image")
+        write_file(os.path.join(tmpdir, "b.jpg"), b"same image")
+
+        first = store.add_file("https://images/a.jpg", os.path.join(tmpdir, "a.jpg"))
+        second = store.add_file("https://images/b.jpg", os.path.join(tmpdir, "b.jpg"))
+
+        assert first == second, "Identical images should be stored once"
+        assert os.path.samefile(os.path.join(tmpdir, "a.jpg"), os.path.join(tmpdir, "b.jpg")), \
+            "Identical images files should link the same stored image"
+        assert store.stats()["stored"] == 1 and store.stats()["deduplicated"] == 1, f"Got {store.stats()}"
+
+
+def test_image_store_index_persists():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_file(os.path.join(tmpdir, "a.jpg"), b"image")
+        object_path = ImageStore(tmpdir).add_file("https://images/a.jpg", os.path.join(tmpdir, "a.jpg"))
+
+        assert ImageStore(tmpdir).lookup("https://images/a.jpg") == object_path, "Store should reload its index"
+        assert ImageStore(tmpdir).lookup("https://images/missing.jpg") is None, "Unknown url should not be found"
+
+
+@patch("components.fetchers.image_downloader.BaseHTMLFetcher.fetch")
+def test_download_with_store_is_incremental(mock_fetch):
+    with open(test_image_path, 'rb') as f:
+        image_bytes = f.read()
+    mock_response = Mock()
+    mock_response.iter_content.return_value = [image_bytes]
+    mock_response.headers = {}
+    mock_fetch.return_value = mock_response
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        store = ImageStore(os.path.join(tmpdir, ".images"))
+        for file_name in ("Dunlin", "Sandpiper", "Dunlin"):
+            ImageDownloader(url="https://images/bird.jpg", directory=tmpdir, file_name=file_name,
+                            store=store).download()
+
+        assert mock_fetch.call_count == 1, f"Same url should be fetched once, instead got {mock_fetch.call_count}"
+        assert os.path.samefile(os.path.join(tmpdir, "Dunlin.jpg"), os.path.join(tmpdir, "Sandpiper.jpg")), \
+            "Both animals should link the same stored image"
+
+
+def test_async_download_with_store_fetches_url_once():
+    with open(test_image_path, 'rb') as f:
+        image_bytes = f.read()
+
+    async def download_all(directory, store):
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(ImageDownloader(url=server.url("/bird.jpg"), directory=directory,
+                                                   file_name=file_name, store=store).download_async(session)
+                                   for file_name in ("Dunlin", "Sandpiper", "Knot")))
+
+    with LocalServer({"/bird.jpg": (image_bytes, "image/jpeg")}, latency=0.05) as server, \
+            tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(download_all(tmpdir, ImageStore(os.path.join(tmpdir, ".images"))))
+
+        assert server.hits["/bird.jpg"] == 1, f"Same url should be fetched once, instead got {server.hits['/bird.jpg']}"
+        assert os.path.samefile(os.path.join(tmpdir, "Dunlin.jpg"), os.path.join(tmpdir, "Knot.jpg")), \
+            "Every animal should link the same stored image"
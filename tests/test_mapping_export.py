@@ -0,0 +1,110 @@
+import json
+import os
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from components.export.mapping_export import JSONLExport, MappingIndex, SQLiteExport, export_for
+from components.fetchers.image_index import ImageIndex
+from components.mapping.compact_mapping import CompactMapping
+from utils import UMASK
+
+MAPPING = {"feline": [("Cat", "/wiki/Cat"), ("Lion", "/wiki/Lion")],
+           "leonine": [("Lion", "/wiki/Lion")],
+           "canine": [("Dog", "/wiki/Dog"), ("Wolf", "/wiki/Wolf")]}
+IMAGES = ImageIndex({"Cat": "/images/Cat.jpg", "Lion": "/images/Lion.png"})
+
+
+def test_sqlite_export_lookups():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        export = type("SmallBatches", (SQLiteExport,), {"BATCH_SIZE": 2})(os.path.join(tmpdir, "mapping.sqlite"))
+        path = export.write(MAPPING, IMAGES)
+
+        files = os.listdir(tmpdir)
+        assert files == ["mapping.sqlite"], f"Should leave no temporary file, instead got {files}"
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        assert mode == 0o666 & ~UMASK, f"Should have the default file mode, instead got {oct(mode)}"
+        with MappingIndex(path) as index:
+            adjectives = list(index.adjectives())
+            assert adjectives == list(MAPPING), f"Should list the adjectives in order, instead got {adjectives}"
+            feline = index.animals_of("feline")
+            assert feline == [("Cat", "/wiki/Cat", "/images/Cat.jpg"), ("Lion", "/wiki/Lion", "/images/Lion.png")], \
+                f"Should list the feline animals with their images, instead got {feline}"
+            canine = index.animals_of("canine")
+            assert canine == [("Dog", "/wiki/Dog", None), ("Wolf", "/wiki/Wolf", None)], \
+                f"Should list the canine animals without images, instead got {canine}"
+            lion = index.adjectives_of("Lion")
+            assert lion == ["feline", "leonine"], f"Should list the adjectives of Lion, instead got {lion}"
+            assert index.image_path("Cat") == "/images/Cat.jpg", f"Unexpected Cat image {index.image_path('Cat')}"
+            assert index.image_path("Dog") is None, f"Dog should have no image, instead got {index.image_path('Dog')}"
+            assert index.animals_of("unknown") == [] and index.adjectives_of("unknown") == [], \
+                "Unknown names should have no lookups"
+            plan = " ".join(row[-1] for row in index.connection.execute(
+                "EXPLAIN QUERY PLAN SELECT adjective_id FROM adjective_animals WHERE animal_id = 1"))
+            assert "adjective_animals_by_animal" in plan, f"Should look the adjectives of an animal up by index, " \
+                                                          f"instead got plan {plan}"
+
+
+def test_sqlite_export_image_path_of_shared_name():
+    mapping = {"canine": [("Fox", "/wiki/Fox"), ("Fox", "/wiki/Fox_(band)")]}
+    images = ImageIndex({"Fox": "/images/Fox.jpg"})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = SQLiteExport(os.path.join(tmpdir, "mapping.sqlite")).write(mapping, images)
+        with MappingIndex(path) as index:
+            for _ in range(3):
+                assert index.image_path("Fox") == "/images/Fox.jpg", "Should answer the first animal of the name"
+            image_path = index.image_path("Fox", "/wiki/Fox_(band)")
+            assert image_path == "/images/Fox.jpg", f"Should look the animal up by its page, instead got {image_path}"
+            assert index.image_path("Fox", "/wiki/Unknown") is None, "An unknown page should have no image"
+
+
+def test_sqlite_export_replaces_previous_export():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "mapping.sqlite")
+        SQLiteExport(path).write(MAPPING, IMAGES)
+        mapping = CompactMapping()
+        mapping.add_row(["bovine"], [("Cow", "/wiki/Cow")])
+        SQLiteExport(path).write(mapping, ImageIndex())
+
+        with MappingIndex(path) as index:
+            adjectives = list(index.adjectives())
+            assert adjectives == ["bovine"], f"Should replace the previous adjectives, instead got {adjectives}"
+            bovine = index.animals_of("bovine")
+            assert bovine == [("Cow", "/wiki/Cow", None)], f"Unexpected bovine animals {bovine}"
+
+
+def test_sqlite_concurrent_exports():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "mapping.sqlite")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(lambda _: SQLiteExport(path).write(MAPPING, IMAGES), range(8)))
+
+        assert paths == [path] * 8, f"Every export should be written to {path}, instead got {paths}"
+        files = os.listdir(tmpdir)
+        assert files == ["mapping.sqlite"], f"Should leave no temporary file, instead got {files}"
+        with MappingIndex(path) as index:
+            adjectives = list(index.adjectives())
+            assert adjectives == list(MAPPING), f"Should hold a complete export, instead got {adjectives}"
+
+
+def test_jsonl_export():
+    thumbnails = ImageIndex({"Cat": "/thumbnails/Cat.webp"})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        export = export_for("jsonl", os.path.join(tmpdir, "mapping"))
+        assert isinstance(export, JSONLExport), f"Should create a JSONLExport, instead got {type(export)}"
+        with open(export.write(MAPPING, IMAGES, thumbnails), encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+
+    adjectives = [line["adjective"] for line in lines]
+    assert adjectives == list(MAPPING), f"Should write a line per adjective in order, instead got {adjectives}"
+    assert lines[0]["animals"][0] == {"name": "Cat", "page_url": "/wiki/Cat", "image_path": "/images/Cat.jpg",
+                                      "thumbnail_path": "/thumbnails/Cat.webp"}, \
+        f"Unexpected first animal {lines[0]['animals'][0]}"
+    assert lines[2]["animals"][1]["image_path"] is None, f"Wolf should have no image, instead got {lines[2]}"
+
+
+def test_mapping_index_missing_file():
+    with pytest.raises(FileNotFoundError):
+        MappingIndex("/not/a/mapping.sqlite")
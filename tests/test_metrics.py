@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from components.metrics.metrics import Metrics, Summary, JSONSink, PrometheusTextfileSink, sink_for_path
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from tests.test_collateral_adjective_scraper import N_ANIMALS, local_scraper, wiki_server  # noqa: F401
+
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics()
+    Metrics.set_default(metrics)
+    yield metrics
+    Metrics.set_default(None)
+
+
+def test_summary_quantiles():
+    summary = Summary()
+    for value in range(1, 101):
+        summary.observe(value / 100)
+
+    report = summary.report()
+    assert report["count"] == 100, f"Should count 100 observations, instead got {report['count']}"
+    assert report["max"] == 1.0, f"Should report the max observation, instead got {report['max']}"
+    quantiles = (report["p50"], report["p95"], report["p99"])
+    assert quantiles == (0.51, 0.96, 1.0), f"Unexpected quantiles {quantiles}"
+
+
+def test_summary_bounded_samples():
+    summary = Summary()
+    for value in range(Summary.MAX_SAMPLES * 3):
+        summary.observe(value)
+
+    assert summary.count == Summary.MAX_SAMPLES * 3, f"Should count every observation, instead got {summary.count}"
+    assert len(summary._samples) == Summary.MAX_SAMPLES, f"Should keep {Summary.MAX_SAMPLES} samples, " \
+                                                         f"instead got {len(summary._samples)}"
+    median = summary.quantiles()[0.5]
+    assert Summary.MAX_SAMPLES < median < Summary.MAX_SAMPLES * 2, f"Should sample every observation, " \
+                                                                   f"instead got median {median}"
+
+
+def test_metrics_report(metrics):
+    metrics.inc("requests")
+    metrics.inc("bytes", 100)
+    metrics.set("animals", 3)
+    with metrics.timer("fetch"):
+        pass
+    metrics.observe_queue_depth("pages", 4)
+
+    report = metrics.report()
+    assert report["counters"] == {"requests": 1, "bytes": 100}, f"Unexpected counters {report['counters']}"
+    assert report["gauges"] == {"animals": 3}, f"Unexpected gauges {report['gauges']}"
+    assert report["stages"]["fetch"]["count"] == 1, f"Should time fetch once, instead got {report['stages']}"
+    assert report["queue_depth"]["pages"]["max"] == 4, f"Unexpected queue depth {report['queue_depth']}"
+
+
+def test_sinks(metrics):
+    metrics.inc("requests", 2)
+    metrics.observe("fetch", 0.5)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        assert isinstance(sink_for_path(os.path.join(tmpdir, "metrics.prom")), PrometheusTextfileSink), \
+            "A .prom path should get a Prometheus textfile sink"
+        assert isinstance(sink_for_path(os.path.join(tmpdir, "metrics.json")), JSONSink), \
+            "A .json path should get a JSON sink"
+
+        json_path = JSONSink(os.path.join(tmpdir, "metrics.json")).write(metrics)
+        with open(json_path, encoding="utf-8") as f:
+            counters = json.load(f)["counters"]
+        assert counters["requests"] == 2, f"Should write the requests counter, instead got {counters}"
+
+        prom_path = PrometheusTextfileSink(os.path.join(tmpdir, "metrics.prom")).write(metrics)
+        with open(prom_path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        for line in ("wikipedia_animals_requests_total 2",
+                     'wikipedia_animals_stage_seconds{stage="fetch",quantile="0.5"} 0.5',
+                     'wikipedia_animals_stage_seconds_count{stage="fetch"} 1'):
+            assert line in lines, f"Should write {line}, instead got {lines}"
+        files = sorted(os.listdir(tmpdir))
+        assert files == ["metrics.json", "metrics.prom"], f"Should leave no temporary file, instead got {files}"
+
+
+@pytest.mark.parametrize("mode", WikipediaCollateralAdjectiveScraper.MODES)
+def test_scrape_records_stage_metrics(wiki_server, metrics, mode):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        local_scraper(wiki_server, tmpdir, mode).scrape()
+
+    report = metrics.report()
+    counters = report["counters"]
+    assert counters["images_downloaded"] == N_ANIMALS, f"Should count {N_ANIMALS} downloads, instead got {counters}"
+    assert counters["requests"] >= 2 * N_ANIMALS + 1, f"Should count every request, instead got {counters}"
+    assert counters["bytes"] > 0 and counters["image_bytes"] > 0, f"Should count the bytes, instead got {counters}"
+    for stage in ("fetch", "parse", "table_mapping", "resolve", "download", "html_generation"):
+        assert report["stages"][stage]["count"] > 0, f"Stage {stage} should be timed"
+    downloads = report["stages"]["download"]["count"]
+    assert downloads == N_ANIMALS, f"Should time {N_ANIMALS} downloads, instead got {downloads}"
+    if mode == WikipediaCollateralAdjectiveScraper.PIPELINE_MODE:
+        assert {"rows", "pages", "images"} <= set(report["queue_depth"]), \
+            f"Should sample the pipeline queues depth, instead got {report['queue_depth']}"
@@ -0,0 +1,111 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+
+import aiohttp
+import pytest
+
+from components.fetchers.async_fetcher import AsyncHTMLFetcher
+
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.response_cache import ResponseCache, CacheMissError
+from components.fetchers.session_pool import SessionPool
+from tests.tests_data.local_server import LocalServer
+
+
+def test_cache_revalidates_with_etag():
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            LocalServer({"/page": (b"<html>page</html>", "text/html")}) as server:
+        cache = ResponseCache(cache_dir=tmpdir)
+        first = BaseHTMLFetcher(url=server.url("/page"), session_pool=SessionPool(), cache=cache).fetch()
+        # a new cache instance reloads the entries from disk, as a later run would
+        cache = ResponseCache(cache_dir=tmpdir)
+        second = BaseHTMLFetcher(url=server.url("/page"), session_pool=SessionPool(), cache=cache).fetch()
+
+        assert first.content == second.content == b"<html>page</html>", "Cached content should match the page"
+        assert getattr(second, "from_cache", False), "Second fetch should be served from the cache"
+        assert cache.stats()["revalidated"] == 1, f"Should revalidate once, instead got {cache.stats()}"
+        assert server.hits["/page"] == 2, f"Should send 2 requests, instead got {server.hits['/page']}"
+
+
+def test_cache_offline():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with LocalServer({"/page": (b"<html>page</html>", "text/html")}) as server:
+            url = server.url("/page")
+            BaseHTMLFetcher(url=url, cache=ResponseCache(cache_dir=tmpdir)).fetch()
+
+        offline_cache = ResponseCache(cache_dir=tmpdir, offline=True)
+        content = BaseHTMLFetcher(url=url, cache=offline_cache).fetch_content()
+        assert content == b"<html>page</html>", f"Should serve cached content offline, instead got {content}"
+
+        with pytest.raises(CacheMissError):
+            BaseHTMLFetcher(url=f"{url}/missing", cache=offline_cache).fetch()
+
+
+def test_cache_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(cache_dir=tmpdir, max_bytes=25)
+        cache.store("a", b"a" * 10, {})
+        cache.store("b", b"b" * 10, {})
+        cache.get("a")
+        cache.store("c", b"c" * 10, {})
+
+        assert cache.get("b") is None, "Least recently used entry should be evicted"
+        assert cache.get("a") is not None and cache.get("c") is not None, "Recently used entries should be kept"
+        assert cache.stats()["bytes"] == 20, f"Cache should hold 20 bytes, instead got {cache.stats()['bytes']}"
+
+
+async def _fetch_async(url: str, cache: ResponseCache) -> bytes:
+    async with aiohttp.ClientSession() as session:
+        return await AsyncHTMLFetcher(url=url, session=session, cache=cache).fetch_content()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_cache_refetches_entry_evicted_before_304(mode):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            LocalServer({"/page": (b"<html>page</html>", "text/html")}) as server:
+        url = server.url("/page")
+        cache = ResponseCache(cache_dir=tmpdir)
+        BaseHTMLFetcher(url=url, cache=cache).fetch()
+        validators = cache.validators(url)
+        # the entry is evicted between sending the validators and reading the 304 answer
+        cache._remove(cache.key(url))
+        cache.validators = lambda _: validators
+
+        if mode == "sync":
+            content = BaseHTMLFetcher(url=url, cache=cache).fetch_content()
+        else:
+            content = asyncio.run(_fetch_async(url, cache))
+
+        assert content == b"<html>page</html>", f"Should fetch the page again, instead got {content}"
+        assert server.hits["/page"] == 3, f"Should send 3 requests, instead got {server.hits['/page']}"
+        assert cache.get(url) is not None, "Refetched page should be stored in the cache again"
+        leftovers = [name for name in os.listdir(tmpdir) if name.endswith(".tmp")]
+        assert not leftovers, f"Should leave no temporary files, instead got {leftovers}"
+
+
+
+def _store_repeatedly(cache_dir: str, content: bytes):
+    cache = ResponseCache(cache_dir=cache_dir)
+    for _ in range(200):
+        cache.store("url", content, {})
+
+
+def test_cache_concurrent_stores_across_processes():
+    # forked processes storing from their main thread share its thread ident
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        contents = [bytes([i]) * 100_000 for i in range(4)]
+        processes = [context.Process(target=_store_repeatedly, args=(tmpdir, content)) for content in contents]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        exit_codes = [process.exitcode for process in processes]
+        assert exit_codes == [0] * len(processes), f"Every store should succeed, instead got exit codes {exit_codes}"
+
+        content = ResponseCache(cache_dir=tmpdir).get("url").content
+        assert content in contents, f"Should store a complete body, instead got {len(content)} mixed bytes"
+        leftovers = [name for name in os.listdir(tmpdir) if name.endswith(".tmp")]
+        assert not leftovers, f"Should leave no temporary files, instead got {leftovers}"
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+
+from components.manifest.run_journal import RunJournal
+
+
+def test_journal_replay():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "journal.jsonl")
+        journal = RunJournal(path)
+        journal.record_resolved("Cat", "https://wiki/Cat", "https://img/cat.jpg")
+        journal.record_downloaded("Cat", "https://img/cat.jpg", os.path.join(tmpdir, "Cat.jpg"))
+        journal.record_resolved("Dog", "https://wiki/Dog", "https://img/dog.jpg")
+        journal.record_resolved("Fish", "https://wiki/Fish", None)
+        journal.record_failed("Owl", "resolve", ConnectionError("refused"))
+        journal.close()
+        # a run killed mid write leaves a truncated line
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"event": "downloaded", "na')
+
+        resumed = RunJournal(path, resume=True)
+        images = {("Cat", "https://wiki/Cat"), ("Dog", "https://wiki/Dog"), ("Fish", "https://wiki/Fish"),
+                  ("Owl", "https://wiki/Owl")}
+        assert resumed.pending(images) == {("Dog", "https://wiki/Dog"), ("Owl", "https://wiki/Owl")}
+        assert not resumed.is_done(("Cat", "https://wiki/Cat_(animal)")), "A changed page url should be redone"
+        assert resumed.resolved_images() == {"https://wiki/Cat": "https://img/cat.jpg",
+                                             "https://wiki/Dog": "https://img/dog.jpg"}
+        assert resumed.failure_list() == [("Owl", "resolve", "ConnectionError: refused")]
+
+        resumed.record_resolved("Owl", "https://wiki/Owl", "https://img/owl.jpg")
+        assert resumed.failure_list() == [], "A later success should clear the failure"
+        resumed.close()
+
+
+def test_journal_starts_over_without_resume():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "journal.jsonl")
+        journal = RunJournal(path)
+        journal.record_resolved("Fish", "https://wiki/Fish", None)
+        journal.close()
+
+        journal = RunJournal(path)
+        assert journal.pending({("Fish", "https://wiki/Fish")}) == {("Fish", "https://wiki/Fish")}, \
+            "A new run should start from an empty progress"
+        journal.record_resolved("Cat", "https://wiki/Cat", None)
+        journal.close()
+
+        # a resumed run only replays the run it resumes
+        resumed = RunJournal(path, resume=True)
+        pending = resumed.pending({("Fish", "https://wiki/Fish"), ("Cat", "https://wiki/Cat")})
+        assert pending == {("Fish", "https://wiki/Fish")}, f"Should replay the last run only, instead got {pending}"
+        resumed.record_failed("Fish", "resolve", ConnectionError("refused"))
+        resumed.close()
+
+        resumed = RunJournal(path, resume=True)
+        assert resumed.failure_list() == [("Fish", "resolve", "ConnectionError: refused")], \
+            f"Should replay the resumed runs too, instead got {resumed.failure_list()}"
+        resumed.close()
+
+        journal = RunJournal(path)
+        journal.close()
+        resumed = RunJournal(path, resume=True)
+        assert resumed.failure_list() == [], f"Should not list the failures of older runs, " \
+                                             f"instead got {resumed.failure_list()}"
+        pending = resumed.pending({("Cat", "https://wiki/Cat")})
+        assert pending == {("Cat", "https://wiki/Cat")}, f"Should not replay older runs, instead got {pending}"
+        resumed.close()
+        assert os.path.exists(f"{path}{RunJournal.PREVIOUS_SUFFIX}"), "Should keep the previous journal aside"
+        with open(path, encoding="utf-8") as f:
+            runs = [json.loads(line)["event"] for line in f].count(RunJournal.RUN)
+        assert runs == 2, f"Should hold the last new run and its resumed run only, instead got {runs} runs"
+
+
+def test_journal_replay_clears_on_new_run_event():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "journal.jsonl")
+        # journals written before rotation hold several new runs
+        with open(path, "w", encoding="utf-8") as f:
+            for event in ({"event": "run", "resume": False},
+                          {"event": "resolved", "name": "Fish", "page_url": "https://wiki/Fish", "image_url": None},
+                          {"event": "failed", "name": "Owl", "stage": "resolve", "error": "Error: x"},
+                          {"event": "run", "resume": False}):
+                f.write(json.dumps(event) + "\n")
+
+        resumed = RunJournal(path, resume=True)
+        pending = resumed.pending({("Fish", "https://wiki/Fish")})
+        assert pending == {("Fish", "https://wiki/Fish")}, f"Should clear the older runs, instead got {pending}"
+        assert resumed.failure_list() == [], f"Should clear the older failures, instead got {resumed.failure_list()}"
+        resumed.close()
@@ -0,0 +1,123 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+
+import pytest
+import requests
+
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from components.service.scrape_service import ScrapeService, ServiceServer
+from tests.tests_data.local_server import LocalServer, wiki_routes
+from tests.tests_data.test_data import test_image_path
+
+N_ANIMALS = 30
+
+
+@pytest.fixture(scope="module")
+def wiki_server():
+    with open(test_image_path, "rb") as f:
+        image_bytes = f.read()
+    with LocalServer({}) as server:
+        server.routes.update(wiki_routes(server.base_url, N_ANIMALS, image_bytes))
+        yield server
+
+
+def local_service(server: LocalServer, output_dir: str, **kwargs) -> ScrapeService:
+    scraper_class = type("LocalScraper", (WikipediaCollateralAdjectiveScraper,),
+                         {"WIKI_URL": server.url("/wiki/List_of_animal_names")})
+    return ScrapeService(output_dir, defaults={"mode": "threaded"}, scraper_class=scraper_class, **kwargs)
+
+
+def test_service_runs_concurrent_jobs(wiki_server):
+    image_hits = lambda: sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wikipedia/"))
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            ServiceServer(local_service(wiki_server, tmpdir), port=0) as server:
+        hits_before = image_hits()
+        jobs = [requests.post(f"{server.address}/jobs", json={"name": name}) for name in ("first", "second")]
+        assert [job.status_code for job in jobs] == [202, 202]
+        conflict = requests.post(f"{server.address}/jobs", json={"name": "first"})
+        assert conflict.status_code == 409, "Should not run two jobs into the same directory at once"
+        assert requests.post(f"{server.address}/jobs", json={"kind": "other", "name": "x"}).status_code == 400
+
+        statuses = [requests.get(f"{server.address}/jobs/{job.json()['id']}", params={"wait": 30}).json()
+                    for job in jobs]
+        assert [status["state"] for status in statuses] == ["done", "done"], statuses
+        for status in statuses:
+            assert os.path.exists(status["report"]) and status["failures"] == []
+        assert image_hits() - hits_before == N_ANIMALS, "Should download each image once across the jobs"
+
+        article_hits = sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wiki/Animal"))
+        job = requests.post(f"{server.address}/jobs", json={"kind": "regenerate", "name": "first"}).json()
+        status = requests.get(f"{server.address}/jobs/{job['id']}", params={"wait": 30}).json()
+        assert status["state"] == "done" and os.path.exists(status["report"])
+        assert sum(hits for path, hits in wiki_server.hits.items() if path.startswith("/wiki/Animal")) == \
+            article_hits, "Should regenerate the report without scraping"
+
+        health = requests.get(f"{server.address}/health").json()
+        assert health["jobs"]["done"] == 3
+        assert requests.get(f"{server.address}/jobs/unknown").status_code == 404
+        for wait in ("abc", "-1", "nan"):
+            response = requests.get(f"{server.address}/jobs/{job['id']}", params={"wait": wait})
+            assert response.status_code == 400, f"Should reject wait={wait}, instead got {response.status_code}"
+
+
+def test_service_evicts_finished_jobs(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        service = local_service(wiki_server, tmpdir, max_finished_jobs=2)
+        job_ids = []
+        for name in ("first", "second", "third"):
+            job_ids.append(service.submit({"name": name})["id"])
+            assert service.status(job_ids[-1], wait=30)["state"] == "done", f"Job {name} should be done"
+        service.close()
+
+        assert [status["id"] for status in service.list_jobs()] == job_ids[1:], \
+            f"Should keep the last 2 finished jobs, instead got {service.list_jobs()}"
+        assert not service.batch.scrapers, f"Should drop the finished scrapers, instead got {service.batch.scrapers}"
+
+
+def test_service_over_unix_socket(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = os.path.join(tmpdir, "service.sock")
+        with ServiceServer(local_service(wiki_server, tmpdir), socket_path=socket_path):
+            connection = http.client.HTTPConnection("localhost")
+            connection.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.sock.connect(socket_path)
+            connection.request("GET", "/health")
+            response = connection.getresponse()
+
+            assert response.status == 200
+            assert json.loads(response.read())["jobs"]["running"] == 0
+            connection.close()
+        assert not os.path.exists(socket_path), "Should remove the socket once closed"
+
+
+def test_cli_imports_other_modes_lazily():
+    code = ("import sys, main; print([m for m in ('aiohttp', 'components.batch.batch_scraper', "
+            "'components.sharding.shard_coordinator', 'components.service.scrape_service') if m in sys.modules])")
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            check=True, capture_output=True, text=True).stdout
+
+    assert output.strip() == "[]", "Should import the modules of the other modes on use only"
+
+
+def test_service_rejects_invalid_jobs(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir, \
+            ServiceServer(local_service(wiki_server, os.path.join(tmpdir, "output")), port=0) as server:
+        table = {"key_header": "A", "value_header": "B"}
+        for job in ({"name": "/tmp/x"}, {"name": "../x"}, {"name": "a/b"},
+                    {"name": "job", "tables": [{**table, "keys_extractor": "antigravity:X"}]},
+                    {"name": "job", "tables": [{**table, "keys_extractor": "nosuchmod:X"}]},
+                    {"name": "job", "tables": [{"value_header": "B"}]},
+                    {"name": "job", "tables": [{**table, "values_extractor": "components.scrapers.extractors."
+                                                                             "wikipedia_extractors:AnimalExtractor"}]}):
+            response = requests.post(f"{server.address}/jobs", json=job)
+            assert response.status_code == 400, f"Should reject {job}, instead got {response.status_code}"
+        error = requests.post(f"{server.address}/jobs", json={"name": "job", "tables": [{"value_header": "B"}]}).json()
+        assert "missing ['key_header']" in error["error"], f"Should name the missing header, instead got {error}"
+        assert "antigravity" not in sys.modules, "Should not import the modules named by a request"
+        assert os.listdir(tmpdir) == ["output"], f"Should write nothing outside the output directory, " \
+                                                 f"instead got {os.listdir(tmpdir)}"
@@ -1,7 +1,8 @@
 import pytest
 from bs4 import BeautifulSoup
 
-from components.scrapers.base_scrapers import BaseHTMLScraper, BaseTableScraper, TableMappingScraper
+from components.scrapers.base_scrapers import BaseHTMLScraper, BaseTableScraper, ColumnarTableScraper, \
+    TableMappingScraper
 from components.scrapers.extractors.base_extractor import BaseCellsExtractor
 from tests.tests_data.test_data import good_url, mock_html_table, mock_html_table_headers, mapping_dict_result
 
@@ -42,4 +43,23 @@ def test_table_mapping_scraper():
         values_extractor=BaseCellsExtractor(col_idx=1)
         ).create_mapping()
 
-    assert mapping_dict == mapping_dict_result, f"Should got {mapping_dict_result}, instead got {mapping_dict}"
\ No newline at end of file
+    assert mapping_dict == mapping_dict_result, f"Should got {mapping_dict_result}, instead got {mapping_dict}"
+
+
+def test_columnar_table_scraper():
+    table_tag = BeautifulSoup("<table><tr><th>Key</th><th>Value</th><th>Other</th></tr>"
+                              "<tr><td>k1</td><td>v1</td><td>o1</td></tr>"
+                              "<tr><td>k2</td><td>v2</td></tr>"
+                              "<tr><td>k1</td><td>v3</td><td>o3</td></tr></table>", "html.parser").find("table")
+    pairs = [(BaseCellsExtractor(col_idx=0), BaseCellsExtractor(col_idx=1)),
+             (BaseCellsExtractor(col_idx=0), BaseCellsExtractor(col_idx=2))]
+    scraper = ColumnarTableScraper(table=table_tag, pairs=pairs)
+
+    assert len(scraper.extractors) == 3, "Should run the keys extractor shared by both pairs once per row"
+    assert scraper.columns() == [[["k1"], ["k2"], ["k1"]], [["v1"], ["v2"], ["v3"]], [["o1"], None, ["o3"]]]
+    mappings = scraper.create_mappings()
+    expected = [TableMappingScraper(table=table_tag, keys_extractor=keys_extractor,
+                                    values_extractor=values_extractor).create_mapping()
+                for keys_extractor, values_extractor in pairs]
+    assert [dict(mapping.items()) for mapping in mappings] == [dict(mapping.items()) for mapping in expected]
+    assert scraper.map_row(scraper.rows()[1]) == [(["k2"], ["v2"])], "Should skip the pairs the row is too short for"
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from components.fetchers.base_fetcher import BaseHTMLFetcher
+from components.fetchers.session_pool import SessionPool
+from tests.tests_data.local_server import LocalServer
+
+
+def test_session_pool_reuses_connections():
+    pool = SessionPool(pool_maxsize=2)
+    with LocalServer({"/page": (b"<html></html>", "text/html")}) as server:
+        for _ in range(5):
+            BaseHTMLFetcher(url=server.url("/page"), session_pool=pool).fetch()
+
+    stats = pool.stats()
+    assert stats["requests"] == 5, f"Should count 5 requests, instead got {stats['requests']}"
+    assert stats["connections"] == 1, f"Sequential fetches should share 1 connection, instead got {stats['connections']}"
+    assert stats["reused"] == 4, f"Should reuse connection 4 times, instead got {stats['reused']}"
+
+
+def test_session_pool_bounded_per_host():
+    pool = SessionPool(pool_maxsize=4, pool_block=True)
+    with LocalServer({"/page": (b"<html></html>", "text/html")}, latency=0.02) as server:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(lambda _: BaseHTMLFetcher(url=server.url("/page"), session_pool=pool).fetch(),
+                              range(32)))
+
+    stats = pool.stats()
+    assert stats["connections"] <= 4, f"Should open at most 4 connections, instead got {stats['connections']}"
+    assert stats["requests"] == 32, f"Should count 32 requests, instead got {stats['requests']}"
+
+
+def test_fetcher_uses_default_pool():
+    fetcher = BaseHTMLFetcher(url="http://127.0.0.1")
+    assert fetcher.session_pool is SessionPool.default(), "Fetcher should use the shared default pool"
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from components.fetchers.response_cache import ResponseCache
+from components.scrapers.wikipedia_collateral_adjective_scraper import WikipediaCollateralAdjectiveScraper
+from components.sharding.hash_ring import HashRing
+from components.sharding.shard_coordinator import ShardCoordinator
+from components.sharding import work_queue
+from components.sharding.work_queue import LeaseLost, WorkQueue
+from tests.test_collateral_adjective_scraper import N_ANIMALS, local_scraper, wiki_server  # noqa: F401 (fixture)
+
+
+def test_hash_ring_moves_few_keys():
+    keys = [f"Animal{i}" for i in range(10000)]
+    ring = HashRing([f"shard-{i}" for i in range(8)])
+    before = {key: ring.node_for(key) for key in keys}
+    counts = {}
+    for node in before.values():
+        counts[node] = counts.get(node, 0) + 1
+    assert len(counts) == 8 and min(counts.values()) > 10000 / 8 / 2, f"Keys should spread evenly, got {counts}"
+
+    grown = HashRing([f"shard-{i}" for i in range(9)])
+    moved = sum(before[key] != grown.node_for(key) for key in keys)
+    assert moved < 10000 / 9 * 1.5, f"Adding a node should move about 1/9 of the keys, moved {moved}"
+    assert all(grown.node_for(key) == "shard-8" for key in keys if before[key] != grown.node_for(key))
+
+
+def test_work_queue_leases():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(tmpdir, lease_seconds=0.5)
+        queue.create({"shard-0": [("Cat", "url/Cat")], "shard-1": [("Dog", "url/Dog")]}, {"feline": [("Cat", "url/Cat")]},
+                     output_dir=tmpdir)
+
+        first, second = queue.claim("worker-a"), queue.claim("worker-b")
+        assert {first.shard_id, second.shard_id} == {"shard-0", "shard-1"}
+        assert queue.claim("worker-c") is None, "Leased shards should not be claimed twice"
+        assert queue.mapping() == {"feline": [("Cat", "url/Cat")]}
+
+        queue.complete(first, {"failures": []})
+        assert queue.pending() == [second.shard_id]
+
+        # worker-b died without renewing its lease
+        time.sleep(0.6)
+        taken_over = queue.claim("worker-c")
+        assert taken_over.shard_id == second.shard_id and not second.renew(), "An expired lease should be taken over"
+        queue.complete(taken_over, {"failures": []})
+        assert queue.is_complete() and len(queue.results()) == 2
+
+
+def expire(queue: WorkQueue, shard_id: str):
+    lease_path = queue.lease_path(shard_id)
+    os.utime(lease_path, (time.time() - 2 * queue.lease_seconds,) * 2)
+
+
+def test_expired_lease_race():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(tmpdir, lease_seconds=30)
+        queue.create({"shard-0": [("Cat", "url/Cat")]}, {}, output_dir=tmpdir)
+        dead = queue.claim("worker-dead")
+        for attempt in range(50):
+            expire(queue, "shard-0")
+            barrier, leases = threading.Barrier(2), {}
+
+            def claim(worker_id):
+                barrier.wait()
+                leases[worker_id] = queue.claim(worker_id)
+
+            threads = [threading.Thread(target=claim, args=(f"worker-{name}",)) for name in ("a", "b")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            held = [worker_id for worker_id, lease in leases.items() if lease and lease.is_held()]
+            claimed = [worker_id for worker_id, lease in leases.items() if lease]
+            assert len(held) == 1 and claimed == held, \
+                f"Attempt {attempt}: a single worker should take the lease over, instead got {claimed} held by {held}"
+        assert not dead.is_held(), "The expired lease should be lost by its worker"
+
+
+def test_expired_lease_renewed_meanwhile_is_kept(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(tmpdir, lease_seconds=30)
+        queue.create({"shard-0": [("Cat", "url/Cat")]}, {}, output_dir=tmpdir)
+        lease = queue.claim("worker-a")
+        expire(queue, "shard-0")
+        rename = os.rename
+
+        def renewed_before_rename(source, target):
+            # worker-a renews its lease between the expiry check of worker-b and its rename
+            assert lease.renew(), "worker-a should still hold its lease"
+            rename(source, target)
+
+        monkeypatch.setattr(work_queue.os, "rename", renewed_before_rename)
+        stolen = queue.claim("worker-b")
+        monkeypatch.undo()
+
+        assert stolen is None, "Should not take over a lease renewed since checked"
+        assert lease.is_held(), "The renewed lease should still be held by worker-a"
+
+
+def test_complete_fails_once_lease_lost():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        queue = WorkQueue(tmpdir, lease_seconds=30)
+        queue.create({"shard-0": [("Cat", "url/Cat")]}, {}, output_dir=tmpdir)
+        lost = queue.claim("worker-a")
+        expire(queue, "shard-0")
+        taken_over = queue.claim("worker-b")
+
+        with pytest.raises(LeaseLost):
+            queue.complete(lost, {"failures": []})
+        assert queue.pending() == ["shard-0"], "Should not record the result of a lost lease"
+        queue.complete(taken_over, {"failures": []})
+        results = queue.results()
+        assert results[0]["worker"] == "worker-b", f"Should record the result of worker-b, instead got {results}"
+
+
+def test_sharded_scrape(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        scraper = local_scraper(wiki_server, tmpdir, WikipediaCollateralAdjectiveScraper.THREADED_MODE)
+        coordinator = ShardCoordinator(scraper, workers=2, worker_kwargs={"mode": "threaded"})
+        output_file = coordinator.run()
+
+        assert os.path.exists(output_file), f"Should generate {output_file}"
+        images = [name for name in os.listdir(tmpdir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should download {N_ANIMALS} images, instead got {len(images)}"
+        results = coordinator.queue.results()
+        assert len(results) == coordinator.shards and coordinator.failures == []
+        assert sum(result["images"] for result in results) == N_ANIMALS
+        with open(output_file, encoding="utf-8") as f:
+            assert "No image found" not in f.read()
+
+
+def test_sharded_scrape_offline(wiki_server):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache")
+        local_scraper(wiki_server, os.path.join(tmpdir, "online"), WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                      cache=ResponseCache(cache_dir)).scrape()
+
+        hits_before = sum(wiki_server.hits.values())
+        output_dir = os.path.join(tmpdir, "offline")
+        scraper = local_scraper(wiki_server, output_dir, WikipediaCollateralAdjectiveScraper.THREADED_MODE,
+                                cache=ResponseCache(cache_dir, offline=True))
+        coordinator = ShardCoordinator(scraper, workers=1, worker_kwargs={"mode": "threaded", "cache_dir": cache_dir,
+                                                                          "offline": True})
+        coordinator.run()
+
+        hits = sum(wiki_server.hits.values()) - hits_before
+        assert hits == 0, f"Offline workers should not hit the network, instead sent {hits} requests"
+        images = [name for name in os.listdir(output_dir) if name.endswith(".jpg")]
+        assert len(images) == N_ANIMALS, f"Should serve {N_ANIMALS} images from the cache, instead got {len(images)}"
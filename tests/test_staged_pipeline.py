@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from components.pipeline.staged_pipeline import Stage, StagedPipeline
+
+
+def test_staged_pipeline_runs_all_stages():
+    results = []
+    lock = threading.Lock()
+
+    def collect(item):
+        with lock:
+            results.append(item)
+
+    errors = StagedPipeline([
+        Stage("double", lambda x: [x, x], workers=1, queue_size=2),
+        Stage("square", lambda x: [x * x], workers=4, queue_size=2),
+        Stage("collect", collect, workers=2, queue_size=2),
+    ]).run(range(10))
+
+    assert not errors, f"Should not fail, instead got {errors}"
+    assert sorted(results) == sorted([x * x for x in range(10)] * 2), f"Unexpected results {results}"
+
+
+def test_staged_pipeline_back_pressure():
+    produced = []
+    release = threading.Event()
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    def slow(item):
+        release.wait()
+
+    pipeline = StagedPipeline([Stage("slow", slow, workers=1, queue_size=3)])
+    thread = threading.Thread(target=pipeline.run, args=(source(),))
+    thread.start()
+    thread.join(timeout=0.2)
+
+    # one item in the worker, three in the queue, one blocked on put
+    assert len(produced) <= 5, f"Bounded queue should stop the producer, instead produced {len(produced)}"
+    release.set()
+    thread.join()
+    assert len(produced) == 100, f"Should produce all items, instead produced {len(produced)}"
+
+
+def test_staged_pipeline_collects_errors():
+    def fail_on_odd(x):
+        if x % 2:
+            raise ValueError(x)
+        return [x]
+
+    errors = StagedPipeline([Stage("fail", fail_on_odd, workers=2), Stage("sink", lambda x: None)]).run(range(6))
+
+    assert sorted(item for _, item, _ in errors) == [1, 3, 5], f"Should collect odd items errors, got {errors}"
+
+
+def test_staged_pipeline_source_failure():
+    results = []
+
+    def source():
+        yield from range(3)
+        raise ValueError("list page broke")
+
+    stages = [Stage("double", lambda x: [2 * x], workers=2, queue_size=1), Stage("collect", results.append)]
+    with pytest.raises(ValueError):
+        StagedPipeline(stages).run(source())
+
+    pipeline_threads = [thread.name for thread in threading.enumerate() if thread.name.startswith(("double", "collect"))]
+    assert pipeline_threads == [], f"Should stop the stage workers, instead got {pipeline_threads} running"
+    assert sorted(results) == [0, 2, 4], f"Should drain the produced items, instead got {results}"
@@ -0,0 +1,62 @@
+import pytest
+
+from components.scrapers.streaming_table import StreamingTableReader
+
+PAGE = """<html><body>
+<table class="navbox"><tr><th>Navigation</th></tr><tr><td>skipped</td></tr></table>
+<table class="wikitable">
+<tr><th>Animal</th><th>Young</th><th>Collateral adjective</th></tr>
+<tr><td><a href="/wiki/Cat">Cat</a></td><td>kitten</td><td>feline<br/>felid</td></tr>
+<tr><td><a href="/wiki/Dog">Dog &amp; co</a></td><td>puppy</td><td>canine &#8211; cynic</td>
+<tr><td>Wolf<table><tr><th>Animal</th><th>Collateral adjective</th></tr><tr><td>nested</td><td>x</td></tr></table></td>
+<td>pup</td><td>lupine</td></tr>
+</table>
+<table><thead><tr><th>Collateral adjective</th><th>Animal</th></tr></thead>
+<tbody><tr><td>bovine</td><td>Cow</td></tr></tbody></table>
+</body></html>"""
+
+PAIRS = [("Collateral adjective", "Animal")]
+
+
+def texts(row):
+    return [cell.get_text(strip=True) for cell in row.find_all(["td", "th"], recursive=False)]
+
+
+def read(chunk_size: int):
+    content = PAGE.encode("utf-8")
+    chunks = (content[idx:idx + chunk_size] for idx in range(0, len(content), chunk_size))
+    return list(StreamingTableReader(PAIRS).iter_rows(chunks))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_reader_rows(chunk_size):
+    expected = [["Cat", "kitten", "felinefelid"], ["Dog & co", "puppy", "canine – cynic"],
+                ["WolfAnimalCollateral adjectivenestedx", "pup", "lupine"], ["bovine", "Cow"]]
+
+    rows = read(chunk_size)
+
+    assert [texts(row) for _, _, row in rows] == expected, "Should read the rows of the matching tables only"
+    assert [(table_id, matches) for table_id, matches, _ in rows] == [(1, [(0, 2, 0)])] * 3 + [(3, [(0, 0, 1)])]
+    assert rows[1][2].get_text().count("&") == 1 and "–" in rows[1][2].get_text(), "Should keep the entities"
+    assert rows[2][2].find("table") is not None, "Should keep a nested table inside its row"
+
+
+def test_reader_hands_rows_over_as_they_complete():
+    reader = StreamingTableReader(PAIRS)
+    cut = PAGE.index("<tr><td><a href=\"/wiki/Dog")
+
+    first = reader.feed_text(PAGE[:cut])
+    rest = reader.feed_text(PAGE[cut:])
+
+    assert [texts(row)[0] for _, _, row in first] == ["Cat"], "Should hand a row over before the page is read"
+    assert [texts(row)[0] for _, _, row in rest] == ["Dog & co", "WolfAnimalCollateral adjectivenestedx", "bovine"]
+    assert reader.tables_found == 2
+
+
+def test_reader_decodes_split_multibyte_characters():
+    page = "<table><tr><th>Collateral adjective</th><th>Animal</th></tr><tr><td>éléphantin</td><td>Éléphant</td></tr>"
+    content = page.encode("utf-8")
+    rows = list(StreamingTableReader(PAIRS).iter_rows(content[idx:idx + 1] for idx in range(len(content))))
+
+    assert [texts(row) for _, _, row in rows] == [["éléphantin", "Éléphant"]], \
+        "Should decode characters split across chunks, and close the rows left open"
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image
+
+from components.thumbnails.thumbnailer import Thumbnailer
+from tests.tests_data.test_data import test_image_path
+from utils import UMASK
+
+
+def copy_images(tmpdir: str, names) -> dict:
+    images = {}
+    for name in names:
+        images[name] = os.path.join(tmpdir, f"{name}.jpg")
+        shutil.copyfile(test_image_path, images[name])
+    return images
+
+
+@pytest.mark.parametrize("image_format", list(Thumbnailer.FORMATS))
+def test_create_thumbnails(image_format):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        images = copy_images(tmpdir, ["Dunlin", "Eagle"])
+        thumbnailer = Thumbnailer(os.path.join(tmpdir, "thumbs"), size=100, image_format=image_format, processes=2)
+        index = thumbnailer.create(images)
+
+        assert len(index) == 2
+        # identical images share their thumbnail
+        assert index.get("Dunlin") == index.get("Eagle")
+        with Image.open(index.get("Dunlin")) as thumb:
+            assert max(thumb.size) == 100
+            assert thumb.format == Thumbnailer.FORMATS[image_format][0]
+        mode = os.stat(index.get("Dunlin")).st_mode & 0o777
+        assert mode == 0o666 & ~UMASK, f"Should create the thumbnail with the default mode, instead got {oct(mode)}"
+
+
+def test_unchanged_images_are_not_encoded_again():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        images = copy_images(tmpdir, ["Dunlin"])
+        thumbnailer = Thumbnailer(os.path.join(tmpdir, "thumbs"), processes=0)
+        thumb_path = thumbnailer.create(images).get("Dunlin")
+        mtime = os.stat(thumb_path).st_mtime_ns
+
+        assert thumbnailer.create(images).get("Dunlin") == thumb_path
+        assert os.stat(thumb_path).st_mtime_ns == mtime
+
+
+def test_drop_originals_keeps_thumbnails_across_runs():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        images = copy_images(tmpdir, ["Dunlin"])
+        with open(os.path.join(tmpdir, "Broken.jpg"), "wb") as f:
+            f.write(b"not an image")
+        images["Broken"] = os.path.join(tmpdir, "Broken.jpg")
+        thumbnailer = Thumbnailer(os.path.join(tmpdir, "thumbs"), processes=0, keep_originals=False)
+
+        index = thumbnailer.create(images)
+
+        assert not os.path.exists(images["Dunlin"]), "Original image should be removed"
+        assert os.path.exists(images["Broken"]), "Image without thumbnail should be kept"
+        assert index.get("Broken") is None
+        assert thumbnailer.create({}).get("Dunlin") == index.get("Dunlin")
+
+
+def test_unknown_format():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with pytest.raises(ValueError):
+            Thumbnailer(tmpdir, image_format="gif")
@@ -0,0 +1,15 @@
+import pytest
+
+from utils import clean_str
+
+
+@pytest.mark.parametrize("s, replacers, expected", [
+    ("Animals (list)", None, "Animals"),
+    ("Ant/Bee: \"queen\"?", None, "Ant_Bee_queen_"),
+    ("a b", {"a": "b", "b": "c"}, "c c"),
+    ("a b", {" ": "_", "a": "x"}, "x_b"),
+    ("ab", {"a": "bb", "b": "c"}, "ccc"),
+])
+def test_clean_str(s, replacers, expected):
+    assert clean_str(s, replacers) == expected, "Should apply the replacers in order, then replace the unsafe runs"
+    assert clean_str(s, replacers) == expected, "Should return the same memoized result"
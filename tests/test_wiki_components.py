@@ -1,10 +1,11 @@
 import logging
 from unittest.mock import patch
 
+import pytest
 from bs4 import BeautifulSoup
 
 from components.fetchers.base_fetcher import BaseHTMLFetcher
-from components.scrapers.wikipedia_scraper import WikiScraper
+from components.scrapers.wikipedia_scraper import WikiScraper, WikiImageScraper
 from tests.tests_data.test_data import mock_wiki_html, img_url, mock_html_table, mock_html_table_headers
 
 
@@ -33,3 +34,16 @@ def test_wiki_scraper_get_table_to_map(mock_init):
     assert value_idx == 1, f"Should return 1, instead got {value_idx}"
 
 
+@pytest.mark.parametrize("scraper_class", [WikiScraper, WikiImageScraper])
+def test_wiki_image_scraper_get_image_url(scraper_class):
+    scraper = scraper_class(url="https://some_wikipedia_url", html=mock_wiki_html)
+
+    url = scraper.get_image_url()
+
+    assert url == f"https:{img_url}", f"Should return {img_url}, instead got {url}"
+
+
+def test_wiki_image_scraper_parses_only_candidates():
+    scraper = WikiImageScraper(url="https://some_wikipedia_url", html=mock_wiki_html)
+
+    assert len(scraper.soup.find_all(True)) == 1, "Only the main image candidates should be parsed"
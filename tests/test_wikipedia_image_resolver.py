@@ -0,0 +1,60 @@
+import json
+
+from components.scrapers.wikipedia_image_resolver import WikiPageImagesResolver
+from tests.tests_data.local_server import LocalServer
+
+
+def api_route(params):
+    titles = params["titles"][0].split("|")
+    assert titles == ["Red_fox", "Dunlin", "Unicorn"], f"Unexpected titles {titles}"
+    return json.dumps({"query": {
+        "normalized": [{"from": "Red_fox", "to": "Red fox"}],
+        "redirects": [{"from": "Red fox", "to": "Fox"}],
+        "pages": {
+            "1": {"title": "Fox", "thumbnail": {"source": "//upload.wikimedia.org/thumb/fox.jpg"}},
+            "2": {"title": "Dunlin", "thumbnail": {"source": "//upload.wikimedia.org/thumb/dunlin.jpg"}},
+            "-1": {"title": "Unicorn", "missing": ""},
+        },
+    }}).encode(), "application/json"
+
+
+def test_resolve_maps_normalized_and_redirected_titles():
+    with LocalServer({"/w/api.php": api_route}) as server:
+        resolved = WikiPageImagesResolver(api_url=server.url("/w/api.php")).resolve([
+            "https://en.wikipedia.org/wiki/Red_fox",
+            "https://en.wikipedia.org/wiki/Dunlin",
+            "https://en.wikipedia.org/wiki/Unicorn",
+            "https://en.wikipedia.org/w/index.php?title=Dunlin",
+        ])
+
+    assert resolved == {
+        "https://en.wikipedia.org/wiki/Red_fox": "https://upload.wikimedia.org/thumb/fox.jpg",
+        "https://en.wikipedia.org/wiki/Dunlin": "https://upload.wikimedia.org/thumb/dunlin.jpg",
+        "https://en.wikipedia.org/wiki/Unicorn": None,
+        "https://en.wikipedia.org/w/index.php?title=Dunlin": None,
+    }, f"Unexpected resolved images {resolved}"
+
+
+def test_resolve_batches():
+    with LocalServer({}) as server:
+        server.routes["/w/api.php"] = lambda params: (json.dumps({"query": {"pages": {}}}).encode(), "application/json")
+        WikiPageImagesResolver(api_url=server.url("/w/api.php"), batch_size=10).resolve(
+            f"https://en.wikipedia.org/wiki/Animal{i}" for i in range(95))
+
+    assert server.hits["/w/api.php"] == 10, f"Should send 10 batches, instead got {server.hits['/w/api.php']}"
+
+
+def test_resolve_titles_sharing_a_page():
+    def route(params):
+        return json.dumps({"query": {
+            "normalized": [{"from": "Red_fox", "to": "Red fox"}],
+            "redirects": [{"from": "Red fox", "to": "Fox"}, {"from": "Vulpes", "to": "Fox"}],
+            "pages": {"1": {"title": "Fox", "thumbnail": {"source": "//upload.wikimedia.org/thumb/fox.jpg"}}},
+        }}).encode(), "application/json"
+
+    page_urls = [f"https://en.wikipedia.org/wiki/{title}" for title in ("Red_fox", "Red fox", "Vulpes", "Fox")]
+    with LocalServer({"/w/api.php": route}) as server:
+        resolved = WikiPageImagesResolver(api_url=server.url("/w/api.php")).resolve(page_urls)
+
+    expected = {page_url: "https://upload.wikimedia.org/thumb/fox.jpg" for page_url in page_urls}
+    assert resolved == expected, f"Every title of the page should get its image, instead got {resolved}"
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse as urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+
+
+class _Server(ThreadingHTTPServer):
+    # many concurrent clients connect at once, the default backlog of 5 would stall them
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class LocalServer:
+    """
+    Local keep-alive HTTP server serving static routes, used as an offline stand-in for wikipedia in tests.
+    """
+    def __init__(self, routes: Dict[str, Tuple[bytes, str]], latency: float = 0.0, error_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        LocalServer constructor
+        :param routes: mapping of path to (body, content type),
+        or to a callable getting the query params and returning (body, content type) or None for 404,
+        or (body, content type, status, headers) to answer with another status
+        :param latency: seconds to sleep before answering each request
+        :param error_rate: fraction of the requests answered with 503, to inject transient errors
+        :param seed: seed of the injected errors
+        """
+        self.routes = routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.hits: Dict[str, int] = {}
+        # requests being answered, and the most answered at once since reset_peak
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = _Server(("127.0.0.1", 0), self._handler_class())
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def reset_peak(self):
+        with self._lock:
+            self.peak_in_flight = self.in_flight
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                try:
+                    self.answer()
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def answer(self):
+                path, _, query = self.path.partition("?")
+                with server._lock:
+                    server.hits[path] = server.hits.get(path, 0) + 1
+                    inject_error = server.error_rate and server._random.random() < server.error_rate
+                if server.latency:
+                    time.sleep(server.latency)
+                route = server.routes.get(path)
+                if inject_error:
+                    route = (b"injected error", "text/plain", 503, {"Retry-After": "0"})
+                if callable(route):
+                    route = route(urlparse.parse_qs(query))
+                if route is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body, content_type, status, headers = route if len(route) == 4 else (*route, 200, {})
+                if status != 200:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def wiki_routes(base_url: str, n_animals: int, image_bytes: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Build the routes of a synthetic wikipedia: a list of animal names page, an article and an image per animal.
+    :param base_url: the local server base url, used for absolute links
+    :param n_animals: amount of animals in the list
+    :param image_bytes: body served for every image
+    :return: routes mapping for LocalServer
+    """
+    rows = "".join(
+        f'<tr><td><a href="{base_url}/wiki/Animal{i}">Animal{i}</a></td><td>adj{i % 10}</td></tr>'
+        for i in range(n_animals)
+    )
+    list_page = f"""
+    <html><body>
+    <table><tr><th>Animal</th><th>Collateral adjective</th></tr>{rows}</table>
+    </body></html>
+    """
+    routes = {"/wiki/List_of_animal_names": (list_page.encode(), "text/html")}
+    for i in range(n_animals):
+        article = f"""
+        <html><body>
+        <img src="//upload.wikimedia.org/wikipedia/en/icon.svg" />
+        <img src="{base_url}/wikipedia/commons/thumb/animal{i}.jpg" />
+        <p>{"Lorem ipsum " * 200}</p>
+        </body></html>
+        """
+        routes[f"/wiki/Animal{i}"] = (article.encode(), "text/html")
+        routes[f"/wikipedia/commons/thumb/animal{i}.jpg"] = (image_bytes, "image/jpeg")
+
+    # the pageimages API stand-in has no image for every 7th animal
+    api_images = {f"Animal{i}": f"{base_url}/wikipedia/commons/thumb/animal{i}.jpg"
+                  for i in range(n_animals) if i % 7}
+    routes["/w/api.php"] = pageimages_api(api_images)
+    return routes
+
+
+def pageimages_api(images: Dict[str, str]):
+    """
+    Build a MediaWiki pageimages API stand-in route
+    :param images: mapping of page title to its thumbnail url
+    :return: callable route for LocalServer
+    """
+    def route(params):
+        titles = params.get("titles", [""])[0].split("|")
+        pages = {}
+        for idx, title in enumerate(titles):
+            page = {"title": title}
+            if title in images:
+                page["thumbnail"] = {"source": images[title]}
+            pages[str(idx)] = page
+        return json.dumps({"query": {"pages": pages}}).encode(), "application/json"
+
+    return route
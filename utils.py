@@ -1,25 +1,51 @@
 import os
 import re
+from functools import lru_cache
+
 import yaml
 
-from typing import Dict
+from typing import Dict, Tuple
+
+DEFAULT_REPLACERS = {"(list)": "", " ": ""}
+# runs of the characters not allowed in file names
+UNSAFE_CHARS = re.compile(r'[\\/:"*?<>|]+')
+CLEAN_STR_CACHE_SIZE = 1 << 16
+
+
+def _read_umask() -> int:
+    # the umask can only be read by setting it, read once on import rather than racing other threads
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+UMASK = _read_umask()
 
 
 def clean_str(s: str, replacers: Dict[str, str] | None = None) -> str:
     """
-    util function to clean string
+    util function to clean string.
+    Memoized, the same animal names and adjectives are cleaned once however many rows list them
     :param s: the string to clean
-    :param replacers: a dict of replacement substrings
+    :param replacers: a dict of replacement substrings, applied in order
     :return: cleaned string
     """
-    if not replacers:
-        replacers = {"(list)": "", " ": ""}
+    return _clean_str(s, tuple((replacers or DEFAULT_REPLACERS).items()))
+
 
-    for k, v in replacers.items():
-        s = s.replace(k, v)
+@lru_cache(maxsize=CLEAN_STR_CACHE_SIZE)
+def _clean_str(s: str, replacers: Tuple[Tuple[str, str], ...]) -> str:
+    for old, new in replacers:
+        s = s.replace(old, new)
+    return UNSAFE_CHARS.sub("_", s)
 
-    s = re.sub(r'[\\/:"*?<>|]+', "_", s)
-    return s
+def set_default_mode(path: str):
+    """
+    util function to give a file the mode of a newly created file, used on the temporary files
+    created owner only by tempfile.mkstemp before they are renamed over a published file
+    :param path: the file path
+    """
+    os.chmod(path, 0o666 & ~UMASK)
 
 def load_yaml(path: str) -> dict:
     """